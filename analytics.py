@@ -0,0 +1,186 @@
+"""Recommendation analytics served from pre-aggregated rollups.
+
+The write-behind writer folds every persisted recommendation into
+`recommendation_rollups` (soil type x region x month x crop) in the same
+transaction as the raw insert, so dashboards only ever read the small
+rollup table. `rebuild` recomputes the rollups from the raw history, e.g.
+after importing old data:
+
+    python analytics.py --rebuild
+"""
+import argparse
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+
+# Crops per recommendation that count towards the rollups
+TOP_CROPS = 5
+
+DIMENSIONS = ('soil_type', 'region', 'month')
+
+UPSERT_ROLLUP = '''
+    INSERT INTO recommendation_rollups
+        (soil_type, region, month, crop, recommendation_count, top_pick_count, confidence_sum)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (soil_type, region, month, crop) DO UPDATE SET
+        recommendation_count = recommendation_count + excluded.recommendation_count,
+        top_pick_count = top_pick_count + excluded.top_pick_count,
+        confidence_sum = confidence_sum + excluded.confidence_sum
+'''
+
+
+def normalize_soil_type(soil_type):
+    """Soil type as the model's categories spell it, so 'Loamy ' and 'loamy' share a rollup"""
+    return ' '.join(str(soil_type or '').lower().split()) or 'unknown'
+
+
+def normalize_region(region):
+    region = ' '.join(str(region or '').split())
+    return region.title() if region and region.lower() != 'unknown' else 'unknown'
+
+
+def region_from_location(location):
+    """Coarse region for a free-text location: the state when given, else the place itself"""
+    parts = [part.strip() for part in (location or '').split(',') if part.strip()]
+    if not parts:
+        return 'unknown'
+    region = parts[1] if len(parts) > 1 and parts[1].lower() != 'india' else parts[0]
+    return normalize_region(region)
+
+
+# Filter values are normalized the same way the rollups were written
+NORMALIZERS = {'soil_type': normalize_soil_type, 'region': normalize_region}
+
+
+def rollup_key(soil_type, location, recommendations, when=None):
+    """Describe one recommendation result as (soil_type, region, month, [(crop, confidence), ...])"""
+    month = (when or datetime.now(timezone.utc)).strftime('%Y-%m')
+    crops = [(item['crop'], item.get('confidence', 0)) for item in recommendations[:TOP_CROPS]]
+    return (normalize_soil_type(soil_type), region_from_location(location), month, crops)
+
+
+def aggregate(keys):
+    """Collapse many rollup keys into upsert rows for one transaction"""
+    totals = defaultdict(lambda: [0, 0, 0.0])
+    for soil_type, region, month, crops in keys:
+        for rank, (crop, confidence) in enumerate(crops):
+            entry = totals[(soil_type, region, month, crop)]
+            entry[0] += 1
+            entry[1] += 1 if rank == 0 else 0
+            entry[2] += confidence
+    return [key + tuple(values) for key, values in totals.items()]
+
+
+class RecommendationAnalytics:
+    def __init__(self, db):
+        self.db = db
+
+    def apply(self, conn, keys):
+        """Add rollup increments inside the caller's transaction"""
+        rows = aggregate(keys)
+        if rows:
+            conn.executemany(UPSERT_ROLLUP, rows)
+
+    def rebuild(self, batch_size=5000):
+        """Recompute every rollup from the raw recommendations table"""
+        with self.db.transaction() as conn:
+            conn.execute('DELETE FROM recommendation_rollups')
+            cursor = conn.execute(
+                'SELECT soil_type, climate_data, recommended_crops, created_at FROM recommendations'
+            )
+            processed = 0
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                keys = []
+                for soil_type, climate_data, recommended_crops, created_at in rows:
+                    try:
+                        climate = json.loads(climate_data or '{}')
+                        recommendations = json.loads(recommended_crops or '[]')
+                        when = datetime.fromisoformat(str(created_at))
+                    except ValueError:
+                        continue
+                    location = climate.get('query_location') or climate.get('location')
+                    keys.append(rollup_key(soil_type, location, recommendations, when))
+                self.apply(conn, keys)
+                processed += len(rows)
+        return processed
+
+    def _where(self, filters):
+        clauses = []
+        params = []
+        for dimension in DIMENSIONS:
+            value = filters.get(dimension)
+            if value:
+                clauses.append(f'{dimension} = ?')
+                params.append(NORMALIZERS.get(dimension, str.strip)(value))
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def top_crops(self, filters=None, limit=10):
+        """Most recommended crops for the given soil type / region / month filters"""
+        where, params = self._where(filters or {})
+        rows = self.db.query(f'''
+            SELECT crop,
+                   SUM(recommendation_count) AS recommendations,
+                   SUM(top_pick_count) AS top_picks,
+                   SUM(confidence_sum) / SUM(recommendation_count) AS avg_confidence
+            FROM recommendation_rollups{where}
+            GROUP BY crop
+            ORDER BY recommendations DESC, crop
+            LIMIT ?
+        ''', params + [limit])
+        for row in rows:
+            row['avg_confidence'] = round(row['avg_confidence'] or 0, 2)
+        return rows
+
+    def breakdown(self, dimension, filters=None, per_group=5):
+        """Top crops within each value of `dimension` (soil_type, region or month)"""
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown analytics dimension: {dimension}")
+        where, params = self._where(filters or {})
+        rows = self.db.query(f'''
+            SELECT {dimension} AS grp, crop,
+                   SUM(recommendation_count) AS recommendations,
+                   SUM(top_pick_count) AS top_picks
+            FROM recommendation_rollups{where}
+            GROUP BY {dimension}, crop
+            ORDER BY {dimension}, recommendations DESC, crop
+        ''', params)
+
+        groups = {}
+        for row in rows:
+            crops = groups.setdefault(row['grp'], [])
+            if len(crops) < per_group:
+                crops.append({
+                    'crop': row['crop'],
+                    'recommendations': row['recommendations'],
+                    'top_picks': row['top_picks']
+                })
+        return groups
+
+    def summary(self):
+        """Totals and the available values of each dimension"""
+        summary = {}
+        for dimension in DIMENSIONS:
+            rows = self.db.query(f'SELECT DISTINCT {dimension} AS value FROM recommendation_rollups ORDER BY value')
+            summary[dimension] = [row['value'] for row in rows]
+        totals = self.db.query(
+            'SELECT COALESCE(SUM(top_pick_count), 0) AS recommendations FROM recommendation_rollups'
+        )
+        summary['total_recommendations'] = totals[0]['recommendations']
+        return summary
+
+
+if __name__ == '__main__':
+    from database import create_database
+
+    parser = argparse.ArgumentParser(description='Maintain recommendation analytics rollups')
+    parser.add_argument('--rebuild', action='store_true', help='recompute rollups from raw history')
+    args = parser.parse_args()
+
+    db = create_database(os.getenv('DATABASE_URL', os.getenv('DATABASE_PATH', 'krushi.db')))
+    db.init_schema()
+    if args.rebuild:
+        print(f"Rebuilt rollups from {RecommendationAnalytics(db).rebuild()} recommendations")
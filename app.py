@@ -1,60 +1,412 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g, Response, stream_with_context, send_file, url_for
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
-import sqlite3
-from ml_models import CropRecommendationModel, WaterManagementAdvisor
-from weather_service import WeatherService
-from market_service import MarketService
-from location_service import LocationService
+import atexit
+import contextvars
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import metrics
+from logging_setup import configure_logging
+from services import LazyService, warm_up
+from persistence import RecommendationWriter
+from database import create_database
+from analytics import RecommendationAnalytics
+from http_encoding import install_json_provider, install_compression
+from response_cache import ResponseCache, recommendation_key
 
 # Load environment variables
 load_dotenv()
+configure_logging()
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'krushi-secret-key')
 CORS(app)
+install_json_provider(app)
+install_compression(app, min_size=int(os.getenv('COMPRESSION_MIN_SIZE', 1024)))
 
-# Initialize services
-crop_model = CropRecommendationModel()
-water_advisor = WaterManagementAdvisor()
-weather_service = WeatherService(os.getenv('OPENWEATHER_API_KEY'))
-market_service = MarketService(os.getenv('MARKET_API_KEY'))
-location_service = LocationService()
+PROCESS_STARTED = time.monotonic()
+
+# Trained model artifact; reused across restarts and shared with inference workers
+MODEL_PATH = os.getenv('MODEL_PATH', os.path.join('models', 'crop_model.joblib'))
+
+def build_crop_model():
+    from ml_models import CropRecommendationModel
+    processes = int(os.getenv('INFERENCE_PROCESSES', 0))
+    model = None
+    if os.path.exists(MODEL_PATH):
+        try:
+            model = CropRecommendationModel.load(MODEL_PATH)
+        except Exception as e:
+            logging.getLogger('krushi.model').warning("Could not load %s, retraining: %s", MODEL_PATH, e)
+    if model is None:
+        model = CropRecommendationModel()
+        if processes or MODEL_UPDATE_INTERVAL:
+            # Inference workers and the feedback updater load the model from disk, so persist it first
+            model.save(MODEL_PATH)
+    
+    if processes:
+        # Optional inference-server mode: forest evaluation runs in worker processes
+        from inference_pool import InferencePool
+        pool = InferencePool.for_model(model, MODEL_PATH, processes=processes)
+        atexit.register(pool.close)
+        model.set_engine(pool)
+    return model
+
+def build_water_advisor():
+    from ml_models import WaterManagementAdvisor
+    return WaterManagementAdvisor()
+
+def build_data_cache():
+    # Upstream weather, market and Gemini data; CACHE_URL adds a Redis-protocol tier shared by all nodes
+    from cache_backend import TieredCache
+    cache = TieredCache.from_url(os.getenv('CACHE_URL'), prefix=os.getenv('CACHE_PREFIX', 'krushi:'))
+    atexit.register(cache.close)
+    return cache
+
+def build_weather_service():
+    from weather_service import WeatherService
+    return WeatherService(
+        os.getenv('OPENWEATHER_API_KEY'),
+        calls_per_minute=int(os.getenv('OPENWEATHER_CALLS_PER_MINUTE', 60)),
+        base_url=os.getenv('OPENWEATHER_BASE_URL'),
+        cache=data_cache.get()
+    )
+
+def build_market_service():
+    from market_service import MarketService
+    return MarketService(os.getenv('MARKET_API_KEY'), cache=data_cache.get())
+
+def build_location_service():
+    from location_service import LocationService
+    return LocationService(
+        cache=data_cache.get(), cache_ttl=int(os.getenv('LOCATION_CACHE_TTL', 7 * 86400))
+    )
+
+# Optional per-climate-zone model shards, loaded on first use into a memory-bounded LRU
+MODEL_SHARDS_DIR = os.getenv('MODEL_SHARDS_DIR')
+
+def build_model_shards():
+    from model_shards import ModelShardRegistry
+    return ModelShardRegistry(
+        MODEL_SHARDS_DIR,
+        fallback=crop_model.get(),
+        max_bytes=int(float(os.getenv('MODEL_SHARDS_MAX_MB', 256)) * 1024 * 1024)
+    )
+
+def build_model_batcher():
+    # Concurrent requests share one model call; MODEL_BATCH_WAIT_MS bounds the latency this adds.
+    # The model is resolved per batch so a hot-swapped model is picked up
+    from micro_batcher import MicroBatcher
+    batcher = MicroBatcher(
+        (lambda inputs: model_shards.recommend_crops_batch(inputs)) if MODEL_SHARDS_DIR
+        else (lambda inputs: crop_model.recommend_crops_batch(inputs)),
+        max_batch=int(os.getenv('MODEL_BATCH_MAX_SIZE', 32)),
+        max_wait_ms=float(os.getenv('MODEL_BATCH_WAIT_MS', 2))
+    )
+    atexit.register(batcher.stop)
+    return batcher.start()
+
+def build_weather_prefetcher():
+    # Keep the most requested locations warm so requests rarely wait on OpenWeatherMap
+    from weather_service import WeatherPrefetcher
+    return WeatherPrefetcher(
+        weather_service.get(),
+        top_n=int(os.getenv('WEATHER_PREFETCH_TOP_N', 100)),
+        interval=int(os.getenv('WEATHER_PREFETCH_INTERVAL', 60))
+    )
+
+# Farmer outcome reports; the updater periodically warm-starts the model from them
+FEEDBACK_LOG_PATH = os.getenv('FEEDBACK_LOG_PATH', os.path.join('models', 'feedback.bin'))
+MODEL_UPDATE_INTERVAL = int(os.getenv('MODEL_UPDATE_INTERVAL', 0))
+
+def build_feedback_log():
+    from feedback import FeedbackLog
+    feedback = FeedbackLog(FEEDBACK_LOG_PATH)
+    atexit.register(feedback.close)
+    return feedback
+
+def swap_crop_model(model):
+    """Hot-swap a reloaded model into this process once its artifact changed on disk"""
+    current = crop_model.get()
+    if hasattr(current.engine, 'reload'):
+        # Inference workers reload the same artifact; the new model keeps serving through them
+        current.engine.reload()
+        model.set_engine(current.engine)
+    crop_model.replace(model)
+    if model_shards.ready:
+        # Set on the registry itself; assigning through the LazyService proxy would not reach it
+        model_shards.get().fallback = model
+    recommendation_cache.clear()
+    logging.getLogger('krushi.model').info("Serving model version %d", model.version)
+
+def build_model_updater():
+    from feedback import ModelUpdater
+    crop_model.get()  # the artifact exists once the model is built
+    updater = ModelUpdater(
+        MODEL_PATH,
+        feedback_log.get(),
+        on_update=swap_crop_model,
+        interval=MODEL_UPDATE_INTERVAL,
+        min_samples=int(os.getenv('MODEL_UPDATE_MIN_SAMPLES', 50)),
+        trees_per_update=int(os.getenv('MODEL_UPDATE_TREES', 10)),
+        max_trees=int(os.getenv('MODEL_MAX_TREES', 300))
+    )
+    atexit.register(updater.stop)
+    return updater.start()
+
+# Bulk jobs run on a local worker pool and write their results under JOBS_DIR
+# (absolute, since send_file would resolve a relative path against the app's root_path)
+JOBS_DIR = os.path.abspath(os.getenv('JOBS_DIR', 'jobs'))
+
+def build_job_manager():
+    from jobs import JobManager, make_processors
+    manager = JobManager(
+        JOBS_DIR,
+        make_processors(crop_model, water_advisor, weather_service, plan_catalog_portfolios),
+        workers=int(os.getenv('JOB_WORKERS', 2)),
+        chunk_size=int(os.getenv('JOB_CHUNK_SIZE', 256)),
+        retention_seconds=int(float(os.getenv('JOB_RETENTION_HOURS', 24)) * 3600),
+        max_input_bytes=int(os.getenv('JOB_MAX_INPUT_MB', 256)) * 1024 * 1024
+    )
+    atexit.register(manager.shutdown)
+    return manager
+
+# Services are built on first use (or by the warm-up below) so the app can
+# answer health checks before pandas, scikit-learn and Gemini are loaded
+crop_model = LazyService('crop_model', build_crop_model)
+model_shards = LazyService('model_shards', build_model_shards)
+model_batcher = LazyService('model_batcher', build_model_batcher)
+water_advisor = LazyService('water_advisor', build_water_advisor)
+data_cache = LazyService('data_cache', build_data_cache)
+weather_service = LazyService('weather_service', build_weather_service)
+market_service = LazyService('market_service', build_market_service)
+location_service = LazyService('location_service', build_location_service)
+weather_prefetcher = LazyService('weather_prefetcher', build_weather_prefetcher)
+feedback_log = LazyService('feedback_log', build_feedback_log)
+model_updater = LazyService('model_updater', build_model_updater)
+job_manager = LazyService('job_manager', build_job_manager)
+
+# Services that must be built before /ready reports the instance as ready
+READINESS = {'crop_model': crop_model, 'water_advisor': water_advisor, 'weather_service': weather_service}
+
+def start_weather_prefetcher():
+    if os.getenv('OPENWEATHER_API_KEY'):
+        weather_prefetcher.start()
+
+def start_model_updater():
+    if MODEL_UPDATE_INTERVAL:
+        model_updater.get()
+
+def warm_crop_model():
+    # Train the forest and run one inference so the first real request is fast
+    crop_model.recommend_crops(
+        soil_type='loamy', temperature=25, humidity=60, rainfall=100, water_availability='medium'
+    )
+
+# Data access goes through the pluggable database layer (SQLite by default)
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'krushi.db')
+db = create_database(os.getenv('DATABASE_URL', DATABASE_PATH))
 
 def init_db():
     """Initialize the database"""
-    conn = sqlite3.connect('krushi.db')
-    cursor = conn.cursor()
+    db.init_schema()
+
+init_db()
+
+# Recommendation history is persisted in batches by a background thread,
+# which also maintains the rollups the analytics endpoints read from
+analytics = RecommendationAnalytics(db)
+recommendation_writer = RecommendationWriter(
+    db,
+    analytics=analytics,
+    flush_interval_ms=int(os.getenv('DB_FLUSH_INTERVAL_MS', 200)),
+    batch_size=int(os.getenv('DB_FLUSH_BATCH_SIZE', 100))
+).start()
+atexit.register(recommendation_writer.stop)
+
+# Market lookups for the top recommended crops run concurrently
+MARKET_CROPS = 5
+market_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('MARKET_LOOKUP_WORKERS', 8)), thread_name_prefix='market-lookup'
+)
+
+# Repeat recommendation queries for the same inputs and weather snapshot are answered from memory
+recommendation_cache = ResponseCache(
+    'recommend_crops',
+    max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', 1024)),
+    ttl=int(os.getenv('RESPONSE_CACHE_TTL', 300))
+)
+
+# Background workers start regardless of WARMUP_ON_START, so their schedules never wait on traffic
+warm_up([
+    ('model_updater', start_model_updater),
+    ('weather_prefetcher', start_weather_prefetcher)
+])
+
+# /ready rebuilds any readiness service this thread left unbuilt (warm-up disabled or failed)
+readiness_warm_up = None
+if os.getenv('WARMUP_ON_START', 'true').lower() in ('1', 'true', 'yes'):
+    readiness_warm_up = warm_up([
+        ('crop_model', warm_crop_model),
+        ('model_batcher', model_batcher.get),
+        ('water_advisor', water_advisor.get),
+        ('weather_service', weather_service.get),
+        ('market_service', market_service.get),
+        ('location_service', location_service.get)
+    ])
+
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    g.timing_token = metrics.start_request()
+
+@app.after_request
+def add_server_timing(response):
+    token = g.pop('timing_token', None)
+    if token is not None and g.get('timed_stream'):
+        # The body has not been generated yet; timed_stream records the request once it has
+        metrics.cancel_request(token)
+    elif token is not None:
+        elapsed = time.perf_counter() - g.request_started
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        response.headers['Server-Timing'] = metrics.finish_request(token, endpoint, response.status_code, elapsed)
+    return response
+
+def timed_stream(events):
+    """Wrap a streamed body so the request is timed until its last event, including calls made while streaming.
     
-    # Create users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            location TEXT NOT NULL,
-            farm_size REAL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    Streamed responses carry no Server-Timing header: headers are sent before the body exists.
+    """
+    g.timed_stream = True
+    started = g.request_started
+    endpoint = request.url_rule.rule
     
-    # Create recommendations table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS recommendations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            soil_type TEXT,
-            climate_data TEXT,
-            water_availability TEXT,
-            recommended_crops TEXT,
-            confidence_score REAL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
+    def generate():
+        token = metrics.start_request()
+        try:
+            yield from events
+        finally:
+            metrics.finish_request(token, endpoint, 200, time.perf_counter() - started)
+    
+    return stream_with_context(generate())
+
+def conditional_json(payload, max_age):
+    """JSON response with a content-hash ETag that answers If-None-Match with 304"""
+    response = app.response_class(app.json.dumps(payload), mimetype='application/json')
+    response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+    response.cache_control.public = True
+    response.cache_control.max_age = int(max_age)
+    return response.make_conditional(request)
+
+def get_coordinates(source):
+    """Return (lat, lon) from a request payload or query string, or None"""
+    try:
+        lat, lon = float(source.get('lat')), float(source.get('lon'))
+    except (TypeError, ValueError):
+        return None
+    if -90 <= lat <= 90 and -180 <= lon <= 180:
+        return lat, lon
+    return None
+
+def get_request_weather(data):
+    """Current weather for a recommendation request, preferring coordinates when supplied"""
+    coordinates = get_coordinates(data)
+    if coordinates:
+        return weather_service.get_current_weather_at(*coordinates)
+    return weather_service.get_current_weather(data.get('location'))
+
+def get_request_cache_key(data, weather_data):
+    return recommendation_key(
+        data, weather_data, get_coordinates(data), weather_service.coordinate_key, crop_model.version
+    )
+
+def record_recommendations(data, weather_data, recommendations):
+    """Queue a request's recommendations for persistence and analytics"""
+    recommendation_writer.record(
+        soil_type=data.get('soil_type'),
+        water_availability=data.get('water_availability'),
+        weather=weather_data,
+        recommendations=recommendations,
+        user_id=data.get('user_id'),
+        location=data.get('location')
+    )
+
+def get_request_recommendations(data, weather_data):
+    """Score crops for a request and queue the result for persistence"""
+    item = {
+        'soil_type': data.get('soil_type'),
+        'temperature': weather_data.get('temperature', 25),
+        'humidity': weather_data.get('humidity', 60),
+        'rainfall': weather_data.get('rainfall', 100),
+        'water_availability': data.get('water_availability')
+    }
+    if MODEL_SHARDS_DIR:
+        # Route to the shard for the request's agro-climatic zone
+        coordinates = get_coordinates(data)
+        item['climate_zone'] = location_service.get_climate_zone(
+            data.get('location'), coordinates[0] if coordinates else None
         )
-    ''')
+    recommendations = model_batcher.submit(item)
     
-    conn.commit()
-    conn.close()
+    record_recommendations(data, weather_data, recommendations)
+    return recommendations
+
+def iter_market_trends(crops, columnar=False):
+    """Yield (crop, trend) pairs as each concurrent market lookup completes"""
+    futures = {}
+    for crop in crops:
+        # Each lookup runs in a copy of this context so its timings land on the current request
+        context = contextvars.copy_context()
+        futures[market_executor.submit(context.run, market_service.get_price_trend, crop, columnar=columnar)] = crop
+    for future in as_completed(futures):
+        yield futures[future], future.result()
+
+def request_farm_error(data):
+    """Message for request fields the portfolio planner cannot use, or None"""
+    from portfolio import check_farm
+    try:
+        check_farm({key: data.get(key) for key in ('farm_size', 'soil_type', 'water_availability')})
+    except ValueError as e:
+        return str(e)
+    return None
+
+def plan_farm_portfolio(data, weather_data, recommendations):
+    """Split the request's farm_size across the recommended crops by expected revenue"""
+    from portfolio import plan_portfolios
+    crops = [crop['crop'] for crop in recommendations]
+    farm = {
+        'farm_size': data.get('farm_size') or 1.0,
+        'soil_type': data.get('soil_type'),
+        'water_availability': data.get('water_availability'),
+        'temperature': weather_data.get('temperature', 25),
+        'humidity': weather_data.get('humidity', 60),
+        'rainfall': weather_data.get('rainfall', 100),
+        'crops': crops
+    }
+    return plan_portfolios([farm], prices=market_service.current_prices(crops))[0]
+
+def plan_catalog_portfolios(farms):
+    """Portfolios for a batch of farms, choosing from the whole catalog at current market prices"""
+    from portfolio import plan_portfolios
+    import crop_catalog
+    prices = market_service.current_prices([record.name for record in crop_catalog.CROPS])
+    return plan_portfolios(farms, prices=prices)
+
+def recommendation_response(result, weather_data):
+    return {
+        'success': True,
+        'recommendations': result['recommendations'],
+        'weather': weather_data,
+        'market_trends': result['market_trends'],
+        'portfolio': result['portfolio']
+    }
+
+def sse_event(event, payload):
+    # The app's JSON provider emits single-line output, as the data field requires
+    return f"event: {event}\ndata: {app.json.dumps(payload)}\n\n"
 
 @app.route('/')
 def index():
@@ -66,36 +418,192 @@ def recommend_crops():
     """Get crop recommendations based on input parameters"""
     try:
         data = request.json
+        error = request_farm_error(data)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
         
-        # Extract parameters
-        soil_type = data.get('soil_type')
-        location = data.get('location')
-        water_availability = data.get('water_availability')
-        farm_size = data.get('farm_size', 1.0)
-        
-        # Get weather data for location
-        weather_data = weather_service.get_current_weather(location)
+        weather_data = get_request_weather(data)
+        cache_key = get_request_cache_key(data, weather_data)
+        cached = recommendation_cache.get(cache_key)
+        if cached is not None:
+            record_recommendations(data, weather_data, cached['recommendations'])
+            return jsonify(recommendation_response(cached, weather_data))
         
-        # Get crop recommendations
-        recommendations = crop_model.recommend_crops(
-            soil_type=soil_type,
-            temperature=weather_data.get('temperature', 25),
-            humidity=weather_data.get('humidity', 60),
-            rainfall=weather_data.get('rainfall', 100),
-            water_availability=water_availability
-        )
+        recommendations = get_request_recommendations(data, weather_data)
         
-        # Get market trends for recommended crops
-        market_data = {}
-        for crop in recommendations[:5]:  # Top 5 crops for market data
-            market_data[crop['crop']] = market_service.get_price_trend(crop['crop'])
+        # Get market trends for the top recommended crops, keeping recommendation order
+        crops = [crop['crop'] for crop in recommendations[:MARKET_CROPS]]
+        trends = dict(iter_market_trends(crops, columnar=data.get('history_format') == 'columnar'))
+        market_data = {crop: trends[crop] for crop in crops}
         
-        return jsonify({
-            'success': True,
+        result = {
             'recommendations': recommendations,
-            'weather': weather_data,
-            'market_trends': market_data
-        })
+            'market_trends': market_data,
+            'portfolio': plan_farm_portfolio(data, weather_data, recommendations)
+        }
+        recommendation_cache.put(cache_key, result)
+        return jsonify(recommendation_response(result, weather_data))
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/recommend-crops/stream', methods=['POST'])
+def recommend_crops_stream():
+    """Server-Sent Events variant of recommend-crops.
+    
+    Emits `weather`, then `recommendations`, then one `market` event per crop
+    as its lookup completes, then `portfolio`, and finally `done` (or `error`).
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'JSON body required'}), 400
+    # Reject bad input before the stream starts rather than with an error event after it
+    error = request_farm_error(data)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    
+    def generate():
+        try:
+            weather_data = get_request_weather(data)
+            yield sse_event('weather', weather_data)
+            
+            # Shares the recommend-crops cache: a hit replays the same events from memory
+            cache_key = get_request_cache_key(data, weather_data)
+            cached = recommendation_cache.get(cache_key)
+            if cached is not None:
+                record_recommendations(data, weather_data, cached['recommendations'])
+                yield sse_event('recommendations', cached['recommendations'])
+                for crop, trend in cached['market_trends'].items():
+                    yield sse_event('market', {'crop': crop, 'trend': trend})
+                yield sse_event('portfolio', cached['portfolio'])
+                yield sse_event('done', {'success': True})
+                return
+            
+            recommendations = get_request_recommendations(data, weather_data)
+            yield sse_event('recommendations', recommendations)
+            
+            crops = [crop['crop'] for crop in recommendations[:MARKET_CROPS]]
+            columnar = data.get('history_format') == 'columnar'
+            trends = {}
+            for crop, trend in iter_market_trends(crops, columnar=columnar):
+                trends[crop] = trend
+                yield sse_event('market', {'crop': crop, 'trend': trend})
+            
+            portfolio = plan_farm_portfolio(data, weather_data, recommendations)
+            yield sse_event('portfolio', portfolio)
+            recommendation_cache.put(cache_key, {
+                'recommendations': recommendations,
+                'market_trends': {crop: trends[crop] for crop in crops},
+                'portfolio': portfolio
+            })
+            yield sse_event('done', {'success': True})
+        except Exception as e:
+            yield sse_event('error', {'success': False, 'error': str(e)})
+    
+    return Response(timed_stream(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop reverse proxies from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })
+
+# Upper bound on farms per synchronous portfolio request
+PORTFOLIO_MAX_FARMS = int(os.getenv('PORTFOLIO_MAX_FARMS', 5000))
+
+@app.route('/api/portfolio', methods=['POST'])
+def portfolio_plans():
+    """Crop area plans for a batch of farms (each with its own size, soil, water and weather)"""
+    try:
+        data = request.get_json(silent=True)
+        farms = data.get('farms') if isinstance(data, dict) else None
+        if not isinstance(farms, list) or not all(isinstance(farm, dict) for farm in farms):
+            return jsonify({'success': False, 'error': 'farms must be a list of objects'}), 400
+        if len(farms) > PORTFOLIO_MAX_FARMS:
+            return jsonify({'success': False, 'error': f'At most {PORTFOLIO_MAX_FARMS} farms per request'}), 400
+        
+        return jsonify({'success': True, 'portfolios': plan_catalog_portfolios(farms)})
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def job_view(job):
+    # The owning process is internal bookkeeping
+    return {key: value for key, value in job.items() if key not in ('pid', 'owner')}
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue a bulk job: JSON {type, format, items}, or an NDJSON body with ?type=&format="""
+    try:
+        if request.mimetype == 'application/x-ndjson':
+            # Streamed straight to disk, so large uploads are never held in memory
+            job = job_manager.submit(
+                request.args.get('type'), request.args.get('format', 'ndjson'), source=request.stream
+            )
+        else:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict) or not isinstance(data.get('items'), list):
+                return jsonify({'success': False, 'error': 'JSON body with an items list required'}), 400
+            job = job_manager.submit(data.get('type'), data.get('format', 'ndjson'), items=data['items'])
+        
+        response = jsonify({'success': True, 'job': job_view(job)})
+        response.headers['Location'] = url_for('job_status', job_id=job['id'])
+        return response, 202
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """State and progress of a bulk job"""
+    job = job_manager.status(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify({'success': True, 'job': job_view(job)})
+
+@app.route('/api/jobs/<job_id>/results')
+def job_results(job_id):
+    """Stream a completed job's NDJSON or CSV results from disk"""
+    job = job_manager.status(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    if job['state'] != 'completed':
+        return jsonify({'success': False, 'error': f"Job is {job['state']}", 'job': job_view(job)}), 409
+    from jobs import FORMATS
+    return send_file(
+        job_manager.result_path(job_id), mimetype=FORMATS[job['format']],
+        as_attachment=True, download_name=f"{job_id}.{job['format']}"
+    )
+
+@app.route('/api/feedback', methods=['POST'])
+def crop_feedback():
+    """Record which crop did well under given conditions, for incremental model updates"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'JSON body required'}), 400
+        
+        crop = str(data.get('crop') or '').strip().lower()
+        error = feedback_log.validate(data.get('soil_type'), data.get('water_availability'), crop)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        
+        # Conditions default to the current weather at the farm's location
+        conditions = {key: data.get(key) for key in ('temperature', 'humidity', 'rainfall')}
+        if any(value is None for value in conditions.values()):
+            weather_data = get_request_weather(data)
+            defaults = {'temperature': 25, 'humidity': 60, 'rainfall': 100}
+            for key, value in conditions.items():
+                if value is None:
+                    conditions[key] = weather_data.get(key, defaults[key])
+        error = feedback_log.validate_conditions(**conditions)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        
+        feedback_log.append(data['soil_type'], data['water_availability'], crop, **conditions)
+        return jsonify({'success': True}), 202
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -111,7 +619,11 @@ def water_management():
         location = data.get('location')
         
         # Get weather forecast
-        weather_forecast = weather_service.get_forecast(location)
+        coordinates = get_coordinates(data)
+        if coordinates:
+            weather_forecast = weather_service.get_forecast_at(*coordinates)
+        else:
+            weather_forecast = weather_service.get_forecast(location)
         
         # Get water management advice
         advice = water_advisor.get_irrigation_advice(
@@ -139,6 +651,7 @@ def detect_location():
             return jsonify({
                 'success': True,
                 'location': location_data['location_string'],
+                'coordinates': {'lat': location_data['lat'], 'lon': location_data['lon']},
                 'details': enhanced_data
             })
         else:
@@ -157,11 +670,31 @@ def get_weather(location):
         weather_data = weather_service.get_current_weather(location)
         forecast = weather_service.get_forecast(location)
         
-        return jsonify({
+        return conditional_json({
             'success': True,
             'current': weather_data,
             'forecast': forecast
-        })
+        }, weather_service.remaining_ttl(weather_service.location_key(location)))
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/weather')
+def get_weather_at_coordinates():
+    """Get weather data for lat/lon query parameters"""
+    try:
+        coordinates = get_coordinates(request.args)
+        if coordinates is None:
+            return jsonify({'success': False, 'error': 'lat and lon query parameters are required'}), 400
+        
+        weather_data = weather_service.get_current_weather_at(*coordinates)
+        forecast = weather_service.get_forecast_at(*coordinates)
+        
+        return conditional_json({
+            'success': True,
+            'current': weather_data,
+            'forecast': forecast
+        }, weather_service.remaining_ttl(weather_service.coordinate_key(*coordinates)))
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -170,18 +703,84 @@ def get_weather(location):
 def get_market_trends(crop):
     """Get market trends for a specific crop"""
     try:
-        trends = market_service.get_price_trend(crop)
+        trends = market_service.get_price_trend(crop, columnar=request.args.get('history') == 'columnar')
         predictions = market_service.predict_prices(crop)
         
-        return jsonify({
+        return conditional_json({
             'success': True,
             'trends': trends,
             'predictions': predictions
-        })
+        }, market_service.expires_in(crop))
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def get_analytics_filters():
+    return {dimension: request.args.get(dimension) for dimension in ('soil_type', 'region', 'month')}
+
+@app.route('/api/analytics/summary')
+def analytics_summary():
+    """Totals and available soil types, regions and months"""
+    try:
+        return jsonify({'success': True, 'summary': analytics.summary()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/analytics/top-crops')
+def analytics_top_crops():
+    """Most recommended crops, optionally filtered by soil_type, region and month"""
+    try:
+        limit = min(int(request.args.get('limit', 10)), 100)
+        return jsonify({
+            'success': True,
+            'filters': get_analytics_filters(),
+            'crops': analytics.top_crops(get_analytics_filters(), limit)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/analytics/by-<dimension>')
+def analytics_breakdown(dimension):
+    """Top crops per soil type, region or month"""
+    dimension = {'soil': 'soil_type'}.get(dimension, dimension)
+    if dimension not in ('soil_type', 'region', 'month'):
+        return jsonify({'success': False, 'error': f'Unknown dimension: {dimension}'}), 404
+    try:
+        per_group = min(int(request.args.get('limit', 5)), 50)
+        return jsonify({
+            'success': True,
+            'dimension': dimension,
+            'filters': get_analytics_filters(),
+            'groups': analytics.breakdown(dimension, get_analytics_filters(), per_group)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/health')
+def health():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({'status': 'ok', 'uptime_seconds': round(time.monotonic() - PROCESS_STARTED, 3)})
+
+@app.route('/ready')
+def ready():
+    """Readiness: 200 once the model and core services are initialized, 503 while they are being built"""
+    services = {}
+    for name, service in READINESS.items():
+        if service.ready:
+            services[name] = {'ready': True, 'init_seconds': round(service.build_seconds, 3)}
+        else:
+            services[name] = {'ready': False, 'error': str(service.error) if service.error else None}
+    is_ready = all(status['ready'] for status in services.values())
+    global readiness_warm_up
+    if not is_ready and (readiness_warm_up is None or not readiness_warm_up.is_alive()):
+        # Build in the background so the probe itself stays fast
+        readiness_warm_up = warm_up([(name, service.get) for name, service in READINESS.items() if not service.ready])
+    return jsonify({'ready': is_ready, 'services': services}), 200 if is_ready else 503
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Expose latency histograms in the Prometheus text format"""
+    return Response(metrics.registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
-    init_db()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,285 @@
+"""Benchmark suite for the Krushi models, services and API routes.
+
+Each benchmark reports ops/sec, p50/p95/p99 latency and the process peak RSS
+after it ran. Results are written as JSON (one file per commit by default)
+so runs can be compared to catch performance regressions:
+
+    python benchmark.py                                  # run everything
+    python benchmark.py --filter route                   # only matching names
+    python benchmark.py --compare bench_results/abc123.json --threshold 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from load_test import LOCATIONS, SOIL_TYPES, WATER_LEVELS, CROPS, percentile
+
+RESULTS_DIR = 'bench_results'
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 1)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_benchmark(name, func, iterations=200, warmup=5, items_per_call=1):
+    """Time `func` for `iterations` calls after `warmup` untimed calls"""
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    total_s = sum(samples) / 1000
+    ordered = sorted(samples)
+    result = {
+        'name': name,
+        'iterations': iterations,
+        'ops_per_sec': round(iterations * items_per_call / total_s, 2) if total_s else 0.0,
+        'mean_ms': round(total_s * 1000 / iterations, 3),
+        'p50_ms': round(percentile(ordered, 50), 3),
+        'p95_ms': round(percentile(ordered, 95), 3),
+        'p99_ms': round(percentile(ordered, 99), 3),
+        'peak_rss_mb': peak_rss_mb()
+    }
+    if items_per_call != 1:
+        result['items_per_call'] = items_per_call
+    return result
+
+
+def _random_input(rng):
+    return {
+        'soil_type': rng.choice(SOIL_TYPES),
+        'temperature': rng.uniform(10, 40),
+        'humidity': rng.uniform(30, 95),
+        'rainfall': rng.uniform(0, 300),
+        'water_availability': rng.choice(WATER_LEVELS)
+    }
+
+
+def build_benchmarks(quick=False):
+    """Return (name, factory, options) tuples.
+
+    Each factory builds its fixtures and returns the callable to time, so
+    setup cost stays out of the timed loop and peak RSS grows in run order.
+    """
+    # Routes must not depend on the network, so force the mock weather and location paths
+    os.environ['OPENWEATHER_API_KEY'] = ''
+    os.environ['GEMINI_API_KEY'] = ''
+    # Keep benchmark writes out of the real database
+    os.environ.setdefault('DATABASE_PATH', os.path.join(tempfile.mkdtemp(prefix='krushi-bench-'), 'krushi.db'))
+
+    rng = random.Random(42)
+    scale = 0.2 if quick else 1.0
+    fixtures = {}
+
+    def iterations(count):
+        return max(3, int(count * scale))
+
+    def fixture(name, create):
+        if name not in fixtures:
+            fixtures[name] = create()
+        return fixtures[name]
+
+    def model():
+        from ml_models import CropRecommendationModel
+        return fixture('model', CropRecommendationModel)
+
+    def advisor():
+        from ml_models import WaterManagementAdvisor
+        return fixture('advisor', WaterManagementAdvisor)
+
+    def market():
+        from market_service import MarketService
+        return fixture('market', lambda: MarketService(None))
+
+    def forecast():
+        from weather_service import WeatherService
+        return fixture('forecast', lambda: WeatherService(None).get_forecast('Pune'))
+
+    def client():
+        def create():
+            import app as krushi_app
+            return krushi_app.app.test_client()
+        return fixture('client', create)
+
+    def train():
+        from ml_models import CropRecommendationModel
+        return CropRecommendationModel
+
+    def recommend():
+        return lambda: model().recommend_crops(**_random_input(rng))
+
+    def recommend_batch():
+        batch = [_random_input(rng) for _ in range(64)]
+        return lambda: model().recommend_crops_batch(batch)
+
+    def encoded_rows(count):
+        crop_model = model()
+        return [crop_model._encode_input(_random_input(rng)) for _ in range(count)]
+
+    def sklearn_proba():
+        import pandas as pd
+        rows = pd.DataFrame(encoded_rows(1), columns=model().feature_names)
+        return lambda: model().model.predict_proba(rows)
+
+    def flat_proba():
+        import numpy as np
+        rows = np.array(encoded_rows(1), dtype=np.float64)
+        return lambda: model().engine.predict_proba(rows)
+
+    def portfolio_batch():
+        from portfolio import plan_portfolios
+        farms = [dict(_random_input(rng), farm_size=rng.choice([0.5, 1.0, 2.5, 5.0])) for _ in range(1000)]
+        return lambda: plan_portfolios(farms)
+
+    def irrigation():
+        return lambda: advisor().get_irrigation_advice(rng.choice(CROPS), rng.choice(SOIL_TYPES), forecast())
+
+    def price_trend():
+        return lambda: market().get_price_trend(rng.choice(CROPS))
+
+    def predict_prices():
+        return lambda: market().predict_prices(rng.choice(CROPS))
+
+    def route_get(path_factory):
+        def factory():
+            test_client = client()
+            return lambda: test_client.get(path_factory())
+        return factory
+
+    def recommend_route():
+        test_client = client()
+        return lambda: test_client.post('/api/recommend-crops', json={
+            'location': rng.choice(LOCATIONS),
+            'soil_type': rng.choice(SOIL_TYPES),
+            'water_availability': rng.choice(WATER_LEVELS),
+            'farm_size': 1.0
+        })
+
+    def water_route():
+        test_client = client()
+        return lambda: test_client.post('/api/water-management', json={
+            'crop_type': rng.choice(CROPS),
+            'soil_type': rng.choice(SOIL_TYPES),
+            'location': rng.choice(LOCATIONS)
+        })
+
+    return [
+        ('model.train', train, {'iterations': iterations(5), 'warmup': 0}),
+        ('model.recommend_crops', recommend, {'iterations': iterations(200)}),
+        ('model.recommend_crops_batch[64]', recommend_batch,
+         {'iterations': iterations(50), 'items_per_call': 64}),
+        ('model.predict_proba[sklearn]', sklearn_proba, {'iterations': iterations(200)}),
+        ('model.predict_proba[flat]', flat_proba, {'iterations': iterations(200)}),
+        ('portfolio.plan[1000 farms]', portfolio_batch, {'iterations': iterations(10), 'items_per_call': 1000}),
+        ('water.get_irrigation_advice', irrigation, {'iterations': iterations(2000)}),
+        ('market.get_price_trend', price_trend, {'iterations': iterations(2000)}),
+        ('market.predict_prices', predict_prices, {'iterations': iterations(2000)}),
+        ('route.index', route_get(lambda: '/'), {'iterations': iterations(500)}),
+        ('route.recommend_crops', recommend_route, {'iterations': iterations(200)}),
+        ('route.water_management', water_route, {'iterations': iterations(500)}),
+        ('route.detect_location', route_get(lambda: '/api/detect-location'), {'iterations': iterations(20)}),
+        ('route.weather', route_get(lambda: f"/api/weather/{rng.choice(LOCATIONS)}"),
+         {'iterations': iterations(500)}),
+        ('route.weather_coordinates',
+         route_get(lambda: f"/api/weather?lat={rng.uniform(8, 35):.4f}&lon={rng.uniform(68, 97):.4f}"),
+         {'iterations': iterations(500)}),
+        ('route.market_trends', route_get(lambda: f"/api/market-trends/{rng.choice(CROPS)}"),
+         {'iterations': iterations(500)})
+    ]
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regressions relative to a baseline result file"""
+    previous = {item['name']: item for item in baseline['benchmarks']}
+    regressions = []
+    for item in results['benchmarks']:
+        before = previous.get(item['name'])
+        if before is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if before[metric] and item[metric] > before[metric] * (1 + threshold):
+                regressions.append(f"{item['name']}: {metric} {before[metric]} -> {item[metric]}")
+        if before['ops_per_sec'] and item['ops_per_sec'] < before['ops_per_sec'] / (1 + threshold):
+            regressions.append(f"{item['name']}: ops_per_sec {before['ops_per_sec']} -> {item['ops_per_sec']}")
+    return regressions
+
+
+def print_results(results):
+    header = f"{'benchmark':<34}{'ops/sec':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rss MB':>9}"
+    print(header)
+    print('-' * len(header))
+    for item in results['benchmarks']:
+        print(f"{item['name']:<34}{item['ops_per_sec']:>12}{item['p50_ms']:>10}"
+              f"{item['p95_ms']:>10}{item['p99_ms']:>10}{item['peak_rss_mb']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Krushi benchmark suite')
+    parser.add_argument('--filter', help='only run benchmarks whose name contains this text')
+    parser.add_argument('--quick', action='store_true', help='run fewer iterations')
+    parser.add_argument('--output', help=f'result file (default {RESULTS_DIR}/<commit>.json)')
+    parser.add_argument('--compare', help='baseline result file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown before failing')
+    args = parser.parse_args()
+
+    revision = git_revision()
+    results = {
+        'commit': revision,
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'benchmarks': []
+    }
+
+    for name, factory, options in build_benchmarks(quick=args.quick):
+        if args.filter and args.filter not in name:
+            continue
+        results['benchmarks'].append(run_benchmark(name, factory(), **options))
+
+    print_results(results)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{revision}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print('Performance regressions:')
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print('No regressions beyond threshold')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
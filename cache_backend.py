@@ -0,0 +1,398 @@
+"""Two-tier cache for upstream data (weather, market prices, Gemini lookups).
+
+`TieredCache` keeps an in-process tier and, when `CACHE_URL` points at a
+Redis-protocol server, a shared tier that every app node reads and writes,
+so a place fetched by one node is served from cache by all of them.
+
+Values are stored in the shared tier as a versioned JSON envelope. Plain
+dicts and lists round-trip as they are. Other types are registered with
+`cacheable` and provide `to_cache()` / `from_cache()`. Every node decodes
+entries to the same types the in-process tier holds.
+
+`get_or_load` guards against stampedes at two levels: concurrent misses in
+one process share a single load, and across nodes the loader first takes a
+`SET NX` lock, while other nodes poll for the value it writes. If the shared
+tier is unreachable the cache logs it, keeps serving from the in-process
+tier, and tries the server again after `retry_after` seconds.
+"""
+import json
+import logging
+import socket
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+import metrics
+
+logger = logging.getLogger('krushi.cache')
+
+CODEC_VERSION = 1
+_TYPES = {}
+
+
+def cacheable(cls):
+    """Class decorator registering a type with to_cache() / from_cache(data) for the shared tier"""
+    _TYPES[cls.__name__] = cls
+    return cls
+
+
+def encode(value):
+    cls = type(value)
+    if _TYPES.get(cls.__name__) is cls:
+        envelope = {'v': CODEC_VERSION, 't': cls.__name__, 'd': value.to_cache()}
+    else:
+        envelope = {'v': CODEC_VERSION, 'd': value}
+    return json.dumps(envelope, separators=(',', ':')).encode('utf-8')
+
+
+def decode(data):
+    """Value from an encoded entry, or None for entries written by an incompatible version"""
+    try:
+        envelope = json.loads(data)
+        if envelope.get('v') != CODEC_VERSION:
+            return None
+        if 't' in envelope:
+            return _TYPES[envelope['t']].from_cache(envelope['d'])
+        return envelope['d']
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.warning("Ignoring undecodable cache entry: %s", e)
+        return None
+
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+
+class RespClient:
+    """Minimal Redis protocol (RESP2) client with a small connection pool.
+
+    Accepts redis://[:password@]host[:port][/db] URLs.
+    """
+
+    def __init__(self, url, timeout=0.5, max_idle=8):
+        parsed = urlparse(url)
+        if parsed.scheme != 'redis':
+            raise ValueError(f"Unsupported cache URL: {url}")
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = (sock, sock.makefile('rb'))
+        setup = []
+        if self.password:
+            setup.append(('AUTH', self.password))
+        if self.db:
+            setup.append(('SELECT', self.db))
+        if setup:
+            self._exchange(connection, setup)
+        return connection
+
+    @staticmethod
+    def _encode(command):
+        parts = [b'*%d\r\n' % len(command)]
+        for arg in command:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    @classmethod
+    def _read_reply(cls, reader):
+        line = reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError("connection closed by cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode('utf-8')
+        if kind == b'-':
+            return RespError(rest.decode('utf-8'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("connection closed by cache server")
+            return data[:-2]
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [cls._read_reply(reader) for _ in range(length)]
+        raise ConnectionError(f"unexpected reply from cache server: {line[:20]!r}")
+
+    def _exchange(self, connection, commands):
+        sock, reader = connection
+        sock.sendall(b''.join(self._encode(command) for command in commands))
+        replies = [self._read_reply(reader) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def pipeline(self, *commands):
+        """Send several commands in one round trip and return their replies"""
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            connection = self._connect()
+        try:
+            replies = self._exchange(connection, commands)
+        except RespError:
+            self._release(connection)
+            raise
+        except Exception:
+            connection[0].close()
+            raise
+        self._release(connection)
+        return replies
+
+    def execute(self, *command):
+        return self.pipeline(command)[0]
+
+    def _release(self, connection):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(connection)
+                return
+        connection[0].close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock, _ in idle:
+            sock.close()
+
+
+class LocalCache:
+    """In-process tier: a dict of (expires_at, value) that drops expired entries as it fills"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def set(self, key, value, ttl):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now + ttl, value)
+            if len(self._entries) > self.max_entries:
+                self._entries = {k: entry for k, entry in self._entries.items() if entry[0] > now}
+                # Still full of live entries: drop the oldest inserted
+                while len(self._entries) > self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+
+    def remaining_ttl(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        return max(0, entry[0] - time.monotonic()) if entry is not None else 0
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TieredCache:
+    """In-process cache in front of an optional shared Redis-protocol tier"""
+
+    def __init__(self, shared=None, prefix='krushi:', local=None, lock_ttl=15, poll_interval=0.05,
+                 retry_after=30):
+        self.local = local or LocalCache()
+        self.shared = shared
+        self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self.retry_after = retry_after
+        self._down_until = 0
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        help_text = 'Upstream data cache lookups by tier and result'
+        self._counters = {
+            result: metrics.registry.counter('krushi_cache_requests_total', help_text, result=result)
+            for result in ('local_hit', 'shared_hit', 'miss')
+        }
+        self._errors = metrics.registry.counter('krushi_cache_shared_errors_total', 'Failed shared cache calls')
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """Local-only cache when url is empty, otherwise local plus a shared tier at url"""
+        return cls(RespClient(url) if url else None, **kwargs)
+
+    def _shared_call(self, default, *commands):
+        """Replies from the shared tier, or `default` when it is absent or unreachable"""
+        if self.shared is None or time.monotonic() < self._down_until:
+            return default
+        try:
+            return self.shared.pipeline(*commands)
+        except (OSError, RespError) as e:
+            self._errors.inc()
+            self._down_until = time.monotonic() + self.retry_after
+            logger.warning("Shared cache unavailable, using the local tier for %ds: %s", self.retry_after, e)
+            return default
+
+    def _shared_get(self, key):
+        """(value, remaining seconds) from the shared tier, or (None, 0)"""
+        value, pttl = self._shared_call((None, -2), ('GET', self.prefix + key), ('PTTL', self.prefix + key))
+        if value is None:
+            return None, 0
+        value = decode(value)
+        return value, (pttl / 1000 if pttl > 0 else 0)
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            self._counters['local_hit'].inc()
+            return value
+        value, remaining = self._shared_get(key)
+        if value is None or remaining <= 0:
+            self._counters['miss'].inc()
+            return None
+        self._counters['shared_hit'].inc()
+        self.local.set(key, value, remaining)
+        return value
+
+    def peek(self, key):
+        """Value from the in-process tier only, without counting a hit or miss"""
+        return self.local.get(key)
+
+    def set(self, key, value, ttl):
+        self.local.set(key, value, ttl)
+        if self.shared is None:
+            return value
+        try:
+            data = encode(value)
+        except (TypeError, ValueError) as e:
+            logger.warning("Keeping %s in the local tier only, it cannot be encoded: %s", key, e)
+            return value
+        self._shared_call(None, ('SET', self.prefix + key, data, 'PX', int(ttl * 1000)))
+        return value
+
+    def remaining_ttl(self, key):
+        """Seconds until `key` expires in either tier (0 when missing)"""
+        remaining = self.local.remaining_ttl(key)
+        if remaining > 0 or self.shared is None:
+            return remaining
+        pttl, = self._shared_call((-2,), ('PTTL', self.prefix + key))
+        return pttl / 1000 if pttl > 0 else 0
+
+    def _lock(self, key):
+        """Token for the shared load lock, '' when there is no shared tier, None when another node holds it"""
+        token = uuid.uuid4().hex
+        reply, = self._shared_call(('',), ('SET', f'{self.prefix}lock:{key}', token, 'NX', 'PX', int(self.lock_ttl * 1000)))
+        if reply == '':
+            return ''
+        return token if reply == 'OK' else None
+
+    def _unlock(self, key, token):
+        # GET then DEL is not atomic; the lock only prevents duplicate fetches, so a rare early release is harmless
+        lock_key = f'{self.prefix}lock:{key}'
+        holder, = self._shared_call((None,), ('GET', lock_key))
+        if holder is not None and holder.decode('utf-8') == token:
+            self._shared_call(None, ('DEL', lock_key))
+
+    def _wait_for_other_node(self, key):
+        """Poll for the value another node is loading; None if its lock lapses first"""
+        deadline = time.monotonic() + self.lock_ttl
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value, pttl, holder = self._shared_call(
+                (None, -2, None),
+                ('GET', self.prefix + key), ('PTTL', self.prefix + key), ('GET', f'{self.prefix}lock:{key}')
+            )
+            if value is not None:
+                value = decode(value)
+                if value is not None and pttl > 0:
+                    self.local.set(key, value, pttl / 1000)
+                    return value
+            if holder is None:
+                return None
+        return None
+
+    def _load(self, key, ttl, loader):
+        value, remaining = self._shared_get(key)
+        if value is not None and remaining > 0:
+            self._counters['shared_hit'].inc()
+            self.local.set(key, value, remaining)
+            return value
+        self._counters['miss'].inc()
+        token = self._lock(key)
+        if token is None:
+            value = self._wait_for_other_node(key)
+            if value is not None:
+                return value
+            token = self._lock(key) or ''
+        try:
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl)
+            return value
+        finally:
+            if token:
+                self._unlock(key, token)
+
+    def get_or_load(self, key, ttl, loader):
+        """Cached value for `key`, calling loader() once across the cluster on a miss.
+
+        Loaders return None to signal a failed load, which is not cached.
+        """
+        value = self.local.get(key)
+        if value is not None:
+            self._counters['local_hit'].inc()
+            return value
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = self._load(key, ttl, loader)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def refresh(self, key, ttl, loader):
+        """Reload `key` ahead of expiry; returns None without loading if another node is already refreshing it"""
+        token = self._lock(key)
+        if token is None:
+            return None
+        try:
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl)
+            return value
+        finally:
+            if token:
+                self._unlock(key, token)
+
+    def close(self):
+        if self.shared is not None:
+            self.shared.close()
@@ -0,0 +1,228 @@
+"""Crop knowledge base shared by the recommendation model, irrigation advisor and market service.
+
+The tables below are turned into read-only structures once, at import time.
+Every crop has an integer id (its index in `CROPS`). Per-crop attributes live
+on `CropRecord` objects, and the numeric ranges are also stored as parallel
+NumPy columns indexed by id, so scoring can run across all crops at once.
+"""
+import sys
+
+import numpy as np
+
+SOIL_TYPES = ('clay', 'loamy', 'sandy', 'black', 'red', 'laterite', 'alluvial')
+
+DEFAULT_BASE_PRICE = 2000
+
+# name, suitable soils, temperature (C), humidity (%), rainfall (mm),
+# water requirement, season, market demand, base price (Rs/quintal), typical yield (quintals/acre)
+_CROP_TABLE = (
+    # Cereals
+    ('rice', ('clay', 'loamy', 'alluvial'), (20, 35), (80, 95), (150, 300), 'high', 'kharif', 'high', 2500, 11),
+    ('wheat', ('loamy', 'clay', 'alluvial'), (15, 25), (50, 70), (50, 100), 'medium', 'rabi', 'high', 2000, 14),
+    ('maize', ('loamy', 'sandy'), (21, 27), (60, 80), (50, 100), 'medium', 'kharif', 'medium', 1800, 12),
+    ('barley', ('loamy', 'sandy'), (12, 22), (40, 60), (30, 75), 'low', 'rabi', 'medium', 1600, 11),
+    ('bajra', ('sandy', 'loamy'), (25, 35), (40, 70), (40, 65), 'low', 'kharif', 'medium', 1400, 6),
+    ('jowar', ('loamy', 'clay'), (26, 30), (50, 70), (45, 65), 'low', 'kharif', 'medium', 1500, 4),
+    ('ragi', ('red', 'loamy', 'laterite'), (20, 27), (60, 80), (50, 100), 'medium', 'kharif', 'medium', 1700, 6),
+    # Cash Crops
+    ('cotton', ('clay', 'loamy', 'black'), (21, 30), (50, 80), (50, 100), 'high', 'kharif', 'high', 5500, 6),
+    ('sugarcane', ('loamy', 'clay'), (21, 27), (70, 90), (75, 150), 'very_high', 'annual', 'medium', 350, 320),
+    ('jute', ('clay', 'loamy'), (24, 35), (80, 90), (120, 150), 'high', 'kharif', 'medium', 4200, 10),
+    ('tobacco', ('sandy', 'loamy'), (20, 30), (60, 80), (50, 125), 'medium', 'rabi', 'medium', 8000, 7),
+    # Pulses
+    ('soybean', ('loamy', 'clay'), (20, 30), (70, 80), (75, 100), 'medium', 'kharif', 'medium', 4000, 4.5),
+    ('groundnut', ('sandy', 'loamy'), (20, 30), (50, 70), (50, 75), 'low', 'kharif', 'medium', 5000, 7),
+    ('chickpea', ('loamy', 'clay'), (20, 30), (60, 80), (60, 90), 'medium', 'rabi', 'high', 4500, 4.5),
+    ('pigeon_pea', ('loamy', 'sandy'), (20, 30), (60, 80), (60, 100), 'medium', 'kharif', 'medium', 3800, 3.5),
+    ('black_gram', ('loamy', 'clay'), (25, 35), (70, 80), (60, 100), 'medium', 'kharif', 'high', 6000, 2.5),
+    ('green_gram', ('sandy', 'loamy'), (25, 30), (60, 80), (50, 75), 'low', 'kharif', 'high', 5500, 2.5),
+    ('lentil', ('loamy', 'clay'), (18, 25), (60, 70), (25, 50), 'low', 'rabi', 'high', 5200, 4),
+    # Vegetables
+    ('tomato', ('loamy', 'sandy'), (20, 25), (60, 80), (50, 100), 'medium', 'both', 'high', 2000, 100),
+    ('potato', ('loamy', 'sandy'), (15, 20), (80, 90), (50, 70), 'medium', 'rabi', 'high', 1200, 90),
+    ('onion', ('loamy', 'sandy'), (13, 24), (70, 80), (25, 50), 'low', 'rabi', 'high', 1500, 70),
+    ('cabbage', ('loamy', 'clay'), (15, 20), (80, 90), (60, 100), 'medium', 'rabi', 'medium', 800, 90),
+    ('cauliflower', ('loamy', 'sandy'), (15, 20), (80, 90), (60, 100), 'medium', 'rabi', 'medium', 1000, 75),
+    ('brinjal', ('loamy', 'sandy'), (22, 32), (60, 80), (60, 100), 'medium', 'both', 'medium', 1800, 70),
+    ('okra', ('loamy', 'sandy'), (24, 27), (60, 80), (50, 100), 'medium', 'kharif', 'medium', 2200, 45),
+    ('chili', ('loamy', 'sandy'), (20, 30), (60, 80), (60, 120), 'medium', 'both', 'high', 8000, 8),
+    ('cucumber', ('sandy', 'loamy'), (18, 24), (60, 70), (50, 100), 'medium', 'both', 'medium', 1200, 60),
+    ('bitter_gourd', ('loamy', 'sandy'), (24, 27), (60, 80), (60, 100), 'medium', 'kharif', 'medium', 2500, 45),
+    ('bottle_gourd', ('loamy', 'sandy'), (24, 27), (60, 80), (60, 100), 'medium', 'kharif', 'medium', 1000, 100),
+    # Spices
+    ('turmeric', ('loamy', 'clay', 'red'), (20, 30), (70, 85), (150, 250), 'high', 'kharif', 'high', 12000, 20),
+    ('ginger', ('loamy', 'sandy', 'laterite'), (25, 30), (70, 90), (150, 300), 'high', 'kharif', 'high', 8000, 60),
+    ('coriander', ('loamy', 'sandy'), (20, 30), (60, 70), (60, 100), 'low', 'rabi', 'high', 6000, 4),
+    ('cumin', ('sandy', 'loamy'), (25, 30), (50, 70), (30, 50), 'low', 'rabi', 'high', 25000, 2.5),
+    ('fenugreek', ('loamy', 'clay'), (20, 30), (60, 70), (40, 60), 'low', 'rabi', 'medium', 4000, 5),
+    # Fruits
+    ('mango', ('loamy', 'sandy'), (24, 27), (50, 75), (75, 250), 'medium', 'annual', 'high', 3000, 30),
+    ('banana', ('loamy', 'clay'), (26, 30), (75, 85), (100, 180), 'high', 'annual', 'high', 1500, 140),
+    ('grapes', ('sandy', 'loamy'), (15, 25), (60, 70), (50, 100), 'medium', 'annual', 'high', 4000, 80),
+    ('pomegranate', ('sandy', 'loamy'), (15, 35), (35, 65), (50, 100), 'low', 'annual', 'high', 6000, 40),
+    # Oilseeds
+    ('sunflower', ('loamy', 'sandy'), (20, 25), (60, 80), (50, 75), 'medium', 'both', 'medium', 4500, 3.5),
+    ('mustard', ('loamy', 'clay'), (18, 25), (60, 70), (25, 40), 'low', 'rabi', 'medium', 4200, 5),
+    ('sesame', ('sandy', 'loamy'), (25, 30), (50, 70), (50, 65), 'low', 'kharif', 'medium', 8000, 2),
+    ('safflower', ('loamy', 'clay'), (16, 25), (50, 70), (35, 75), 'low', 'rabi', 'medium', 4000, 3.5),
+)
+
+# name: (seasonal water requirement in mm, critical stages, irrigation interval in days, soil moisture target %)
+_IRRIGATION_TABLE = {
+    'rice': (1500, ('transplanting', 'tillering', 'flowering'), 3, 80),
+    'wheat': (450, ('crown_root', 'tillering', 'flowering', 'grain_filling'), 7, 60),
+    'maize': (600, ('germination', 'tasseling', 'grain_filling'), 5, 70),
+    'cotton': (800, ('germination', 'flowering', 'boll_development'), 7, 65),
+    'tomato': (600, ('transplanting', 'flowering', 'fruit_development'), 2, 75)
+}
+
+# Seasonal crop water need (mm) by water requirement level, for crops without an irrigation profile
+WATER_LEVEL_MM = {'low': 400, 'medium': 600, 'high': 1000, 'very_high': 1800}
+
+# Agro-climatic zones as (temperature, rainfall) envelopes in the units of the crop table.
+# A crop belongs to every zone that contains the midpoints of both its temperature and rainfall ranges.
+CLIMATE_ZONES = {
+    'tropical': ((24, 36), (75, 300)),
+    'subtropical': ((17, 30), (40, 150)),
+    'temperate': ((5, 22), (20, 120)),
+    'arid': ((20, 40), (0, 60))
+}
+
+
+class _Record:
+    """Immutable record: fields are assigned once in __init__ and never again"""
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+class IrrigationProfile(_Record):
+    __slots__ = ('water_requirement', 'critical_stages', 'irrigation_interval', 'soil_moisture_threshold')
+
+
+class CropRecord(_Record):
+    __slots__ = (
+        'id', 'name', 'soil_types', 'temp_range', 'humidity_range', 'rainfall_range',
+        'water_requirement', 'season', 'market_demand', 'base_price', 'yield_per_acre', 'irrigation'
+    )
+
+    @property
+    def water_mm(self):
+        """Seasonal water need in mm: the irrigation profile's figure, else the level's typical value"""
+        if self.irrigation is not None:
+            return self.irrigation.water_requirement
+        return WATER_LEVEL_MM[self.water_requirement]
+
+
+def _build_records():
+    records = []
+    for crop_id, row in enumerate(_CROP_TABLE):
+        name, soil_types, temp_range, humidity_range, rainfall_range, water, season, demand, price, crop_yield = row
+        irrigation = _IRRIGATION_TABLE.get(name)
+        records.append(CropRecord(
+            crop_id, sys.intern(name), tuple(sys.intern(soil) for soil in soil_types),
+            temp_range, humidity_range, rainfall_range,
+            sys.intern(water), sys.intern(season), sys.intern(demand), price, crop_yield,
+            IrrigationProfile(*irrigation) if irrigation else None
+        ))
+    return tuple(records)
+
+
+def _column(values, dtype):
+    column = np.array(values, dtype=dtype)
+    column.flags.writeable = False
+    return column
+
+
+CROPS = _build_records()
+CROP_IDS = {record.name: record.id for record in CROPS}
+SOIL_IDS = {soil: i for i, soil in enumerate(SOIL_TYPES)}
+
+# Parallel columns indexed by crop id; ranges are (n_crops, 2) arrays of (low, high)
+TEMP_RANGE = _column([record.temp_range for record in CROPS], np.float64)
+HUMIDITY_RANGE = _column([record.humidity_range for record in CROPS], np.float64)
+RAINFALL_RANGE = _column([record.rainfall_range for record in CROPS], np.float64)
+BASE_PRICE = _column([record.base_price for record in CROPS], np.float64)
+YIELD_PER_ACRE = _column([record.yield_per_acre for record in CROPS], np.float64)
+WATER_MM = _column([record.water_mm for record in CROPS], np.float64)
+SOIL_MASK = _column([[soil in record.soil_types for soil in SOIL_TYPES] for record in CROPS], bool)
+
+
+def get(name):
+    """CropRecord for a crop name, or None for unknown crops"""
+    crop_id = CROP_IDS.get(name)
+    return CROPS[crop_id] if crop_id is not None else None
+
+
+def ids_for(names):
+    """Crop ids for a sequence of names, -1 where the name is unknown"""
+    return np.array([CROP_IDS.get(name, -1) for name in names], dtype=np.intp)
+
+
+def base_price(name, default=DEFAULT_BASE_PRICE):
+    record = get(name)
+    return record.base_price if record is not None else default
+
+
+def _range_points(value, ranges, margin, ids):
+    low, high = ranges[ids, 0], ranges[ids, 1]
+    near = (np.abs(value - low) <= margin) | (np.abs(value - high) <= margin)
+    return np.where((low <= value) & (value <= high), 25, np.where(near, 15, 0))
+
+
+def suitability_scores(ids, soil_type, temperature, humidity, rainfall):
+    """Suitability (0-100) of each crop id for one set of conditions.
+
+    Each of soil, temperature, humidity and rainfall contributes 25 points
+    when inside the crop's range and 15 when within a margin of either
+    bound. Unknown ids (-1) score a neutral 50.
+    """
+    ids = np.asarray(ids, dtype=np.intp)
+    known = ids >= 0
+    safe_ids = np.where(known, ids, 0)
+
+    soil_id = SOIL_IDS.get(soil_type)
+    soil = SOIL_MASK[safe_ids, soil_id] * 25 if soil_id is not None else np.zeros(len(ids), dtype=int)
+    scores = (
+        soil
+        + _range_points(temperature, TEMP_RANGE, 5, safe_ids)
+        + _range_points(humidity, HUMIDITY_RANGE, 10, safe_ids)
+        + _range_points(rainfall, RAINFALL_RANGE, 25, safe_ids)
+    )
+    return np.where(known, np.minimum(scores, 100), 50)
+
+
+def suitability_matrix(soil_types, temperatures, humidities, rainfalls):
+    """Suitability (0-100) of every catalog crop for many sets of conditions: an (n, n_crops) array.
+
+    Same scoring as `suitability_scores`, broadcast over the n condition sets.
+    """
+    column = lambda values: np.asarray(values, dtype=np.float64).reshape(-1, 1)
+    soil_ids = np.array([SOIL_IDS.get(soil, -1) for soil in soil_types], dtype=np.intp)
+    soil = np.where(soil_ids[:, None] >= 0, SOIL_MASK.T[soil_ids] * 25, 0)
+    ids = np.arange(len(CROPS))
+    scores = (
+        soil
+        + _range_points(column(temperatures), TEMP_RANGE, 5, ids)
+        + _range_points(column(humidities), HUMIDITY_RANGE, 10, ids)
+        + _range_points(column(rainfalls), RAINFALL_RANGE, 25, ids)
+    )
+    return np.minimum(scores, 100)
+
+
+def zone_crops(zone):
+    """CropRecords suited to a climate zone, in catalog order"""
+    (temp_low, temp_high), (rain_low, rain_high) = CLIMATE_ZONES[zone]
+    temp_mid = TEMP_RANGE.mean(axis=1)
+    rain_mid = RAINFALL_RANGE.mean(axis=1)
+    inside = (temp_low <= temp_mid) & (temp_mid <= temp_high) & (rain_low <= rain_mid) & (rain_mid <= rain_high)
+    return tuple(CROPS[crop_id] for crop_id in np.flatnonzero(inside))
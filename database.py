@@ -0,0 +1,156 @@
+"""Data-access layer.
+
+Routes and background writers talk to a `Database` object rather than to
+sqlite3 directly, so a server database can be plugged in later by
+registering another backend for its URL scheme. Queries use `?`
+placeholders; backends for other drivers translate as needed.
+"""
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        location TEXT NOT NULL,
+        farm_size REAL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS recommendations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        soil_type TEXT,
+        climate_data TEXT,
+        water_availability TEXT,
+        recommended_crops TEXT,
+        confidence_score REAL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_recommendations_user_created ON recommendations (user_id, created_at)',
+    '''
+    CREATE TABLE IF NOT EXISTS recommendation_rollups (
+        soil_type TEXT NOT NULL,
+        region TEXT NOT NULL,
+        month TEXT NOT NULL,
+        crop TEXT NOT NULL,
+        recommendation_count INTEGER NOT NULL DEFAULT 0,
+        top_pick_count INTEGER NOT NULL DEFAULT 0,
+        confidence_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (soil_type, region, month, crop)
+    ) WITHOUT ROWID
+    '''
+]
+
+
+class Database(ABC):
+    """Interface every backend implements"""
+
+    @abstractmethod
+    def transaction(self):
+        """Context manager yielding a connection; commits on success, rolls back on error"""
+
+    def execute(self, sql, params=()):
+        with self.transaction() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def executemany(self, sql, rows):
+        with self.transaction() as conn:
+            return conn.executemany(sql, rows).rowcount
+
+    def query(self, sql, params=()):
+        with self.transaction() as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def init_schema(self, statements=None):
+        with self.transaction() as conn:
+            for statement in statements or SCHEMA:
+                conn.execute(statement)
+
+    def close(self):
+        pass
+
+
+class SQLiteDatabase(Database):
+    """SQLite backend with one pooled connection per thread.
+
+    Connections run in WAL mode with synchronous=NORMAL so readers never
+    block the writer and commits avoid a full fsync. Connections owned by
+    threads that have exited are closed when new ones are opened.
+    """
+
+    PRAGMAS = (
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA foreign_keys=ON',
+        'PRAGMA busy_timeout=5000'
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []  # (owning thread, connection)
+        self._lock = threading.Lock()
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._lock:
+                self._reap()
+                self._connections.append((threading.current_thread(), conn))
+        return conn
+
+    def _reap(self):
+        """Close connections whose threads are gone; caller holds the lock"""
+        live = []
+        for thread, conn in self._connections:
+            if thread.is_alive():
+                live.append((thread, conn))
+            else:
+                conn.close()
+        self._connections = live
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    def close(self):
+        with self._lock:
+            for _, conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+BACKENDS = {'sqlite': SQLiteDatabase}
+
+
+def register_backend(scheme, backend_class):
+    """Make `scheme://...` database URLs resolve to `backend_class(url_remainder)`"""
+    BACKENDS[scheme] = backend_class
+
+
+def create_database(url):
+    """Build a Database from a URL such as sqlite:///krushi.db (a bare path means SQLite)"""
+    if '://' not in url:
+        return SQLiteDatabase(url)
+    scheme, remainder = url.split('://', 1)
+    if scheme not in BACKENDS:
+        raise ValueError(f"Unsupported database backend: {scheme}")
+    if scheme == 'sqlite':
+        # sqlite:///relative.db and sqlite:////absolute/path.db
+        remainder = remainder[1:] if remainder.startswith('/') else remainder
+    return BACKENDS[scheme](remainder)
@@ -0,0 +1,243 @@
+"""Farmer outcome feedback and incremental model updates.
+
+`FeedbackLog` appends one fixed-size binary record per report: the
+conditions plus the crop that did well. Each record is written with a
+single O_APPEND write, so several server processes can share one log.
+
+`ModelUpdater` runs in every server process. The process that holds the
+updater lock periodically reads the feedback recorded since the last
+update. It grows the persisted forest with a few warm-started trees, fitted
+on fresh synthetic samples plus the weighted feedback, drops the oldest
+trees past `max_trees`, and atomically replaces the artifact. Every
+process, that one included, notices the new artifact version and hands the
+reloaded model to `on_update` to be swapped in.
+"""
+import fcntl
+import logging
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+import crop_catalog
+
+logger = logging.getLogger('krushi.model')
+
+MAGIC = b'KFB1'
+HEADER = struct.Struct('<4sI')  # magic, record size
+RECORD = struct.Struct('<IfffBBH')  # unix time, temperature, humidity, rainfall, soil id, water id, crop id
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<u4'), ('temperature', '<f4'), ('humidity', '<f4'), ('rainfall', '<f4'),
+    ('soil', 'u1'), ('water', 'u1'), ('crop', '<u2')
+])
+WATER_LEVELS = ('low', 'medium', 'high')
+
+
+class FeedbackLog:
+    """Append-only log of (conditions, successful crop) records"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            # Only the first opener writes the header; later ones see a non-empty file
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size == 0:
+                os.write(fd, HEADER.pack(MAGIC, RECORD.size))
+            else:
+                magic, record_size = HEADER.unpack(os.pread(fd, HEADER.size, 0))
+                if magic != MAGIC or record_size != RECORD.size:
+                    raise ValueError(f"{path} is not a feedback log")
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+
+    @staticmethod
+    def validate(soil_type, water_availability, crop):
+        """Error message for an unusable report, or None"""
+        if soil_type not in crop_catalog.SOIL_IDS:
+            return f"Unknown soil_type: {soil_type}"
+        if water_availability not in WATER_LEVELS:
+            return f"Unknown water_availability: {water_availability}"
+        if crop_catalog.get(crop) is None:
+            return f"Unknown crop: {crop}"
+        return None
+
+    @staticmethod
+    def validate_conditions(temperature, humidity, rainfall):
+        """Error message for conditions that are not finite numbers, or None"""
+        for name, value in (('temperature', temperature), ('humidity', humidity), ('rainfall', rainfall)):
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                return f"{name} must be a number"
+            if not np.isfinite(number):
+                return f"{name} must be finite"
+        return None
+
+    def append(self, soil_type, water_availability, crop, temperature, humidity, rainfall, when=None):
+        os.write(self._fd, RECORD.pack(
+            int(when or time.time()), float(temperature), float(humidity), float(rainfall),
+            crop_catalog.SOIL_IDS[soil_type], WATER_LEVELS.index(water_availability),
+            crop_catalog.CROP_IDS[crop]
+        ))
+
+    def count(self):
+        return max(0, os.path.getsize(self.path) - HEADER.size) // RECORD.size
+
+    def read(self, start=0):
+        """Records from index `start` on, as a NumPy structured array (ignores a torn final record)"""
+        with open(self.path, 'rb') as f:
+            f.seek(HEADER.size + start * RECORD.size)
+            data = f.read()
+        usable = len(data) - len(data) % RECORD.size
+        return np.frombuffer(data[:usable], dtype=RECORD_DTYPE)
+
+    def close(self):
+        os.close(self._fd)
+
+
+def feedback_rows(model, records):
+    """Feature rows and labels for the records whose crop the model can predict and whose conditions are finite"""
+    known = set(model.model.classes_)
+    rows, labels = [], []
+    for record in records:
+        crop = crop_catalog.CROPS[record['crop']].name
+        # Records written before conditions were validated may hold NaN or infinity
+        if crop not in known or not np.isfinite([record['temperature'], record['humidity'], record['rainfall']]).all():
+            continue
+        rows.append(model._encode_input({
+            'temperature': float(record['temperature']),
+            'humidity': float(record['humidity']),
+            'rainfall': float(record['rainfall']),
+            'soil_type': crop_catalog.SOIL_TYPES[record['soil']],
+            'water_availability': WATER_LEVELS[record['water']]
+        }))
+        labels.append(crop)
+    return rows, labels
+
+
+class ModelUpdater:
+    """Background warm-start updates from feedback, plus hot reload of new artifact versions"""
+
+    def __init__(self, model_path, feedback_log, on_update, interval=300, min_samples=50,
+                 trees_per_update=10, max_trees=300, synthetic_per_crop=20, feedback_weight=5.0):
+        self.model_path = model_path
+        self.feedback_log = feedback_log
+        self.on_update = on_update
+        self.interval = interval
+        self.min_samples = min_samples
+        self.trees_per_update = trees_per_update
+        self.max_trees = max_trees
+        self.synthetic_per_crop = synthetic_per_crop
+        self.feedback_weight = feedback_weight
+        self._loaded_mtime = self._artifact_mtime()
+        self._trained_offset = None  # feedback already in the artifact, known after the first load
+        self._lock_fd = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='model-updater', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error("Model update failed: %s", e)
+
+    def run_once(self):
+        if self._is_leader():
+            self.update_from_feedback()
+        self.reload_if_changed()
+
+    def _artifact_mtime(self):
+        try:
+            return os.stat(self.model_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _is_leader(self):
+        """Hold the updater lock so only one process retrains a shared artifact"""
+        if self._lock_fd is None:
+            fd = os.open(f'{self.model_path}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._lock_fd = fd
+        return True
+
+    def update_from_feedback(self):
+        """Warm-start new trees on unseen feedback; returns the new version or None"""
+        import pandas as pd
+        from ml_models import CropRecommendationModel, generate_training_data
+
+        if (self._trained_offset is not None
+                and self.feedback_log.count() - self._trained_offset < self.min_samples):
+            return None  # skip loading the artifact until there is enough new feedback
+        model = CropRecommendationModel.load(self.model_path)
+        self._trained_offset = model.feedback_offset
+        records = self.feedback_log.read(model.feedback_offset)
+        if len(records) < self.min_samples:
+            return None
+        forest = model.model
+        if 'warm_start' not in forest.get_params() or not hasattr(forest, 'estimators_'):
+            logger.warning("%s does not support warm-start updates", type(forest).__name__)
+            return None
+
+        started = time.perf_counter()
+        rows, labels = feedback_rows(model, records)
+        # Fresh synthetic samples keep every class present and anchor the new trees to the crop envelopes
+        crops = [crop_catalog.get(crop) for crop in forest.classes_]
+        synthetic = generate_training_data([record for record in crops if record], self.synthetic_per_crop)
+        for item in synthetic.to_dict('records'):
+            rows.append(model._encode_input(item))
+            labels.append(item['crop'])
+        weights = np.ones(len(labels))
+        weights[:len(labels) - len(synthetic)] = self.feedback_weight
+
+        X = np.array(rows, dtype=np.float64)
+        forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + self.trees_per_update)
+        forest.fit(pd.DataFrame(X, columns=model.feature_names), np.array(labels), sample_weight=weights)
+        forest.set_params(warm_start=False)
+        if len(forest.estimators_) > self.max_trees:
+            # Retire the oldest trees so the forest tracks recent feedback and keeps a bounded size
+            forest.estimators_ = forest.estimators_[-self.max_trees:]
+            forest.set_params(n_estimators=self.max_trees)
+
+        model.feedback_offset += len(records)
+        model.version += 1
+        model.save(self.model_path)
+        self._trained_offset = model.feedback_offset
+        logger.info("Model v%d: %d feedback samples, %d trees, %.1fs",
+                    model.version, len(records), len(forest.estimators_), time.perf_counter() - started)
+        return model.version
+
+    def reload_if_changed(self):
+        """Load and hand over the artifact if it changed since this process last loaded it"""
+        mtime = self._artifact_mtime()
+        if mtime is None or mtime == self._loaded_mtime:
+            return False
+        from ml_models import CropRecommendationModel
+
+        model = CropRecommendationModel.load(self.model_path)
+        self.on_update(model)
+        self._loaded_mtime = mtime
+        self._trained_offset = model.feedback_offset
+        return True
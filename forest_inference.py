@@ -0,0 +1,147 @@
+"""Flat-array inference for trained scikit-learn random forests.
+
+`RandomForestClassifier.predict_proba` validates its input, checks feature
+names and dispatches every tree through joblib on each call. For the few
+rows a request sends, that overhead costs far more than the tree walks.
+`FlatForest` copies the fitted trees into a handful of NumPy arrays once.
+It then walks every tree for the whole batch together, one level per step.
+
+Results are bit-for-bit identical to sklearn's. Inputs are cast to float32
+and compared against the float64 thresholds, as sklearn's tree code does.
+Each leaf's class distribution is normalized the same way, and the
+per-tree probabilities are summed in estimator order.
+"""
+import numpy as np
+
+
+class FlatForest:
+    """All trees of a fitted forest as concatenated node arrays"""
+
+    def __init__(self, feature, threshold, children_left, children_right, leaf_proba, roots, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.classes_ = classes
+        self.is_leaf = children_left == np.arange(len(children_left))
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """Export a fitted single-output RandomForestClassifier (or ExtraTreesClassifier)"""
+        if getattr(forest, 'n_outputs_', 1) != 1:
+            raise ValueError("FlatForest supports single-output forests only")
+
+        features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            left = tree.children_left.astype(np.intp)
+            right = tree.children_right.astype(np.intp)
+            is_leaf = left == -1
+
+            # Leaves point at themselves, which is also how they are recognized at inference
+            own_index = np.arange(n_nodes, dtype=np.intp)
+            lefts.append(np.where(is_leaf, own_index, left) + offset)
+            rights.append(np.where(is_leaf, own_index, right) + offset)
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(tree.threshold.astype(np.float64))
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            proba = tree.value[:, 0, :forest.n_classes_].astype(np.float64)
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba /= normalizer
+            probas.append(proba)
+
+            roots.append(offset)
+            offset += n_nodes
+
+        return cls(
+            np.concatenate(features),
+            np.concatenate(thresholds),
+            np.concatenate(lefts),
+            np.concatenate(rights),
+            np.concatenate(probas),
+            np.array(roots, dtype=np.intp),
+            np.asarray(forest.classes_)
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        arrays = (self.feature, self.threshold, self.children_left, self.children_right,
+                  self.leaf_proba, self.roots, self.is_leaf)
+        return sum(array.nbytes for array in arrays)
+
+    def apply(self, X):
+        """Leaf node index reached in every tree: array of shape (n_samples, n_estimators)"""
+        # sklearn evaluates trees on float32 inputs
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if not np.isfinite(X).all():
+            # sklearn rejects these too; a NaN would otherwise silently walk right at every split
+            raise ValueError("Input contains NaN or infinity")
+        n_samples, n_features = X.shape
+        values = X.ravel()
+        nodes = np.tile(self.roots, n_samples)
+        # Offset of each walk's sample row within the flattened input
+        row_offsets = np.repeat(np.arange(n_samples) * n_features, self.n_estimators)
+
+        # Step every (sample, tree) walk one level at a time, dropping walks that reached a leaf
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        while active.size:
+            current = nodes[active]
+            go_left = values[row_offsets[active] + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.children_left[current], self.children_right[current])
+            nodes[active] = current
+            active = active[~self.is_leaf[current]]
+        return nodes.reshape(n_samples, self.n_estimators)
+
+    def predict_proba(self, X):
+        """Class probabilities, columns in `classes_` order"""
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], self.leaf_proba.shape[1]), dtype=np.float64)
+        # Accumulate tree by tree, in estimator order, so rounding matches sklearn
+        for tree_leaves in leaves.T:
+            proba += self.leaf_proba[tree_leaves]
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class EstimatorEngine:
+    """Serve any fitted classifier through its own predict_proba (for models FlatForest cannot export)"""
+
+    def __init__(self, estimator, feature_names):
+        self.estimator = estimator
+        self.feature_names = feature_names
+        self.classes_ = np.asarray(estimator.classes_)
+
+    @property
+    def nbytes(self):
+        return 0
+
+    def predict_proba(self, X):
+        import pandas as pd
+
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return self.estimator.predict_proba(pd.DataFrame(X, columns=self.feature_names))
+
+
+def engine_for(estimator, feature_names):
+    """Fastest available serving engine for a fitted classifier"""
+    trees = getattr(estimator, 'estimators_', None)
+    if trees is not None and all(hasattr(tree, 'tree_') for tree in trees):
+        return FlatForest.from_sklearn(estimator)
+    return EstimatorEngine(estimator, feature_names)
@@ -0,0 +1,88 @@
+"""Response encoding: a fast JSON provider and size-gated compression.
+
+orjson and brotli are optional. Without orjson the stock Flask provider is
+used in compact mode; without brotli only gzip is offered.
+"""
+import gzip
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, falling back to Flask's encoder for unknown types"""
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.options).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def install_json_provider(app):
+    """Use orjson for request and response bodies when it is installed"""
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
+    else:
+        app.json.compact = True
+        app.json.sort_keys = False
+    return app.json
+
+
+def _pick_encoding(accept_encoding):
+    accepted = {part.split(';')[0].strip() for part in accept_encoding.lower().split(',')}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def install_compression(app, min_size=1024, gzip_level=5, brotli_quality=5,
+                        mimetypes=('application/json', 'text/html', 'text/css', 'application/javascript', 'text/plain')):
+    """Compress eligible responses larger than `min_size` bytes with brotli or gzip"""
+
+    @app.after_request
+    def compress_response(response):
+        from flask import request
+
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in mimetypes):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = _pick_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=gzip_level)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        # The encoded body differs byte-for-byte, so its validator becomes weak
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    return compress_response
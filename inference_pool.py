@@ -0,0 +1,244 @@
+"""Out-of-process model inference.
+
+`InferencePool` starts worker processes that each load the persisted model
+artifact once. Each worker owns a buffer in shared memory, a memory-mapped
+file under /dev/shm. A caller takes a free worker, writes its feature rows
+into that buffer and sends only the row count over the worker's stdin. It
+then reads the probabilities back from the same buffer. The forest
+evaluation therefore runs outside the web process and never holds its GIL.
+
+Workers are separate interpreters (`python inference_pool.py --worker ...`)
+rather than multiprocessing children. That way they never re-import app.py
+and never start its background threads.
+"""
+import argparse
+import logging
+import os
+import queue
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+logger = logging.getLogger('krushi.model')
+
+# Row count request: unsigned 32-bit, 0 asks the worker to exit and RELOAD to reload the artifact
+REQUEST = struct.Struct('<I')
+RELOAD = 0xFFFFFFFF
+# Reply: status byte (0 ok, 1 error) followed by a 32-bit error-message length
+REPLY = struct.Struct('<BI')
+
+SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise EOFError("inference worker closed its pipe")
+    return data
+
+
+def _map_buffer(path, max_batch, n_features, n_classes):
+    """Input and output views over one worker's shared buffer"""
+    buffer = np.memmap(path, dtype=np.float64, mode='r+', shape=(max_batch * (n_features + n_classes),))
+    inputs = buffer[:max_batch * n_features].reshape(max_batch, n_features)
+    outputs = buffer[max_batch * n_features:].reshape(max_batch, n_classes)
+    return buffer, inputs, outputs
+
+
+class _Worker:
+    """One worker process and the shared buffer it reads from and writes to"""
+
+    def __init__(self, index, pool):
+        self.index = index
+        self.pool = pool
+        fd, self.path = tempfile.mkstemp(prefix='krushi-inference-', suffix='.buf', dir=SHM_DIR)
+        with os.fdopen(fd, 'wb') as f:
+            f.truncate(pool.max_batch * (pool.n_features + pool.n_classes) * 8)
+        self.buffer, self.inputs, self.outputs = _map_buffer(
+            self.path, pool.max_batch, pool.n_features, pool.n_classes
+        )
+        self.process = None
+
+    def start(self):
+        pool = self.pool
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--worker',
+             '--model', pool.model_path, '--buffer', self.path,
+             '--max-batch', str(pool.max_batch), '--features', str(pool.n_features),
+             '--classes', str(pool.n_classes)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        self._read_reply()  # the worker replies once the model is loaded
+
+    def _read_reply(self):
+        status, length = REPLY.unpack(_read_exact(self.process.stdout, REPLY.size))
+        if status != 0:
+            message = _read_exact(self.process.stdout, length).decode('utf-8', 'replace')
+            raise RuntimeError(f"inference worker {self.index} failed: {message}")
+
+    def run(self, rows):
+        """Score up to max_batch rows in the worker process"""
+        count = len(rows)
+        self.inputs[:count] = rows
+        self.process.stdin.write(REQUEST.pack(count))
+        self.process.stdin.flush()
+        self._read_reply()
+        return self.outputs[:count].copy()
+
+    def reload(self):
+        """Have the worker load the artifact again (after it was replaced on disk)"""
+        self.process.stdin.write(REQUEST.pack(RELOAD))
+        self.process.stdin.flush()
+        self._read_reply()
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.alive():
+            try:
+                self.process.stdin.write(REQUEST.pack(0))
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                self.process.kill()
+
+    def close(self):
+        self.stop()
+        del self.inputs, self.outputs, self.buffer
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class InferencePool:
+    """Pool of inference worker processes exposing `predict_proba` like FlatForest"""
+
+    def __init__(self, model_path, n_features, n_classes, processes=2, max_batch=256):
+        self.model_path = os.path.abspath(model_path)
+        self.n_features = n_features
+        self.n_classes = n_classes
+        self.max_batch = max_batch
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        try:
+            for index in range(processes):
+                worker = _Worker(index, self)
+                self._workers.append(worker)
+                worker.start()
+                self._idle.put(worker)
+        except Exception:
+            self.close()
+            raise
+
+    @classmethod
+    def for_model(cls, model, model_path, processes=2, max_batch=256):
+        """Pool serving the artifact at `model_path`, sized from the already loaded `model`"""
+        return cls(model_path, len(model.feature_names), len(model.model.classes_), processes, max_batch)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        proba = np.empty((X.shape[0], self.n_classes), dtype=np.float64)
+        for start in range(0, X.shape[0], self.max_batch):
+            chunk = X[start:start + self.max_batch]
+            proba[start:start + len(chunk)] = self._run(chunk)
+        return proba
+
+    def _run(self, rows):
+        worker = self._idle.get()
+        try:
+            return worker.run(rows)
+        except (EOFError, OSError) as e:
+            # The process died; replace it so the pool keeps its size, and fail this call
+            logger.error("Inference worker %d exited, restarting: %s", worker.index, e)
+            worker.stop()
+            worker.start()
+            raise RuntimeError(f"inference worker {worker.index} exited") from e
+        finally:
+            self._idle.put(worker)
+
+    def reload(self):
+        """Swap every worker to the current artifact, waiting for in-flight calls to finish.
+        
+        Callers block until all workers have reloaded, so no batch is scored
+        by a mix of old and new models.
+        """
+        with self._lock:
+            workers = [self._idle.get() for _ in self._workers]
+            try:
+                for worker in workers:
+                    worker.reload()
+            finally:
+                for worker in workers:
+                    self._idle.put(worker)
+
+    def close(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
+
+
+def serve_worker(model_path, buffer_path, max_batch, n_features, n_classes):
+    """Worker loop: load the model once, then score row counts announced on stdin"""
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+
+    def reply(error=None):
+        message = error.encode('utf-8') if error else b''
+        stdout.write(REPLY.pack(1 if error else 0, len(message)) + message)
+        stdout.flush()
+
+    from ml_models import CropRecommendationModel
+    try:
+        engine = CropRecommendationModel.load(model_path).engine
+        _, inputs, outputs = _map_buffer(buffer_path, max_batch, n_features, n_classes)
+    except Exception as e:
+        reply(f"could not load {model_path}: {e}")
+        return 1
+    reply()
+
+    while True:
+        data = stdin.read(REQUEST.size)
+        if len(data) != REQUEST.size:
+            return 0
+        (count,) = REQUEST.unpack(data)
+        if count == 0:
+            return 0
+        if count == RELOAD:
+            try:
+                model = CropRecommendationModel.load(model_path)
+                if len(model.model.classes_) != n_classes:
+                    raise ValueError(f"artifact has {len(model.model.classes_)} classes, expected {n_classes}")
+                engine = model.engine
+            except Exception as e:
+                reply(f"could not reload {model_path}: {e}")
+                continue
+            reply()
+            continue
+        try:
+            outputs[:count] = engine.predict_proba(inputs[:count])
+        except Exception as e:
+            reply(str(e))
+            continue
+        reply()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Krushi inference worker (started by InferencePool)')
+    parser.add_argument('--worker', action='store_true', required=True)
+    parser.add_argument('--model', required=True)
+    parser.add_argument('--buffer', required=True)
+    parser.add_argument('--max-batch', type=int, required=True)
+    parser.add_argument('--features', type=int, required=True)
+    parser.add_argument('--classes', type=int, required=True)
+    args = parser.parse_args()
+    sys.exit(serve_worker(args.model, args.buffer, args.max_batch, args.features, args.classes))
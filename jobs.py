@@ -0,0 +1,339 @@
+"""Asynchronous bulk jobs.
+
+A job is a file of input items (one JSON object per line) processed in the
+background by a small worker pool. Each job lives in its own directory:
+
+    <directory>/<job id>/input.ndjson   spooled request body
+    <directory>/<job id>/status.json    state and progress, rewritten atomically
+    <directory>/<job id>/results.<ext>  NDJSON or CSV output
+
+Workers read the input `chunk_size` items at a time, run each chunk through
+the job type's batch processor, and append the results to disk before
+reading the next chunk, so memory use does not grow with the size of the job.
+Results are written to `results.<ext>.part` and renamed once the job
+completes. Status lives on disk, so any server process sharing the directory
+can report on a job.
+"""
+import csv
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('krushi.jobs')
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+COPY_CHUNK = 64 * 1024
+
+
+def _item_conditions(item, weather_service):
+    """Temperature, humidity and rainfall given on the item, else the current weather at its location"""
+    conditions = {key: item.get(key) for key in ('temperature', 'humidity', 'rainfall')}
+    if any(value is None for value in conditions.values()):
+        if item.get('lat') is not None and item.get('lon') is not None:
+            weather = weather_service.get_current_weather_at(float(item['lat']), float(item['lon']))
+        elif item.get('location'):
+            weather = weather_service.get_current_weather(item['location'])
+        else:
+            raise ValueError("location, lat/lon or temperature/humidity/rainfall required")
+        defaults = {'temperature': 25, 'humidity': 60, 'rainfall': 100}
+        for key, value in conditions.items():
+            if value is None:
+                conditions[key] = weather.get(key, defaults[key])
+    for key, value in conditions.items():
+        # Raising here fails the chunk, and the per-item retry reports only this item as an error
+        try:
+            conditions[key] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{key} must be a number") from None
+        if not math.isfinite(conditions[key]):
+            raise ValueError(f"{key} must be finite")
+    return conditions
+
+
+def _item_forecast(item, weather_service):
+    if item.get('lat') is not None and item.get('lon') is not None:
+        return weather_service.get_forecast_at(float(item['lat']), float(item['lon']))
+    if not item.get('location'):
+        raise ValueError("location or lat/lon required")
+    return weather_service.get_forecast(item['location'])
+
+
+def make_processors(crop_model, water_advisor, weather_service, plan_portfolios, top_n=5):
+    """Batch processors per job type: each maps a list of items to one result dict per item"""
+
+    def recommendations(items):
+        inputs = [dict(_item_conditions(item, weather_service),
+                       soil_type=item.get('soil_type'), water_availability=item.get('water_availability'))
+                  for item in items]
+        scored = crop_model.recommend_crops_batch(inputs)
+        return [{'conditions': {key: row[key] for key in ('temperature', 'humidity', 'rainfall')},
+                 'recommendations': result[:top_n]}
+                for row, result in zip(inputs, scored)]
+
+    def irrigation(items):
+        return [{'advice': water_advisor.get_irrigation_advice(
+                    item.get('crop_type', ''), item.get('soil_type'), _item_forecast(item, weather_service))}
+                for item in items]
+
+    def portfolio(items):
+        farms = [dict(item, **_item_conditions(item, weather_service)) for item in items]
+        return [{'portfolio': plan} for plan in plan_portfolios(farms)]
+
+    return {'recommendations': recommendations, 'irrigation': irrigation, 'portfolio': portfolio}
+
+
+# CSV layout per job type: columns, and a function turning one result into rows
+def _recommendation_rows(result):
+    for rank, crop in enumerate(result['recommendations'], 1):
+        yield {'rank': rank, 'crop': crop['crop'], 'confidence': crop['confidence'],
+               'suitability_score': crop['suitability_score'], 'season': crop['season'],
+               'water_requirement': crop['water_requirement']}
+
+
+def _irrigation_rows(result):
+    advice = result['advice']
+    for day in advice['irrigation_schedule']:
+        yield {'crop': advice['crop'], 'day': day.get('day'), 'date': day.get('date', ''),
+               'irrigation_needed': day.get('irrigation_needed'), 'water_amount': day.get('water_amount')}
+
+
+def _portfolio_rows(result):
+    for allocation in result['portfolio']['allocations']:
+        yield {key: allocation[key] for key in ('crop', 'acres', 'share', 'expected_revenue')}
+
+
+CSV_LAYOUTS = {
+    'recommendations': (('rank', 'crop', 'confidence', 'suitability_score', 'season', 'water_requirement'),
+                        _recommendation_rows),
+    'irrigation': (('crop', 'day', 'date', 'irrigation_needed', 'water_amount'), _irrigation_rows),
+    'portfolio': (('crop', 'acres', 'share', 'expected_revenue'), _portfolio_rows)
+}
+
+
+# Identifies this server process in job status; pids alone repeat across container restarts
+OWNER = uuid.uuid4().hex
+
+
+def _owner_alive(status):
+    if status.get('owner') == OWNER:
+        return True
+    pid = status.get('pid')
+    if not pid or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class _ResultWriter:
+    """Appends results as NDJSON lines or CSV rows (index, id and error columns lead each CSV row)"""
+
+    def __init__(self, path, job_type, output_format):
+        self.file = open(path, 'w', newline='' if output_format == 'csv' else None)
+        self.csv = None
+        if output_format == 'csv':
+            columns, self.rows = CSV_LAYOUTS[job_type]
+            self.csv = csv.DictWriter(self.file, fieldnames=('index', 'id', 'error') + columns)
+            self.csv.writeheader()
+
+    def write(self, index, item_id, result=None, error=None):
+        if self.csv is None:
+            record = {'index': index, 'id': item_id}
+            record.update(result if error is None else {'error': error})
+            self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        elif error is not None:
+            self.csv.writerow({'index': index, 'id': item_id, 'error': error})
+        else:
+            # Build every row first so a malformed result becomes one error row, not a partial item
+            try:
+                rows = [dict(row, index=index, id=item_id) for row in self.rows(result)]
+            except (KeyError, TypeError) as e:
+                rows = [{'index': index, 'id': item_id, 'error': f'unexpected result: {e}'}]
+            self.csv.writerows(rows)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class JobManager:
+    """Spools job input to disk and runs jobs on a local worker pool"""
+
+    def __init__(self, directory, processors, workers=2, chunk_size=256, retention_seconds=86400,
+                 max_input_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.processors = processors
+        self.chunk_size = chunk_size
+        self.max_input_bytes = max_input_bytes
+        self.retention_seconds = retention_seconds
+        os.makedirs(directory, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job-worker')
+        self._lock = threading.Lock()
+        self.recover()
+
+    def _path(self, job_id, name):
+        return os.path.join(self.directory, job_id, name)
+
+    def _write_status(self, status):
+        path = self._path(status['id'], 'status.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(status, f)
+        os.replace(f'{path}.tmp', path)
+
+    def status(self, job_id):
+        """Job status dict, or None for unknown ids"""
+        if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        try:
+            with open(self._path(job_id, 'status.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def result_path(self, job_id):
+        status = self.status(job_id)
+        if status is None or status['state'] != 'completed':
+            return None
+        return self._path(job_id, f"results.{status['format']}")
+
+    def submit(self, job_type, output_format, source=None, items=None):
+        """Queue a job whose items come from `items` or a binary NDJSON stream `source`"""
+        if job_type not in self.processors:
+            raise ValueError(f"Unknown job type: {job_type}")
+        if output_format not in FORMATS:
+            raise ValueError(f"Unknown format: {output_format}")
+        self.cleanup()
+
+        job_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.directory, job_id))
+        try:
+            self._spool(self._path(job_id, 'input.ndjson'), source, items)
+        except Exception:
+            shutil.rmtree(os.path.join(self.directory, job_id), ignore_errors=True)
+            raise
+
+        status = {
+            'id': job_id, 'type': job_type, 'format': output_format, 'state': 'queued',
+            'items_total': None, 'items_done': 0, 'errors': 0, 'created_at': time.time(),
+            'started_at': None, 'finished_at': None, 'error': None, 'pid': os.getpid(), 'owner': OWNER
+        }
+        self._write_status(status)
+        self._executor.submit(self._run, status)
+        return status
+
+    def _spool(self, path, source, items):
+        """Write the job input to disk without holding it in memory"""
+        written = 0
+        with open(path, 'wb') as f:
+            if items is not None:
+                chunks = (json.dumps(item, separators=(',', ':')).encode('utf-8') + b'\n' for item in items)
+            else:
+                chunks = iter(lambda: source.read(COPY_CHUNK), b'')
+            for data in chunks:
+                written += len(data)
+                if written > self.max_input_bytes:
+                    raise ValueError(f"Job input exceeds {self.max_input_bytes} bytes")
+                f.write(data)
+
+    def _count_items(self, path):
+        with open(path, 'rb') as f:
+            return sum(1 for line in f if line.strip())
+
+    def _chunks(self, path):
+        """Yield lists of (index, item or parse error) read chunk_size lines at a time"""
+        chunk = []
+        index = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                    if not isinstance(item, dict):
+                        raise ValueError("item must be a JSON object")
+                except ValueError as e:
+                    item = ValueError(f"invalid item: {e}")
+                chunk.append((index, item))
+                index += 1
+                if len(chunk) == self.chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def _process_one(process, item):
+        try:
+            return process([item])[0]
+        except Exception as e:
+            return e
+
+    def _run(self, status):
+        job_id = status['id']
+        writer = None
+        try:
+            status.update(state='running', started_at=time.time(),
+                          items_total=self._count_items(self._path(job_id, 'input.ndjson')))
+            self._write_status(status)
+            process = self.processors[status['type']]
+            part_path = self._path(job_id, f"results.{status['format']}.part")
+            writer = _ResultWriter(part_path, status['type'], status['format'])
+            for chunk in self._chunks(self._path(job_id, 'input.ndjson')):
+                valid = [item for _, item in chunk if isinstance(item, dict)]
+                try:
+                    results = iter(process(valid))
+                except Exception as e:
+                    # One bad item should not sink the chunk: retry item by item to isolate it
+                    logger.warning("Job %s chunk failed, retrying items one by one: %s", job_id, e)
+                    results = iter([self._process_one(process, item) for item in valid])
+                for index, item in chunk:
+                    result = next(results) if isinstance(item, dict) else item
+                    if isinstance(result, Exception):
+                        writer.write(index, item.get('id') if isinstance(item, dict) else None, error=str(result))
+                        status['errors'] += 1
+                    else:
+                        writer.write(index, item.get('id'), result)
+                writer.flush()
+                status['items_done'] += len(chunk)
+                self._write_status(status)
+            writer.close()
+            os.replace(part_path, self._path(job_id, f"results.{status['format']}"))
+            status.update(state='completed', finished_at=time.time())
+        except Exception as e:
+            if writer is not None:
+                writer.close()
+            logger.error("Job %s failed: %s", job_id, e)
+            status.update(state='failed', finished_at=time.time(), error=str(e))
+        self._write_status(status)
+
+    def recover(self):
+        """Fail unfinished jobs whose owning process is gone (e.g. after a restart)"""
+        for job_id in os.listdir(self.directory):
+            status = self.status(job_id)
+            if status and status['state'] in ('queued', 'running') and not _owner_alive(status):
+                status.update(state='failed', finished_at=time.time(), error='interrupted by a server restart')
+                self._write_status(status)
+
+    def cleanup(self):
+        """Delete finished jobs older than the retention period"""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            for job_id in os.listdir(self.directory):
+                status = self.status(job_id)
+                if status and status['state'] in ('completed', 'failed') and status['finished_at'] < cutoff:
+                    shutil.rmtree(os.path.join(self.directory, job_id), ignore_errors=True)
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,195 @@
+"""Load-test harness for the Krushi API.
+
+Starts the OpenWeatherMap stand-in (owm_standin.py), serves app.py with a
+threaded WSGI server pointed at it, then drives a weighted mix of endpoints
+from concurrent clients and reports throughput and tail latency per endpoint.
+
+    python load_test.py --concurrency 16 --duration 30 --latency-ms 80
+    python load_test.py --target http://127.0.0.1:5000 --duration 60
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from owm_standin import add_standin_arguments, config_from_args, start_standin
+
+LOCATIONS = [
+    'Pune, Maharashtra', 'Delhi, India', 'Mumbai, Maharashtra', 'Bangalore, Karnataka',
+    'Chennai, Tamil Nadu', 'Hyderabad, Telangana', 'Nagpur, Maharashtra', 'Nashik, Maharashtra',
+    'Indore, Madhya Pradesh', 'Ludhiana, Punjab', 'Coimbatore, Tamil Nadu', 'Patna, Bihar'
+]
+SOIL_TYPES = ['clay', 'loamy', 'sandy', 'black', 'red', 'laterite', 'alluvial']
+WATER_LEVELS = ['low', 'medium', 'high']
+CROPS = ['rice', 'wheat', 'maize', 'cotton', 'tomato']
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, min(len(sorted_samples) - 1, int(round(pct / 100 * len(sorted_samples))) - 1))
+    return sorted_samples[rank]
+
+
+def summarize(samples_ms, elapsed):
+    ordered = sorted(samples_ms)
+    return {
+        'requests': len(ordered),
+        'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 50), 2),
+        'p95_ms': round(percentile(ordered, 95), 2),
+        'p99_ms': round(percentile(ordered, 99), 2),
+        'max_ms': round(ordered[-1], 2) if ordered else 0.0
+    }
+
+
+def _recommend_crops(session, base_url, rng):
+    return session.post(f"{base_url}/api/recommend-crops", json={
+        'location': rng.choice(LOCATIONS),
+        'soil_type': rng.choice(SOIL_TYPES),
+        'water_availability': rng.choice(WATER_LEVELS),
+        'farm_size': rng.choice([0.5, 1.0, 2.5, 5.0])
+    }, timeout=30)
+
+
+def _water_management(session, base_url, rng):
+    return session.post(f"{base_url}/api/water-management", json={
+        'crop_type': rng.choice(CROPS),
+        'soil_type': rng.choice(SOIL_TYPES),
+        'location': rng.choice(LOCATIONS)
+    }, timeout=30)
+
+
+def _weather(session, base_url, rng):
+    return session.get(f"{base_url}/api/weather/{rng.choice(LOCATIONS)}", timeout=30)
+
+
+def _market_trends(session, base_url, rng):
+    return session.get(f"{base_url}/api/market-trends/{rng.choice(CROPS)}", timeout=30)
+
+
+# (name, weight, request function)
+SCENARIOS = [
+    ('recommend-crops', 4, _recommend_crops),
+    ('water-management', 2, _water_management),
+    ('weather', 3, _weather),
+    ('market-trends', 1, _market_trends)
+]
+
+
+class LoadTest:
+    def __init__(self, base_url, concurrency=8, duration=10.0, requests_limit=None, seed=0):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.duration = duration
+        self.requests_limit = requests_limit
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.samples = {name: [] for name, _, _ in SCENARIOS}
+        self.errors = {name: 0 for name, _, _ in SCENARIOS}
+        self.issued = 0
+
+    def _next_slot(self):
+        with self.lock:
+            if self.requests_limit is not None and self.issued >= self.requests_limit:
+                return False
+            self.issued += 1
+            return True
+
+    def _client(self, worker_id, deadline):
+        rng = random.Random(self.seed + worker_id)
+        names = [name for name, _, _ in SCENARIOS]
+        weights = [weight for _, weight, _ in SCENARIOS]
+        handlers = {name: func for name, _, func in SCENARIOS}
+        session = requests.Session()
+
+        while time.perf_counter() < deadline and self._next_slot():
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = handlers[name](session, self.base_url, rng)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            with self.lock:
+                self.samples[name].append(elapsed_ms)
+                if not ok:
+                    self.errors[name] += 1
+
+    def run(self):
+        start = time.perf_counter()
+        deadline = start + self.duration
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for worker_id in range(self.concurrency):
+                pool.submit(self._client, worker_id, deadline)
+        elapsed = time.perf_counter() - start
+
+        report = {'elapsed_s': round(elapsed, 2), 'concurrency': self.concurrency, 'endpoints': {}}
+        all_samples = []
+        for name, samples in self.samples.items():
+            report['endpoints'][name] = dict(summarize(samples, elapsed), errors=self.errors[name])
+            all_samples.extend(samples)
+        report['overall'] = dict(summarize(all_samples, elapsed), errors=sum(self.errors.values()))
+        return report
+
+
+def serve_app(standin_url, host='127.0.0.1'):
+    """Import app.py against the stand-in and serve it in a background thread"""
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    os.environ['OPENWEATHER_BASE_URL'] = standin_url
+    os.environ.setdefault('OPENWEATHER_API_KEY', 'standin-key')
+    os.environ.setdefault('DATABASE_PATH', os.path.join(tempfile.mkdtemp(prefix='krushi-load-'), 'krushi.db'))
+    import app as krushi_app
+
+    server = make_server(host, 0, krushi_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='krushi-app', daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def print_report(report):
+    header = f"{'endpoint':<18}{'reqs':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}"
+    print(header)
+    print('-' * len(header))
+    rows = list(report['endpoints'].items()) + [('overall', report['overall'])]
+    for name, stats in rows:
+        print(f"{name:<18}{stats['requests']:>8}{stats['throughput_rps']:>10}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>10}{stats['errors']:>8}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Drive Krushi endpoints and report latency')
+    parser.add_argument('--target', help='base URL of an already running app; skips the stand-in')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to run')
+    parser.add_argument('--requests', type=int, default=None, help='stop after this many requests')
+    parser.add_argument('--output', help='write the JSON report to this file')
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    if args.target:
+        base_url = args.target
+    else:
+        _, standin_url = start_standin(config=config_from_args(args))
+        _, base_url = serve_app(standin_url)
+        print(f"Stand-in at {standin_url}, app at {base_url}")
+
+    load_test = LoadTest(base_url, args.concurrency, args.duration, args.requests, seed=args.seed or 0)
+    report = load_test.run()
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -1,18 +1,64 @@
-import google.generativeai as genai
 import requests
 import json
+import logging
 import os
 from dotenv import load_dotenv
+from metrics import instrument
+from logging_setup import SAMPLED
+from cache_backend import TieredCache
+
+logger = logging.getLogger('krushi.location')
 
 load_dotenv()
 
+# Basic location database used when Gemini is unavailable
+BASIC_LOCATIONS = {
+    'delhi': {
+        'city': 'Delhi', 'state': 'Delhi', 'climate_zone': 'subtropical',
+        'avg_temperature': 25, 'avg_rainfall': 650,
+        'soil_types': ['alluvial', 'loamy'], 'major_crops': ['wheat', 'rice', 'sugarcane'],
+        'agricultural_season': 'both', 'water_sources': ['yamuna', 'groundwater'],
+        'farming_challenges': ['water_scarcity', 'pollution']
+    },
+    'mumbai': {
+        'city': 'Mumbai', 'state': 'Maharashtra', 'climate_zone': 'tropical',
+        'avg_temperature': 27, 'avg_rainfall': 2200,
+        'soil_types': ['laterite', 'alluvial'], 'major_crops': ['rice', 'cotton', 'sugarcane'],
+        'agricultural_season': 'kharif', 'water_sources': ['rivers', 'wells'],
+        'farming_challenges': ['flooding', 'soil_erosion']
+    },
+    'bangalore': {
+        'city': 'Bangalore', 'state': 'Karnataka', 'climate_zone': 'tropical',
+        'avg_temperature': 23, 'avg_rainfall': 900,
+        'soil_types': ['red', 'laterite'], 'major_crops': ['ragi', 'maize', 'vegetables'],
+        'agricultural_season': 'both', 'water_sources': ['lakes', 'borewells'],
+        'farming_challenges': ['water_table_depletion', 'urbanization']
+    }
+}
+
+# Region names that settle the climate zone for locations outside BASIC_LOCATIONS
+REGION_ZONES = {
+    'arid': ('rajasthan', 'kutch', 'jaisalmer', 'bikaner', 'barmer', 'jodhpur'),
+    'temperate': ('himachal', 'shimla', 'manali', 'jammu', 'kashmir', 'srinagar', 'ladakh',
+                  'uttarakhand', 'sikkim', 'darjeeling')
+}
+
+# Latitude of the Tropic of Cancer; south of it is treated as tropical
+TROPIC_LATITUDE = 23.44
+
 class LocationService:
-    def __init__(self):
+    def __init__(self, cache=None, cache_ttl=7 * 86400):
+        # Gemini's description of a place rarely changes, so answers are kept for a week by default
+        self.cache = cache or TieredCache()
+        self.cache_ttl = cache_ttl
         self.gemini_api_key = os.getenv('GEMINI_API_KEY')
         if self.gemini_api_key:
+            # Imported here so processes without a Gemini key never load the SDK
+            import google.generativeai as genai
             genai.configure(api_key=self.gemini_api_key)
             self.model = genai.GenerativeModel('gemini-pro')
     
+    @instrument('ip_api')
     def get_location_from_ip(self):
         """Get location from IP address"""
         try:
@@ -29,16 +75,23 @@ class LocationService:
                     'location_string': f"{data['city']}, {data['regionName']}"
                 }
         except Exception as e:
-            print(f"IP location error: {e}")
+            logger.warning("IP location error: %s", e)
         
         return None
     
+    @instrument('gemini')
     def enhance_location_with_gemini(self, location_string):
         """Use Gemini to get detailed location information"""
         if not self.gemini_api_key or self.gemini_api_key.strip() == "":
-            print("No Gemini API key provided, using basic location info")
+            logger.info("No Gemini API key provided, using basic location info", extra=SAMPLED)
             return self._get_basic_location_info(location_string)
         
+        key = 'location:gemini:' + ' '.join(location_string.lower().split())
+        location_data = self.cache.get_or_load(key, self.cache_ttl, lambda: self._ask_gemini(location_string))
+        return location_data if location_data is not None else self._get_basic_location_info(location_string)
+    
+    def _ask_gemini(self, location_string):
+        """Location details from Gemini, or None when the call or its JSON fails"""
         try:
             prompt = f"""
             Analyze this location for agricultural purposes: {location_string}
@@ -60,7 +113,7 @@ class LocationService:
             Only return the JSON, no other text.
             """
             
-            print(f"Calling Gemini API for location analysis: {location_string}")
+            logger.debug("Calling Gemini API for location analysis: %s", location_string)
             response = self.model.generate_content(prompt)
             
             # Clean the response text
@@ -71,40 +124,28 @@ class LocationService:
                 response_text = response_text[3:-3]
             
             location_data = json.loads(response_text)
-            print(f"Gemini API success for {location_string}")
+            logger.info("Gemini API success for %s", location_string, extra=SAMPLED)
             
             return location_data
             
         except Exception as e:
-            print(f"Gemini location analysis error: {e}")
-            return self._get_basic_location_info(location_string)
+            logger.warning("Gemini location analysis error for %s: %s", location_string, e)
+            return None
+    
+    def get_climate_zone(self, location_string=None, lat=None):
+        """Agro-climatic zone for a location without network calls, or None when unknown"""
+        text = (location_string or '').lower()
+        city_key = text.split(',')[0].strip()
+        if city_key in BASIC_LOCATIONS:
+            return BASIC_LOCATIONS[city_key]['climate_zone']
+        for zone, regions in REGION_ZONES.items():
+            if any(region in text for region in regions):
+                return zone
+        if lat is not None:
+            return 'tropical' if abs(lat) < TROPIC_LATITUDE else 'subtropical'
+        return None
     
     def _get_basic_location_info(self, location_string):
         """Fallback location information"""
-        # Basic location database
-        location_db = {
-            'delhi': {
-                'city': 'Delhi', 'state': 'Delhi', 'climate_zone': 'subtropical',
-                'avg_temperature': 25, 'avg_rainfall': 650,
-                'soil_types': ['alluvial', 'loamy'], 'major_crops': ['wheat', 'rice', 'sugarcane'],
-                'agricultural_season': 'both', 'water_sources': ['yamuna', 'groundwater'],
-                'farming_challenges': ['water_scarcity', 'pollution']
-            },
-            'mumbai': {
-                'city': 'Mumbai', 'state': 'Maharashtra', 'climate_zone': 'tropical',
-                'avg_temperature': 27, 'avg_rainfall': 2200,
-                'soil_types': ['laterite', 'alluvial'], 'major_crops': ['rice', 'cotton', 'sugarcane'],
-                'agricultural_season': 'kharif', 'water_sources': ['rivers', 'wells'],
-                'farming_challenges': ['flooding', 'soil_erosion']
-            },
-            'bangalore': {
-                'city': 'Bangalore', 'state': 'Karnataka', 'climate_zone': 'tropical',
-                'avg_temperature': 23, 'avg_rainfall': 900,
-                'soil_types': ['red', 'laterite'], 'major_crops': ['ragi', 'maize', 'vegetables'],
-                'agricultural_season': 'both', 'water_sources': ['lakes', 'borewells'],
-                'farming_challenges': ['water_table_depletion', 'urbanization']
-            }
-        }
-        
         city_key = location_string.lower().split(',')[0].strip()
-        return location_db.get(city_key, location_db['delhi'])
+        return BASIC_LOCATIONS.get(city_key, BASIC_LOCATIONS['delhi'])
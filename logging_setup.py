@@ -0,0 +1,112 @@
+"""Structured, non-blocking logging for the Krushi services.
+
+Services log through `krushi.<service>` loggers. `configure_logging` routes
+them through a bounded queue to a background listener thread that writes
+one JSON object per line, so the request path never blocks on stdout.
+High-frequency success messages are logged with `extra=SAMPLED` and only
+one in `LOG_SAMPLE_EVERY` of them is emitted.
+
+Levels come from `LOG_LEVEL` and can be overridden per service, e.g.
+`LOG_LEVEL_WEATHER=DEBUG` or `LOG_LEVEL_MARKET=WARNING`.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+SERVICES = ('weather', 'location', 'market', 'model', 'prefetch', 'persistence')
+
+# Pass as `extra=SAMPLED` on messages that would flood the log at high QPS
+SAMPLED = {'sampled': True}
+
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'sampled'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including any `extra` fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Let through one in `every` records marked as sampled, counted per message template"""
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = max(1, every)
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if not getattr(record, 'sampled', False) or self.every == 1:
+            return True
+        key = (record.name, record.msg)
+        with self.lock:
+            count = self.counts.get(key, 0)
+            self.counts[key] = count + 1
+        if count % self.every == 0:
+            record.sample_every = self.every
+            return True
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(stream=None):
+    """Install the queue handler on the `krushi` logger and start the listener (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    default_level = os.getenv('LOG_LEVEL', 'INFO').upper()
+    root = logging.getLogger('krushi')
+    root.setLevel(default_level)
+    root.propagate = False
+
+    for service in SERVICES:
+        level = os.getenv(f'LOG_LEVEL_{service.upper()}')
+        if level:
+            logging.getLogger(f'krushi.{service}').setLevel(level.upper())
+
+    log_queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(int(os.getenv('LOG_SAMPLE_EVERY', 100))))
+    root.addHandler(queue_handler)
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
@@ -1,74 +1,96 @@
 import requests
 import json
+import logging
 import random
 from datetime import datetime, timedelta
+import crop_catalog
+from metrics import instrument
+from cache_backend import TieredCache
+
+logger = logging.getLogger('krushi.market')
+
+HISTORY_FIELDS = ('date', 'price', 'volume', 'market')
+
+
+def to_columnar(records, fields=HISTORY_FIELDS):
+    """Convert a list of row dicts into parallel arrays keyed by field"""
+    return {field: [record[field] for record in records] for field in fields}
+
 
 class MarketService:
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache_ttl=3600, cache=None):
         self.api_key = api_key
-        self.base_prices = {
-            # Cereals
-            'rice': 2500, 'wheat': 2000, 'maize': 1800, 'barley': 1600, 'bajra': 1400,
-            'jowar': 1500, 'ragi': 1700,
-            # Cash Crops
-            'cotton': 5500, 'sugarcane': 350, 'jute': 4200, 'tobacco': 8000,
-            # Pulses
-            'soybean': 4000, 'groundnut': 5000, 'chickpea': 4500, 'pigeon_pea': 3800,
-            'black_gram': 6000, 'green_gram': 5500, 'lentil': 5200,
-            # Vegetables
-            'tomato': 2000, 'potato': 1200, 'onion': 1500, 'cabbage': 800,
-            'cauliflower': 1000, 'brinjal': 1800, 'okra': 2200, 'chili': 8000,
-            'cucumber': 1200, 'bitter_gourd': 2500, 'bottle_gourd': 1000,
-            # Spices
-            'turmeric': 12000, 'ginger': 8000, 'coriander': 6000, 'cumin': 25000,
-            'fenugreek': 4000,
-            # Fruits
-            'mango': 3000, 'banana': 1500, 'grapes': 4000, 'pomegranate': 6000,
-            # Oilseeds
-            'sunflower': 4500, 'mustard': 4200, 'sesame': 8000, 'safflower': 4000
-        }
+        # Prices move on a daily market schedule, so results are reused for cache_ttl seconds
+        self.cache_ttl = cache_ttl
+        self.cache = cache or TieredCache()  # entries live at 'market:<kind>:<crop>'
+    
+    def _cached(self, kind, crop, load):
+        return self.cache.get_or_load(f'market:{kind}:{crop.lower()}', self.cache_ttl, load)
+    
+    def expires_in(self, crop):
+        """Seconds until the cached trend or prediction for a crop expires (0 when missing)"""
+        remaining = [self.cache.remaining_ttl(f'market:{kind}:{crop.lower()}') for kind in ('trend', 'predictions')]
+        remaining = [seconds for seconds in remaining if seconds > 0]
+        return min(remaining) if remaining else 0
     
-    def get_price_trend(self, crop):
-        """Get price trend data for a crop"""
+    @instrument('market')
+    def get_price_trend(self, crop, columnar=False):
+        """Get price trend data for a crop.
+        
+        With columnar=True, historical_data is returned as parallel arrays
+        ({'date': [...], 'price': [...], ...}) instead of a list of dicts.
+        """
         try:
             # Since we don't have a real market API, we'll generate realistic mock data
-            return self._generate_price_trend(crop)
+            trend = self._cached('trend', crop, lambda: self._generate_price_trend(crop))
             
         except Exception as e:
-            print(f"Market API error: {e}")
-            return self._generate_price_trend(crop)
+            logger.warning("Market API error for %s: %s", crop, e)
+            trend = self._generate_price_trend(crop)
+        
+        if columnar:
+            trend = dict(trend, historical_data=to_columnar(trend['historical_data']))
+        return trend
     
+    def current_prices(self, crops):
+        """Latest price per crop (Rs/quintal), from the cached trends"""
+        return {crop: self.get_price_trend(crop)['current_price'] for crop in crops}
+    
+    @instrument('market_forecast')
     def predict_prices(self, crop):
         """Predict future prices for a crop"""
         try:
-            current_price = self.base_prices.get(crop.lower(), 2000)
-            predictions = []
-            
-            # Generate predictions for next 6 months
-            for i in range(6):
-                # Add some realistic price variation
-                variation = random.uniform(-0.15, 0.20)  # -15% to +20%
-                seasonal_factor = self._get_seasonal_factor(crop, i)
-                
-                predicted_price = current_price * (1 + variation + seasonal_factor)
-                
-                future_date = datetime.now() + timedelta(days=30 * (i + 1))
-                predictions.append({
-                    'month': future_date.strftime('%B %Y'),
-                    'predicted_price': round(predicted_price, 2),
-                    'confidence': random.uniform(70, 90),
-                    'trend': 'up' if variation > 0 else 'down'
-                })
-            
-            return predictions
+            return self._cached('predictions', crop, lambda: self._generate_predictions(crop))
             
         except Exception as e:
-            print(f"Price prediction error: {e}")
+            logger.warning("Price prediction error for %s: %s", crop, e)
             return []
     
+    def _generate_predictions(self, crop):
+        current_price = crop_catalog.base_price(crop.lower())
+        predictions = []
+        
+        # Generate predictions for next 6 months
+        for i in range(6):
+            # Add some realistic price variation
+            variation = random.uniform(-0.15, 0.20)  # -15% to +20%
+            seasonal_factor = self._get_seasonal_factor(crop, i)
+            
+            predicted_price = current_price * (1 + variation + seasonal_factor)
+            
+            future_date = datetime.now() + timedelta(days=30 * (i + 1))
+            predictions.append({
+                'month': future_date.strftime('%B %Y'),
+                'predicted_price': round(predicted_price, 2),
+                'confidence': random.uniform(70, 90),
+                'trend': 'up' if variation > 0 else 'down'
+            })
+        
+        return predictions
+    
     def _generate_price_trend(self, crop):
         """Generate realistic price trend data"""
-        base_price = self.base_prices.get(crop.lower(), 2000)
+        base_price = crop_catalog.base_price(crop.lower())
         trend_data = []
         
         # Generate data for last 12 months
@@ -0,0 +1,255 @@
+"""Hot-path timing instrumentation.
+
+Service calls are wrapped in `timed('<call>')`. Each observation goes into a
+latency histogram and, while a request is active, into that request's
+Server-Timing breakdown. Histograms are sharded per thread: a thread only
+ever writes its own shard, so recording takes no lock, and shards are summed
+when `/metrics` is scraped.
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Upper bounds in seconds, matching the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+_request_timings = ContextVar('request_timings', default=None)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram with lock-free per-thread shards"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = []  # (owning thread, shard)
+        # Shards of finished threads are folded in here so thread-per-request servers don't grow the list
+        self._retired = self._new_shard()
+        self._shards_lock = threading.Lock()
+
+    def _new_shard(self):
+        # Layout: one counter per bucket, then +Inf, then the running sum
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._new_shard()
+            self._local.shard = shard
+            with self._shards_lock:
+                self._compact()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _compact(self):
+        """Merge shards of dead threads into the retired shard; caller holds the lock"""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                for i, value in enumerate(shard):
+                    self._retired[i] += value
+        self._shards = live
+
+    def observe(self, seconds):
+        shard = self._shard()
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                index = i
+                break
+        shard[index] += 1
+        shard[-1] += seconds
+
+    def snapshot(self):
+        """Return (cumulative bucket counts including +Inf, total count, sum)"""
+        with self._shards_lock:
+            self._compact()
+            shards = [self._retired] + [shard for _, shard in self._shards]
+        totals = [0] * (len(self.buckets) + 2)
+        for shard in shards:
+            for i, value in enumerate(shard):
+                totals[i] += value
+
+        cumulative = []
+        running = 0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, totals[-1]
+
+
+class Counter:
+    """Monotonic counter with the same lock-free per-thread shards as Histogram"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []  # (owning thread, [count])
+        self._retired = 0
+        self._shards_lock = threading.Lock()
+
+    def inc(self, amount=1):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = [0]
+            with self._shards_lock:
+                self._compact()
+                self._shards.append((threading.current_thread(), shard))
+        shard[0] += amount
+
+    def _compact(self):
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                self._retired += shard[0]
+        self._shards = live
+
+    def value(self):
+        with self._shards_lock:
+            self._compact()
+            return self._retired + sum(shard[0] for _, shard in self._shards)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _series(self, name, help_text, kind, factory, labels):
+        key = tuple(sorted(labels.items()))
+        family = self._families.get(name)
+        if family is None or key not in family['series']:
+            with self._lock:
+                family = self._families.setdefault(name, {'help': help_text, 'type': kind, 'series': {}})
+                family['series'].setdefault(key, factory())
+        return family['series'][key]
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS, **labels):
+        """Get or create the histogram for `name` with the given label values"""
+        return self._series(name, help_text, 'histogram', lambda: Histogram(buckets), labels)
+
+    def counter(self, name, help_text, **labels):
+        """Get or create the counter for `name` with the given label values"""
+        return self._series(name, help_text, 'counter', Counter, labels)
+
+    def render_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            families = {
+                name: (family['help'], family['type'], dict(family['series']))
+                for name, family in self._families.items()
+            }
+
+        for name, (help_text, kind, series) in sorted(families.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in sorted(series.items()):
+                labels = ','.join(f'{label}="{value}"' for label, value in key)
+                if kind == 'counter':
+                    lines.append(f'{name}{{{labels}}} {metric.value()}' if labels else f'{name} {metric.value()}')
+                    continue
+                prefix = labels + ',' if labels else ''
+                cumulative, count, total = metric.snapshot()
+                for bound, value in zip(metric.buckets, cumulative):
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {value}')
+                lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {cumulative[-1]}')
+                suffix = f'{{{labels}}}' if labels else ''
+                lines.append(f'{name}_sum{suffix} {total}')
+                lines.append(f'{name}_count{suffix} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def observe_call(call, seconds):
+    """Record one service call in its histogram and in the active request's timings"""
+    registry.histogram(
+        'krushi_service_call_duration_seconds', 'Latency of service calls made while serving requests', call=call
+    ).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        total, count = timings.get(call, (0.0, 0))
+        timings[call] = (total + seconds, count + 1)
+
+
+@contextmanager
+def timed(call):
+    """Time the enclosed block as one `call` observation"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_call(call, time.perf_counter() - start)
+
+
+def instrument(call):
+    """Decorator form of `timed` for service methods"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(call):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect_timings():
+    """Collect the calls timed in the enclosed block into a fresh dict, e.g. on a worker thread.
+
+    The calls are still observed in their histograms; `add_timings` credits
+    them to a request running elsewhere.
+    """
+    timings = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def add_timings(timings):
+    """Add timings collected elsewhere to the current request without observing them again"""
+    current = _request_timings.get()
+    if current is None:
+        return
+    for call, (total, count) in timings.items():
+        previous_total, previous_count = current.get(call, (0.0, 0))
+        current[call] = (previous_total + total, previous_count + count)
+
+
+def start_request():
+    """Begin collecting per-call timings for the current request context"""
+    return _request_timings.set({})
+
+
+def cancel_request(token):
+    """Stop collecting timings for the current request context without recording them"""
+    _request_timings.reset(token)
+
+
+def finish_request(token, endpoint, status, seconds):
+    """Stop collecting timings and return the Server-Timing header value"""
+    timings = _request_timings.get() or {}
+    _request_timings.reset(token)
+
+    registry.histogram(
+        'krushi_request_duration_seconds', 'Latency of HTTP requests by endpoint and status',
+        endpoint=endpoint, status=str(status)
+    ).observe(seconds)
+
+    entries = []
+    for call, (total, count) in timings.items():
+        entry = f'{call};dur={total * 1000:.1f}'
+        if count > 1:
+            entry += f';desc="{count} calls"'
+        entries.append(entry)
+    entries.append(f'total;dur={seconds * 1000:.1f}')
+    return ', '.join(entries)
@@ -0,0 +1,126 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import add_timings, collect_timings, registry, timed
+
+logger = logging.getLogger('krushi.model')
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-item calls into one batched call.
+
+    `submit` enqueues an item and blocks until its result is ready. A worker
+    thread takes the first waiting item, then keeps collecting for up to
+    `max_wait_ms` or until `max_batch` items are queued. It passes the whole
+    batch to `batch_func` and hands each caller its own result.
+    `batch_func` must return one result per item, in order.
+    
+    Collection also stops as soon as every caller currently inside `submit`
+    is in the batch, so a lone request never waits out the full window.
+    Calls timed inside `batch_func` run on the worker thread; each caller
+    gets them added to its own request timings, since it waited on all of them.
+    """
+
+    def __init__(self, batch_func, max_batch=32, max_wait_ms=2, name='model'):
+        self.batch_func = batch_func
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self.queue = queue.Queue()
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+        self._closed = False  # set under _waiting_lock once the worker stops taking items
+        self._stop = threading.Event()
+        self._thread = None
+        self._batch_sizes = registry.histogram(
+            'krushi_batch_size', 'Items per batched call', buckets=BATCH_SIZE_BUCKETS, batcher=name
+        )
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, name=f'{self.name}-batcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        """Finish queued items and stop the worker thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, item, timeout=None):
+        """Run `item` through the next batch and return its result (or raise its error)"""
+        future = Future()
+        with self._waiting_lock:
+            # Enqueued under the lock, so the worker's final drain cannot miss the item
+            running = not self._closed and self._thread is not None and self._thread.is_alive()
+            if running:
+                self._waiting += 1
+                self.queue.put((item, future))
+        if not running:
+            # Not running (e.g. during shutdown): serve the item on the caller's thread
+            return self.batch_func([item])[0]
+        try:
+            with timed(f'{self.name}_batch'):
+                result, timings = future.result(timeout)
+        finally:
+            with self._waiting_lock:
+                self._waiting -= 1
+        add_timings(timings)
+        return result
+
+    def _next_batch(self):
+        """Block for the first item, then collect more until the batch is full or the wait runs out"""
+        try:
+            batch = [self.queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < min(self.max_batch, self._waiting):
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _process(self, batch):
+        self._batch_sizes.observe(len(batch))
+        try:
+            with collect_timings() as timings:
+                results = self.batch_func([item for item, _ in batch])
+        except Exception as e:
+            logger.error("Batched %s call failed for %d items: %s", self.name, len(batch), e)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result((result, timings))
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._process(batch)
+
+        # Serve whatever is still queued so no caller waits forever; later callers score inline
+        with self._waiting_lock:
+            self._closed = True
+        while True:
+            batch = []
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                break
+            self._process(batch)
@@ -3,559 +3,233 @@ import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 import joblib
+import math
 import os
+import crop_catalog
+from forest_inference import engine_for
+from metrics import timed
 
-class CropRecommendationModel:
-    def __init__(self):
-        self.model = None
-        self.label_encoders = {}
-        self.crop_data = self._load_crop_database()
-        self._train_model()
+# Bumped whenever the layout written by CropRecommendationModel.save changes
+ARTIFACT_FORMAT = 1
+
+def generate_training_data(crops=None, samples_per_crop=100):
+    """Generate synthetic training data based on crop characteristics"""
+    data = []
     
-    def _load_crop_database(self):
-        """Load comprehensive crop database with characteristics"""
-        crops_data = {
-            # Cereals
-            'rice': {
-                'soil_types': ['clay', 'loamy', 'alluvial'],
-                'temp_range': (20, 35),
-                'humidity_range': (80, 95),
-                'rainfall_range': (150, 300),
-                'water_requirement': 'high',
-                'season': 'kharif',
-                'market_demand': 'high'
-            },
-            'wheat': {
-                'soil_types': ['loamy', 'clay', 'alluvial'],
-                'temp_range': (15, 25),
-                'humidity_range': (50, 70),
-                'rainfall_range': (50, 100),
-                'water_requirement': 'medium',
-                'season': 'rabi',
-                'market_demand': 'high'
-            },
-            'maize': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (21, 27),
-                'humidity_range': (60, 80),
-                'rainfall_range': (50, 100),
-                'water_requirement': 'medium',
-                'season': 'kharif',
-                'market_demand': 'medium'
-            },
-            'barley': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (12, 22),
-                'humidity_range': (40, 60),
-                'rainfall_range': (30, 75),
-                'water_requirement': 'low',
-                'season': 'rabi',
-                'market_demand': 'medium'
-            },
-            'bajra': {
-                'soil_types': ['sandy', 'loamy'],
-                'temp_range': (25, 35),
-                'humidity_range': (40, 70),
-                'rainfall_range': (40, 65),
-                'water_requirement': 'low',
-                'season': 'kharif',
-                'market_demand': 'medium'
-            },
-            'jowar': {
-                'soil_types': ['loamy', 'clay'],
-                'temp_range': (26, 30),
-                'humidity_range': (50, 70),
-                'rainfall_range': (45, 65),
-                'water_requirement': 'low',
-                'season': 'kharif',
-                'market_demand': 'medium'
-            },
-            'ragi': {
-                'soil_types': ['red', 'loamy', 'laterite'],
-                'temp_range': (20, 27),
-                'humidity_range': (60, 80),
-                'rainfall_range': (50, 100),
-                'water_requirement': 'medium',
-                'season': 'kharif',
-                'market_demand': 'medium'
-            },
-            
-            # Cash Crops
-            'cotton': {
-                'soil_types': ['clay', 'loamy', 'black'],
-                'temp_range': (21, 30),
-                'humidity_range': (50, 80),
-                'rainfall_range': (50, 100),
-                'water_requirement': 'high',
-                'season': 'kharif',
-                'market_demand': 'high'
-            },
-            'sugarcane': {
-                'soil_types': ['loamy', 'clay'],
-                'temp_range': (21, 27),
-                'humidity_range': (70, 90),
-                'rainfall_range': (75, 150),
-                'water_requirement': 'very_high',
-                'season': 'annual',
-                'market_demand': 'medium'
-            },
-            'jute': {
-                'soil_types': ['clay', 'loamy'],
-                'temp_range': (24, 35),
-                'humidity_range': (80, 90),
-                'rainfall_range': (120, 150),
-                'water_requirement': 'high',
-                'season': 'kharif',
-                'market_demand': 'medium'
-            },
-            'tobacco': {
-                'soil_types': ['sandy', 'loamy'],
-                'temp_range': (20, 30),
-                'humidity_range': (60, 80),
-                'rainfall_range': (50, 125),
-                'water_requirement': 'medium',
-                'season': 'rabi',
-                'market_demand': 'medium'
-            },
-            
-            # Pulses
-            'soybean': {
-                'soil_types': ['loamy', 'clay'],
-                'temp_range': (20, 30),
-                'humidity_range': (70, 80),
-                'rainfall_range': (75, 100),
-                'water_requirement': 'medium',
-                'season': 'kharif',
-                'market_demand': 'medium'
-            },
-            'groundnut': {
-                'soil_types': ['sandy', 'loamy'],
-                'temp_range': (20, 30),
-                'humidity_range': (50, 70),
-                'rainfall_range': (50, 75),
-                'water_requirement': 'low',
-                'season': 'kharif',
-                'market_demand': 'medium'
-            },
-            'chickpea': {
-                'soil_types': ['loamy', 'clay'],
-                'temp_range': (20, 30),
-                'humidity_range': (60, 80),
-                'rainfall_range': (60, 90),
-                'water_requirement': 'medium',
-                'season': 'rabi',
-                'market_demand': 'high'
-            },
-            'pigeon_pea': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (20, 30),
-                'humidity_range': (60, 80),
-                'rainfall_range': (60, 100),
-                'water_requirement': 'medium',
-                'season': 'kharif',
-                'market_demand': 'medium'
-            },
-            'black_gram': {
-                'soil_types': ['loamy', 'clay'],
-                'temp_range': (25, 35),
-                'humidity_range': (70, 80),
-                'rainfall_range': (60, 100),
-                'water_requirement': 'medium',
-                'season': 'kharif',
-                'market_demand': 'high'
-            },
-            'green_gram': {
-                'soil_types': ['sandy', 'loamy'],
-                'temp_range': (25, 30),
-                'humidity_range': (60, 80),
-                'rainfall_range': (50, 75),
-                'water_requirement': 'low',
-                'season': 'kharif',
-                'market_demand': 'high'
-            },
-            'lentil': {
-                'soil_types': ['loamy', 'clay'],
-                'temp_range': (18, 25),
-                'humidity_range': (60, 70),
-                'rainfall_range': (25, 50),
-                'water_requirement': 'low',
-                'season': 'rabi',
-                'market_demand': 'high'
-            },
+    for record in crops or crop_catalog.CROPS:
+        # Generate multiple samples for each crop
+        for _ in range(samples_per_crop):
+            # Generate random values within the crop's optimal ranges
+            temp = np.random.uniform(record.temp_range[0] - 5, record.temp_range[1] + 5)
+            humidity = np.random.uniform(record.humidity_range[0] - 10, record.humidity_range[1] + 10)
+            rainfall = np.random.uniform(record.rainfall_range[0] - 25, record.rainfall_range[1] + 25)
             
-            # Vegetables
-            'tomato': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (20, 25),
-                'humidity_range': (60, 80),
-                'rainfall_range': (50, 100),
-                'water_requirement': 'medium',
-                'season': 'both',
-                'market_demand': 'high'
-            },
-            'potato': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (15, 20),
-                'humidity_range': (80, 90),
-                'rainfall_range': (50, 70),
-                'water_requirement': 'medium',
-                'season': 'rabi',
-                'market_demand': 'high'
-            },
-            'onion': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (13, 24),
-                'humidity_range': (70, 80),
-                'rainfall_range': (25, 50),
-                'water_requirement': 'low',
-                'season': 'rabi',
-                'market_demand': 'high'
-            },
-            'cabbage': {
-                'soil_types': ['loamy', 'clay'],
-                'temp_range': (15, 20),
-                'humidity_range': (80, 90),
-                'rainfall_range': (60, 100),
-                'water_requirement': 'medium',
-                'season': 'rabi',
-                'market_demand': 'medium'
-            },
-            'cauliflower': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (15, 20),
-                'humidity_range': (80, 90),
-                'rainfall_range': (60, 100),
-                'water_requirement': 'medium',
-                'season': 'rabi',
-                'market_demand': 'medium'
-            },
-            'brinjal': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (22, 32),
-                'humidity_range': (60, 80),
-                'rainfall_range': (60, 100),
-                'water_requirement': 'medium',
-                'season': 'both',
-                'market_demand': 'medium'
-            },
-            'okra': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (24, 27),
-                'humidity_range': (60, 80),
-                'rainfall_range': (50, 100),
-                'water_requirement': 'medium',
-                'season': 'kharif',
-                'market_demand': 'medium'
-            },
-            'chili': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (20, 30),
-                'humidity_range': (60, 80),
-                'rainfall_range': (60, 120),
-                'water_requirement': 'medium',
-                'season': 'both',
-                'market_demand': 'high'
-            },
-            'cucumber': {
-                'soil_types': ['sandy', 'loamy'],
-                'temp_range': (18, 24),
-                'humidity_range': (60, 70),
-                'rainfall_range': (50, 100),
-                'water_requirement': 'medium',
-                'season': 'both',
-                'market_demand': 'medium'
-            },
-            'bitter_gourd': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (24, 27),
-                'humidity_range': (60, 80),
-                'rainfall_range': (60, 100),
-                'water_requirement': 'medium',
-                'season': 'kharif',
-                'market_demand': 'medium'
-            },
-            'bottle_gourd': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (24, 27),
-                'humidity_range': (60, 80),
-                'rainfall_range': (60, 100),
-                'water_requirement': 'medium',
-                'season': 'kharif',
-                'market_demand': 'medium'
-            },
+            # Random soil type (biased towards suitable ones)
+            if np.random.random() < 0.7:
+                soil_type = np.random.choice(record.soil_types)
+            else:
+                soil_type = np.random.choice(crop_catalog.SOIL_TYPES)
             
-            # Spices
-            'turmeric': {
-                'soil_types': ['loamy', 'clay', 'red'],
-                'temp_range': (20, 30),
-                'humidity_range': (70, 85),
-                'rainfall_range': (150, 250),
-                'water_requirement': 'high',
-                'season': 'kharif',
-                'market_demand': 'high'
-            },
-            'ginger': {
-                'soil_types': ['loamy', 'sandy', 'laterite'],
-                'temp_range': (25, 30),
-                'humidity_range': (70, 90),
-                'rainfall_range': (150, 300),
-                'water_requirement': 'high',
-                'season': 'kharif',
-                'market_demand': 'high'
-            },
-            'coriander': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (20, 30),
-                'humidity_range': (60, 70),
-                'rainfall_range': (60, 100),
-                'water_requirement': 'low',
-                'season': 'rabi',
-                'market_demand': 'high'
-            },
-            'cumin': {
-                'soil_types': ['sandy', 'loamy'],
-                'temp_range': (25, 30),
-                'humidity_range': (50, 70),
-                'rainfall_range': (30, 50),
-                'water_requirement': 'low',
-                'season': 'rabi',
-                'market_demand': 'high'
-            },
-            'fenugreek': {
-                'soil_types': ['loamy', 'clay'],
-                'temp_range': (20, 30),
-                'humidity_range': (60, 70),
-                'rainfall_range': (40, 60),
-                'water_requirement': 'low',
-                'season': 'rabi',
-                'market_demand': 'medium'
-            },
+            # Random water availability
+            water_avail = np.random.choice(['low', 'medium', 'high'])
             
-            # Fruits
-            'mango': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (24, 27),
-                'humidity_range': (50, 75),
-                'rainfall_range': (75, 250),
-                'water_requirement': 'medium',
-                'season': 'annual',
-                'market_demand': 'high'
-            },
-            'banana': {
-                'soil_types': ['loamy', 'clay'],
-                'temp_range': (26, 30),
-                'humidity_range': (75, 85),
-                'rainfall_range': (100, 180),
-                'water_requirement': 'high',
-                'season': 'annual',
-                'market_demand': 'high'
-            },
-            'grapes': {
-                'soil_types': ['sandy', 'loamy'],
-                'temp_range': (15, 25),
-                'humidity_range': (60, 70),
-                'rainfall_range': (50, 100),
-                'water_requirement': 'medium',
-                'season': 'annual',
-                'market_demand': 'high'
-            },
-            'pomegranate': {
-                'soil_types': ['sandy', 'loamy'],
-                'temp_range': (15, 35),
-                'humidity_range': (35, 65),
-                'rainfall_range': (50, 100),
-                'water_requirement': 'low',
-                'season': 'annual',
-                'market_demand': 'high'
-            },
-            
-            # Oilseeds
-            'sunflower': {
-                'soil_types': ['loamy', 'sandy'],
-                'temp_range': (20, 25),
-                'humidity_range': (60, 80),
-                'rainfall_range': (50, 75),
-                'water_requirement': 'medium',
-                'season': 'both',
-                'market_demand': 'medium'
-            },
-            'mustard': {
-                'soil_types': ['loamy', 'clay'],
-                'temp_range': (18, 25),
-                'humidity_range': (60, 70),
-                'rainfall_range': (25, 40),
-                'water_requirement': 'low',
-                'season': 'rabi',
-                'market_demand': 'medium'
-            },
-            'sesame': {
-                'soil_types': ['sandy', 'loamy'],
-                'temp_range': (25, 30),
-                'humidity_range': (50, 70),
-                'rainfall_range': (50, 65),
-                'water_requirement': 'low',
-                'season': 'kharif',
-                'market_demand': 'medium'
-            },
-            'safflower': {
-                'soil_types': ['loamy', 'clay'],
-                'temp_range': (16, 25),
-                'humidity_range': (50, 70),
-                'rainfall_range': (35, 75),
-                'water_requirement': 'low',
-                'season': 'rabi',
-                'market_demand': 'medium'
-            }
-        }
-        return crops_data
+            data.append({
+                'soil_type': soil_type,
+                'temperature': temp,
+                'humidity': humidity,
+                'rainfall': rainfall,
+                'water_availability': water_avail,
+                'crop': record.name
+            })
     
-    def _generate_training_data(self):
-        """Generate synthetic training data based on crop characteristics"""
-        data = []
-        
-        for crop, characteristics in self.crop_data.items():
-            # Generate multiple samples for each crop
-            for _ in range(100):
-                # Generate random values within the crop's optimal ranges
-                temp = np.random.uniform(
-                    characteristics['temp_range'][0] - 5,
-                    characteristics['temp_range'][1] + 5
-                )
-                humidity = np.random.uniform(
-                    characteristics['humidity_range'][0] - 10,
-                    characteristics['humidity_range'][1] + 10
-                )
-                rainfall = np.random.uniform(
-                    characteristics['rainfall_range'][0] - 25,
-                    characteristics['rainfall_range'][1] + 25
-                )
-                
-                # Random soil type (biased towards suitable ones)
-                if np.random.random() < 0.7:
-                    soil_type = np.random.choice(characteristics['soil_types'])
-                else:
-                    soil_type = np.random.choice(['clay', 'loamy', 'sandy', 'black', 'red', 'laterite', 'alluvial'])
-                
-                # Random water availability
-                water_avail = np.random.choice(['low', 'medium', 'high'])
-                
-                data.append({
-                    'soil_type': soil_type,
-                    'temperature': temp,
-                    'humidity': humidity,
-                    'rainfall': rainfall,
-                    'water_availability': water_avail,
-                    'crop': crop
-                })
-        
-        return pd.DataFrame(data)
+    return pd.DataFrame(data)
+
+def encode_training_data(df):
+    """Encode a training frame into (features, target, label encoders, feature names)"""
+    categorical_features = ['soil_type', 'water_availability']
+    numerical_features = ['temperature', 'humidity', 'rainfall']
     
-    def _train_model(self):
-        """Train the crop recommendation model"""
-        # Generate training data
-        df = self._generate_training_data()
-        
-        # Prepare features
-        categorical_features = ['soil_type', 'water_availability']
-        numerical_features = ['temperature', 'humidity', 'rainfall']
-        
-        # Encode categorical variables
-        X_encoded = df[numerical_features].copy()
-        
-        for feature in categorical_features:
-            le = LabelEncoder()
-            X_encoded[feature] = le.fit_transform(df[feature])
-            self.label_encoders[feature] = le
+    # Encode categorical variables
+    X_encoded = df[numerical_features].copy()
+    label_encoders = {}
+    for feature in categorical_features:
+        le = LabelEncoder()
+        X_encoded[feature] = le.fit_transform(df[feature])
+        label_encoders[feature] = le
+    
+    return X_encoded, df['crop'], label_encoders, numerical_features + categorical_features
+
+class CropRecommendationModel:
+    def __init__(self, crops=None, n_estimators=100, estimator=None):
+        """Train on `crops` (CropRecords, default the whole catalog).
         
-        # Prepare target
-        y = df['crop']
+        The classifier is an n_estimators random forest unless an unfitted
+        `estimator` is supplied.
+        """
+        self.model = None
+        self.label_encoders = {}
+        self.crops = crops or crop_catalog.CROPS
+        self.n_estimators = n_estimators
+        # Bumped by each incremental update; feedback_offset counts feedback records already learned from
+        self.version = 0
+        self.feedback_offset = 0
+        self._train_model(estimator)
+    
+    def _train_model(self, estimator=None):
+        """Train the crop recommendation model"""
+        X_encoded, y, self.label_encoders, self.feature_names = encode_training_data(
+            generate_training_data(self.crops)
+        )
         
         # Train model
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
+        self.model = estimator if estimator is not None else RandomForestClassifier(
+            n_estimators=self.n_estimators, random_state=42
+        )
         self.model.fit(X_encoded, y)
+        self._prepare_serving()
+    
+    def _prepare_serving(self):
+        """Derive the lookup tables and inference engine used to answer requests"""
+        # Catalog id of each model class, in predict_proba column order
+        self.class_ids = crop_catalog.ids_for(self.model.classes_)
+        
+        # sklearn is only used for training; forests are scored by their flattened copy
+        self.engine = engine_for(self.model, self.feature_names)
+        self.category_codes = {
+            feature: {label: code for code, label in enumerate(encoder.classes_)}
+            for feature, encoder in self.label_encoders.items()
+        }
+    
+    @classmethod
+    def load(cls, path):
+        """Restore a model written by `save` without retraining"""
+        artifact = joblib.load(path)
+        if artifact.get('format') != ARTIFACT_FORMAT:
+            raise ValueError(f"Unsupported model artifact format in {path}")
+        model = cls.from_estimator(artifact['model'], artifact['label_encoders'], artifact['feature_names'])
+        model.version = artifact.get('version', 0)
+        model.feedback_offset = artifact.get('feedback_offset', 0)
+        return model
+    
+    @classmethod
+    def from_estimator(cls, estimator, label_encoders, feature_names):
+        """Wrap an already fitted classifier and its encoders for serving"""
+        model = cls.__new__(cls)
+        model.model = estimator
+        model.label_encoders = label_encoders
+        model.feature_names = feature_names
+        model.version = 0
+        model.feedback_offset = 0
+        model._prepare_serving()
+        return model
+    
+    def save(self, path):
+        """Write the trained classifier and encoders to `path` atomically"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f'{path}.tmp'
+        joblib.dump({
+            'format': ARTIFACT_FORMAT,
+            'model': self.model,
+            'label_encoders': self.label_encoders,
+            'feature_names': self.feature_names,
+            'version': self.version,
+            'feedback_offset': self.feedback_offset
+        }, temp_path)
+        os.replace(temp_path, path)
+        return path
+    
+    def set_engine(self, engine):
+        """Serve predictions from another engine exposing predict_proba (e.g. an InferencePool)"""
+        self.engine = engine
     
     def recommend_crops(self, soil_type, temperature, humidity, rainfall, water_availability):
         """Recommend crops based on input parameters"""
-        try:
-            # Prepare input data
-            input_data = pd.DataFrame({
-                'temperature': [temperature],
-                'humidity': [humidity],
-                'rainfall': [rainfall],
-                'soil_type': [self.label_encoders['soil_type'].transform([soil_type])[0]],
-                'water_availability': [self.label_encoders['water_availability'].transform([water_availability])[0]]
-            })
-            
-            # Get predictions and probabilities
-            predictions = self.model.predict(input_data)
-            probabilities = self.model.predict_proba(input_data)[0]
-            
-            # Get top recommendations
-            crop_classes = self.model.classes_
-            crop_probs = list(zip(crop_classes, probabilities))
-            crop_probs.sort(key=lambda x: x[1], reverse=True)
-            
-            recommendations = []
-            for crop, prob in crop_probs[:10]:  # Top 10 recommendations
-                crop_info = self.crop_data.get(crop, {})
-                suitability = self._calculate_suitability(
-                    crop, soil_type, temperature, humidity, rainfall, water_availability
-                )
-                
-                # Adjust confidence based on location-specific factors
-                location_factor = self._get_location_factor(temperature, humidity, rainfall)
-                adjusted_confidence = min(100, prob * 100 * location_factor)
-                
-                recommendations.append({
-                    'crop': crop,
-                    'confidence': round(adjusted_confidence, 2),
-                    'suitability_score': suitability,
-                    'season': crop_info.get('season', 'unknown'),
-                    'water_requirement': crop_info.get('water_requirement', 'medium'),
-                    'market_demand': crop_info.get('market_demand', 'medium'),
-                    'location_specific_advice': self._get_location_advice(crop, temperature, humidity, rainfall)
-                })
-            
-            return recommendations
+        return self.recommend_crops_batch([{
+            'soil_type': soil_type,
+            'temperature': temperature,
+            'humidity': humidity,
+            'rainfall': rainfall,
+            'water_availability': water_availability
+        }])[0]
+    
+    def recommend_crops_batch(self, inputs):
+        """Recommend crops for a list of input dicts with a single model call"""
+        results = [None] * len(inputs)
+        rows = []
+        positions = []
+        
+        for i, item in enumerate(inputs):
+            try:
+                rows.append(self._encode_input(item))
+                positions.append(i)
+            except Exception:
+                results[i] = self._get_fallback_recommendations(item.get('soil_type'), item.get('water_availability'))
+        
+        if rows:
+            try:
+                with timed('model_inference'):
+                    probabilities = self.engine.predict_proba(np.array(rows, dtype=np.float64))
+            except Exception:
+                probabilities = [None] * len(rows)
             
-        except Exception as e:
-            # Fallback recommendations
-            return self._get_fallback_recommendations(soil_type, water_availability)
+            for i, probs in zip(positions, probabilities):
+                try:
+                    with timed('suitability'):
+                        results[i] = self._build_recommendations(inputs[i], probs)
+                except Exception:
+                    # Fallback recommendations
+                    results[i] = self._get_fallback_recommendations(
+                        inputs[i].get('soil_type'), inputs[i].get('water_availability')
+                    )
+        
+        return results
     
-    def _calculate_suitability(self, crop, soil_type, temperature, humidity, rainfall, water_availability):
-        """Calculate suitability score based on crop characteristics"""
-        if crop not in self.crop_data:
-            return 50
-        
-        crop_info = self.crop_data[crop]
-        score = 0
-        
-        # Soil type match
-        if soil_type in crop_info['soil_types']:
-            score += 25
-        
-        # Temperature range
-        temp_range = crop_info['temp_range']
-        if temp_range[0] <= temperature <= temp_range[1]:
-            score += 25
-        elif abs(temperature - temp_range[0]) <= 5 or abs(temperature - temp_range[1]) <= 5:
-            score += 15
-        
-        # Humidity range
-        humidity_range = crop_info['humidity_range']
-        if humidity_range[0] <= humidity <= humidity_range[1]:
-            score += 25
-        elif abs(humidity - humidity_range[0]) <= 10 or abs(humidity - humidity_range[1]) <= 10:
-            score += 15
-        
-        # Rainfall range
-        rainfall_range = crop_info['rainfall_range']
-        if rainfall_range[0] <= rainfall <= rainfall_range[1]:
-            score += 25
-        elif abs(rainfall - rainfall_range[0]) <= 25 or abs(rainfall - rainfall_range[1]) <= 25:
-            score += 15
-        
-        return min(score, 100)
+    def _encode_input(self, item):
+        """Encode one input dict into a feature row in training column order.
+        
+        Raises for unusable conditions, so one bad item in a batch falls back on its own
+        instead of failing the model call for every item.
+        """
+        conditions = [float(item[key]) for key in ('temperature', 'humidity', 'rainfall')]
+        if not all(math.isfinite(value) for value in conditions):
+            raise ValueError("temperature, humidity and rainfall must be finite")
+        return conditions + [
+            self.category_codes['soil_type'][item['soil_type']],
+            self.category_codes['water_availability'][item['water_availability']]
+        ]
+    
+    def _build_recommendations(self, item, probabilities):
+        """Turn one row of class probabilities into ranked recommendations"""
+        soil_type = item['soil_type']
+        temperature = item['temperature']
+        humidity = item['humidity']
+        rainfall = item['rainfall']
+        
+        # Top 10 classes by probability (stable, so ties keep class order)
+        top = np.argsort(-np.asarray(probabilities), kind='stable')[:10]
+        top_ids = self.class_ids[top]
+        suitability = crop_catalog.suitability_scores(top_ids, soil_type, temperature, humidity, rainfall)
+        
+        # Adjust confidence based on location-specific factors
+        location_factor = self._get_location_factor(temperature, humidity, rainfall)
+        
+        recommendations = []
+        for class_index, crop_id, score in zip(top, top_ids, suitability):
+            crop = self.model.classes_[class_index]
+            record = crop_catalog.CROPS[crop_id] if crop_id >= 0 else None
+            adjusted_confidence = min(100, probabilities[class_index] * 100 * location_factor)
+            
+            recommendations.append({
+                'crop': crop,
+                'confidence': round(adjusted_confidence, 2),
+                'suitability_score': int(score),
+                'season': record.season if record else 'unknown',
+                'water_requirement': record.water_requirement if record else 'medium',
+                'market_demand': record.market_demand if record else 'medium',
+                'location_specific_advice': self._get_location_advice(crop, temperature, humidity, rainfall)
+            })
+        
+        return recommendations
     
     def _get_fallback_recommendations(self, soil_type, water_availability):
         """Provide fallback recommendations when model fails"""
@@ -570,14 +244,14 @@ class CropRecommendationModel:
         recommendations = []
         
         for i, crop in enumerate(crops):
-            crop_info = self.crop_data.get(crop, {})
+            record = crop_catalog.get(crop)
             recommendations.append({
                 'crop': crop,
                 'confidence': 70 - (i * 10),
                 'suitability_score': 60 - (i * 5),
-                'season': crop_info.get('season', 'unknown'),
-                'water_requirement': crop_info.get('water_requirement', 'medium'),
-                'market_demand': crop_info.get('market_demand', 'medium')
+                'season': record.season if record else 'unknown',
+                'water_requirement': record.water_requirement if record else 'medium',
+                'market_demand': record.market_demand if record else 'medium'
             })
         
         return recommendations
@@ -618,71 +292,37 @@ class CropRecommendationModel:
 
 
 class WaterManagementAdvisor:
-    def __init__(self):
-        self.irrigation_schedules = self._load_irrigation_data()
-    
-    def _load_irrigation_data(self):
-        """Load irrigation requirements for different crops"""
-        return {
-            'rice': {
-                'water_requirement': 1500,  # mm per season
-                'critical_stages': ['transplanting', 'tillering', 'flowering'],
-                'irrigation_interval': 3,  # days
-                'soil_moisture_threshold': 80
-            },
-            'wheat': {
-                'water_requirement': 450,
-                'critical_stages': ['crown_root', 'tillering', 'flowering', 'grain_filling'],
-                'irrigation_interval': 7,
-                'soil_moisture_threshold': 60
-            },
-            'maize': {
-                'water_requirement': 600,
-                'critical_stages': ['germination', 'tasseling', 'grain_filling'],
-                'irrigation_interval': 5,
-                'soil_moisture_threshold': 70
-            },
-            'cotton': {
-                'water_requirement': 800,
-                'critical_stages': ['germination', 'flowering', 'boll_development'],
-                'irrigation_interval': 7,
-                'soil_moisture_threshold': 65
-            },
-            'tomato': {
-                'water_requirement': 600,
-                'critical_stages': ['transplanting', 'flowering', 'fruit_development'],
-                'irrigation_interval': 2,
-                'soil_moisture_threshold': 75
-            }
-        }
+    """Irrigation advice from the crop catalog's irrigation profiles and the weather forecast"""
     
     def get_irrigation_advice(self, crop_type, soil_type, weather_forecast):
         """Get irrigation advice based on crop, soil, and weather"""
-        crop_data = self.irrigation_schedules.get(crop_type.lower(), {})
+        record = crop_catalog.get(crop_type.lower())
+        profile = record.irrigation if record else None
         
-        if not crop_data:
+        if profile is None:
             return self._get_generic_advice(soil_type, weather_forecast)
         
         advice = {
             'crop': crop_type,
-            'water_requirement': crop_data.get('water_requirement', 500),
-            'irrigation_schedule': self._calculate_irrigation_schedule(crop_data, weather_forecast),
+            'water_requirement': profile.water_requirement,
+            'irrigation_schedule': self._calculate_irrigation_schedule(profile, weather_forecast),
             'water_conservation_tips': self._get_conservation_tips(crop_type, soil_type),
-            'critical_stages': crop_data.get('critical_stages', []),
-            'soil_moisture_target': crop_data.get('soil_moisture_threshold', 70)
+            'critical_stages': list(profile.critical_stages),
+            'soil_moisture_target': profile.soil_moisture_threshold
         }
         
         return advice
     
-    def _calculate_irrigation_schedule(self, crop_data, weather_forecast):
+    def _calculate_irrigation_schedule(self, profile, weather_forecast):
         """Calculate irrigation schedule based on weather forecast"""
         schedule = []
-        base_interval = crop_data.get('irrigation_interval', 5)
+        base_interval = profile.irrigation_interval
         
-        # Adjust based on weather forecast
+        # Adjust based on weather forecast; rainfall is the day's total across all forecast slots
         for i, day_forecast in enumerate(weather_forecast[:7]):  # Next 7 days
             rainfall = day_forecast.get('rainfall', 0)
             temperature = day_forecast.get('temperature', 25)
+            temp_max = day_forecast.get('temp_max', temperature)
             humidity = day_forecast.get('humidity', 60)
             
             # Calculate water need
@@ -695,7 +335,7 @@ class WaterManagementAdvisor:
                 'date': day_forecast.get('date', ''),
                 'irrigation_needed': irrigation_needed,
                 'water_amount': water_need if irrigation_needed else 0,
-                'reason': self._get_irrigation_reason(rainfall, temperature, humidity)
+                'reason': self._get_irrigation_reason(rainfall, temp_max, humidity)
             })
         
         return schedule
@@ -0,0 +1,147 @@
+"""Per-climate-zone recommendation models.
+
+Each agro-climatic zone in `crop_catalog.CLIMATE_ZONES` gets its own small
+forest, trained only on the crops suited to that zone and stored as
+`<directory>/<zone>.joblib`. `ModelShardRegistry` loads a shard the first
+time a request routes to its zone. Loaded shards sit in an LRU bounded by
+`max_bytes`, so memory tracks the zones currently in use rather than every
+zone. Requests whose zone is unknown use the fallback (global) model.
+
+Shards missing on disk are trained on demand. To build them ahead of time:
+
+    python model_shards.py --directory models/shards
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import crop_catalog
+
+logger = logging.getLogger('krushi.model')
+
+# Shards see a fraction of the catalog, so a smaller forest suffices
+SHARD_ESTIMATORS = 50
+
+
+def shard_path(directory, zone):
+    return os.path.join(directory, f'{zone}.joblib')
+
+
+def train_shard(zone, n_estimators=SHARD_ESTIMATORS):
+    from ml_models import CropRecommendationModel
+    return CropRecommendationModel(crops=crop_catalog.zone_crops(zone), n_estimators=n_estimators)
+
+
+def shard_size(model, path):
+    """Approximate resident size: the serialized sklearn forest plus the flattened serving copy"""
+    size = model.engine.nbytes
+    if os.path.exists(path):
+        size += os.path.getsize(path)
+    return size
+
+
+class ModelShardRegistry:
+    """Zone-keyed models loaded on first use and evicted least-recently-used past `max_bytes`"""
+
+    def __init__(self, directory, fallback, max_bytes=256 * 1024 * 1024, train_missing=True):
+        self.directory = directory
+        self.fallback = fallback
+        self.max_bytes = max_bytes
+        self.train_missing = train_missing
+        self._shards = OrderedDict()  # zone -> (model, size in bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading = {zone: threading.Lock() for zone in crop_catalog.CLIMATE_ZONES}  # one loader per zone
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, zone):
+        """Model for `zone`, loading it if needed; the fallback for unknown zones or failed loads"""
+        if zone not in crop_catalog.CLIMATE_ZONES:
+            return self.fallback
+        model = self._lookup(zone)
+        if model is not None:
+            return model
+
+        with self._loading[zone]:
+            model = self._lookup(zone)
+            if model is not None:
+                return model
+            try:
+                model, size = self._load(zone)
+            except Exception as e:
+                logger.error("Could not load model shard %s, using the global model: %s", zone, e)
+                return self.fallback
+            self._insert(zone, model, size)
+            return model
+
+    def _lookup(self, zone):
+        with self._lock:
+            entry = self._shards.get(zone)
+            if entry is None:
+                return None
+            self._shards.move_to_end(zone)
+            return entry[0]
+
+    def _load(self, zone):
+        from ml_models import CropRecommendationModel
+
+        path = shard_path(self.directory, zone)
+        started = time.perf_counter()
+        if os.path.exists(path):
+            model = CropRecommendationModel.load(path)
+        elif self.train_missing:
+            model = train_shard(zone)
+            model.save(path)
+        else:
+            raise FileNotFoundError(path)
+        self.loads += 1
+        size = shard_size(model, path)
+        logger.info("Loaded model shard %s (%.1f MB) in %.2fs", zone, size / 1e6, time.perf_counter() - started)
+        return model, size
+
+    def _insert(self, zone, model, size):
+        with self._lock:
+            self._shards[zone] = (model, size)
+            self._bytes += size
+            # Evict least recently used shards, but always keep the one just loaded
+            while self._bytes > self.max_bytes and len(self._shards) > 1:
+                evicted, (_, evicted_size) = self._shards.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+                logger.info("Evicted model shard %s", evicted)
+
+    def loaded(self):
+        """Resident shards from least to most recently used, with their sizes"""
+        with self._lock:
+            return [(zone, size) for zone, (_, size) in self._shards.items()]
+
+    def recommend_crops_batch(self, inputs):
+        """Score a mixed batch, routing each item by its `climate_zone` key"""
+        results = [None] * len(inputs)
+        groups = defaultdict(list)
+        for i, item in enumerate(inputs):
+            groups[item.get('climate_zone')].append(i)
+        for zone, positions in groups.items():
+            scored = self.get(zone).recommend_crops_batch([inputs[i] for i in positions])
+            for i, result in zip(positions, scored):
+                results[i] = result
+        return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train per-climate-zone model shards')
+    parser.add_argument('--directory', default=os.getenv('MODEL_SHARDS_DIR', os.path.join('models', 'shards')))
+    parser.add_argument('--zone', action='append', choices=sorted(crop_catalog.CLIMATE_ZONES),
+                        help='zone to train (repeatable; default all)')
+    parser.add_argument('--estimators', type=int, default=SHARD_ESTIMATORS)
+    args = parser.parse_args()
+
+    for zone in args.zone or crop_catalog.CLIMATE_ZONES:
+        started = time.perf_counter()
+        path = train_shard(zone, args.estimators).save(shard_path(args.directory, zone))
+        print(f"{zone:<12} {len(crop_catalog.zone_crops(zone)):>3} crops  "
+              f"{os.path.getsize(path) / 1e6:>7.1f} MB  {time.perf_counter() - started:>5.1f}s  {path}")
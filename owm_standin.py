@@ -0,0 +1,200 @@
+"""Local stand-in for the OpenWeatherMap endpoints used by WeatherService.
+
+Serves `/data/2.5/weather` and `/data/2.5/forecast` with deterministic,
+location-dependent payloads so the app can be exercised offline with real
+HTTP round trips. Latency, server errors, 401s and 429s are configurable.
+
+Run standalone:
+    python owm_standin.py --port 8089 --latency-ms 80 --error-rate 0.02
+
+then start the app with OPENWEATHER_BASE_URL=http://127.0.0.1:8089/data/2.5
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class StandinConfig:
+    def __init__(self, latency_ms=50, jitter_ms=20, error_rate=0.0, unauthorized_rate=0.0,
+                 rate_limit_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.unauthorized_rate = unauthorized_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+
+    def next_outcome(self):
+        """Pick a delay and status code for one request"""
+        with self.lock:
+            self.request_count += 1
+            delay = max(0.0, self.random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+            roll = self.random.random()
+
+        if roll < self.unauthorized_rate:
+            return delay, 401
+        roll -= self.unauthorized_rate
+        if roll < self.rate_limit_rate:
+            return delay, 429
+        roll -= self.rate_limit_rate
+        if roll < self.error_rate:
+            return delay, 500
+        return delay, 200
+
+
+def _place(params):
+    """Resolve a name and coordinates from the query, stable per location"""
+    if 'lat' in params and 'lon' in params:
+        lat, lon = float(params['lat'][0]), float(params['lon'][0])
+        name = f"Cell {lat:.2f},{lon:.2f}"
+    else:
+        name = params.get('q', ['Unknown'])[0].split(',')[0].strip().title()
+        seed = zlib.crc32(name.lower().encode())
+        lat = 8 + (seed % 2800) / 100
+        lon = 68 + (seed // 2800 % 2900) / 100
+    return name, lat, lon
+
+
+def _base_conditions(lat, lon):
+    seed = zlib.crc32(f"{lat:.1f}:{lon:.1f}".encode())
+    return {
+        'temp': 18 + (seed % 170) / 10,
+        'humidity': 35 + seed % 55,
+        'wind': 1 + (seed // 7 % 60) / 10,
+        'rain': (seed // 11 % 6) * 0.8
+    }
+
+
+def current_weather_payload(params):
+    name, lat, lon = _place(params)
+    base = _base_conditions(lat, lon)
+    payload = {
+        'coord': {'lat': lat, 'lon': lon},
+        'name': name,
+        'main': {'temp': base['temp'], 'humidity': base['humidity'], 'pressure': 1010},
+        'weather': [{'description': 'light rain' if base['rain'] else 'clear sky'}],
+        'wind': {'speed': base['wind']},
+        'dt': int(time.time())
+    }
+    if base['rain']:
+        payload['rain'] = {'1h': base['rain']}
+    return payload
+
+
+def forecast_payload(params):
+    name, lat, lon = _place(params)
+    base = _base_conditions(lat, lon)
+    start = int(time.time()) // 10800 * 10800
+    items = []
+    for i in range(40):
+        hour = (start // 3600 + i * 3) % 24
+        diurnal = [-3, -4, -1, 2, 4, 5, 2, -1][hour // 3]
+        rain = base['rain'] if (i + hour) % 5 == 0 else 0
+        item = {
+            'dt': start + i * 10800,
+            'main': {'temp': base['temp'] + diurnal, 'humidity': base['humidity'] - diurnal},
+            'weather': [{'description': 'light rain' if rain else 'scattered clouds'}],
+            'wind': {'speed': base['wind']}
+        }
+        if rain:
+            item['rain'] = {'3h': rain}
+        items.append(item)
+    return {
+        'city': {'name': name, 'coord': {'lat': lat, 'lon': lon}, 'timezone': 19800},
+        'list': items
+    }
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    config = StandinConfig()
+    routes = {
+        'weather': current_weather_payload,
+        'forecast': forecast_payload
+    }
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        endpoint = parsed.path.rstrip('/').rsplit('/', 1)[-1]
+        handler = self.routes.get(endpoint)
+
+        delay, status = self.config.next_outcome()
+        time.sleep(delay)
+
+        if handler is None:
+            self._send(404, {'cod': '404', 'message': 'not found'})
+        elif status == 401:
+            self._send(401, {'cod': 401, 'message': 'Invalid API key'})
+        elif status == 429:
+            self._send(429, {'cod': 429, 'message': 'rate limit exceeded'})
+        elif status == 500:
+            self._send(500, {'cod': '500', 'message': 'internal error'})
+        else:
+            self._send(200, handler(params))
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host='127.0.0.1', port=0, config=None):
+    handler = type('ConfiguredStandinHandler', (StandinHandler,), {'config': config or StandinConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_standin(host='127.0.0.1', port=0, config=None):
+    """Start the stand-in in a daemon thread; returns (server, base_url)"""
+    server = make_server(host, port, config)
+    threading.Thread(target=server.serve_forever, name='owm-standin', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/data/2.5"
+
+
+def add_standin_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=50, help='mean upstream latency')
+    parser.add_argument('--jitter-ms', type=float, default=20, help='latency standard deviation')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of HTTP 500 responses')
+    parser.add_argument('--unauthorized-rate', type=float, default=0.0, help='fraction of HTTP 401 responses')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of HTTP 429 responses')
+    parser.add_argument('--seed', type=int, default=None)
+
+
+def config_from_args(args):
+    return StandinConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        unauthorized_rate=args.unauthorized_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local OpenWeatherMap stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, config_from_args(args))
+    print(f"OpenWeatherMap stand-in listening on http://{args.host}:{args.port}/data/2.5")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,127 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+from logging_setup import SAMPLED
+from analytics import rollup_key
+
+logger = logging.getLogger('krushi.persistence')
+
+# Client-supplied user ids that match no users row are stored as NULL instead of failing the foreign key
+INSERT_RECOMMENDATION = '''
+    INSERT INTO recommendations
+        (user_id, soil_type, climate_data, water_availability, recommended_crops, confidence_score)
+    VALUES ((SELECT id FROM users WHERE id = ?), ?, ?, ?, ?, ?)
+'''
+
+
+class RecommendationWriter:
+    """Write-behind queue that persists recommendation results off the request path.
+
+    `record` only serializes the row and enqueues it. A background thread
+    drains the queue and inserts rows in a single transaction whenever
+    `batch_size` rows are pending or `flush_interval_ms` has elapsed. When
+    `analytics` is given, its rollups are updated in the same transaction.
+    """
+
+    def __init__(self, db, flush_interval_ms=200, batch_size=100, max_pending=10000, analytics=None):
+        self.db = db
+        self.analytics = analytics
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.written = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='recommendation-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        """Flush pending rows and stop the writer thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def record(self, soil_type, water_availability, weather, recommendations, user_id=None, location=None):
+        """Queue one recommendation result; never blocks the caller"""
+        climate_data = dict(weather or {})
+        if location:
+            climate_data['query_location'] = location
+        top_confidence = recommendations[0]['confidence'] if recommendations else None
+        row = (
+            user_id,
+            soil_type,
+            json.dumps(climate_data, separators=(',', ':')),
+            water_availability,
+            json.dumps(recommendations, separators=(',', ':')),
+            top_confidence
+        )
+        try:
+            self.queue.put_nowait((row, rollup_key(soil_type, location, recommendations)))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Recommendation write queue full, dropping row", extra=SAMPLED)
+
+    def _next_batch(self):
+        """Block for the first row, then collect more until the batch is full or the interval passes"""
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, batch):
+        with self.db.transaction() as conn:
+            conn.executemany(INSERT_RECOMMENDATION, [row for row, _ in batch])
+            if self.analytics is not None:
+                self.analytics.apply(conn, [key for _, key in batch])
+        self.written += len(batch)
+
+    def _write(self, batch):
+        try:
+            self._insert(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error("Failed to persist recommendation: %s", e)
+                return
+            # Retry row by row so one bad row does not discard the rest of the batch
+            logger.warning("Failed to persist %d recommendations, retrying one by one: %s", len(batch), e)
+            for entry in batch:
+                try:
+                    self._insert([entry])
+                except Exception as e:
+                    logger.error("Failed to persist recommendation: %s", e)
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+        # Drain whatever is left on shutdown
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
@@ -0,0 +1,204 @@
+"""Whole-farm crop portfolios.
+
+`plan_portfolios` splits each farm's area across crops to maximize expected
+revenue: market price x typical yield x suitability for the farm's conditions.
+The total seasonal water need must stay within the budget implied by the
+farm's water availability, and no crop may take more than `max_share` of the
+area, so the plan stays diversified.
+
+The area is divided into `AREA_STEPS` equal steps and the water budget into
+`WATER_BINS` bins. The solver is a multiple-choice knapsack DP over (area,
+water) run for all farms at once: one NumPy array holds every farm's DP
+table, and each (crop, steps) transition is a shifted gather across the
+whole batch. A few thousand farms solve in a couple of seconds.
+"""
+import numpy as np
+
+import crop_catalog
+
+AREA_STEPS = 20
+WATER_BINS = 40
+
+# Seasonal water (rain plus irrigation, mm) a farm can supply, by water availability
+WATER_BUDGET_MM = {'low': 450, 'medium': 750, 'high': 1200}
+
+MIN_SUITABILITY = 50
+MAX_SHARE = 0.5
+MAX_CANDIDATES = 10
+CHUNK_FARMS = 1024
+
+
+def solve_allocations(revenue, water, max_steps, area_steps=AREA_STEPS, water_bins=WATER_BINS):
+    """Area steps per candidate that maximize revenue for a batch of farms.
+
+    revenue: (farms, candidates) revenue of one area step of each candidate.
+    water: (farms, candidates) water bins one area step uses.
+    Returns an (farms, candidates) integer array of area steps.
+    """
+    revenue = np.asarray(revenue, dtype=np.float64)
+    n_farms, n_candidates = revenue.shape
+    max_steps = min(max_steps, area_steps)
+    steps = np.arange(max_steps + 1)
+    # Water bins used by k steps; rounded up so a plan never exceeds the budget.
+    # Crops with no revenue get a cost no budget can cover, so they are never picked.
+    cost = np.ceil(np.asarray(water, dtype=np.float64)[:, :, None] * steps - 1e-9).astype(np.intp)
+    cost = np.where((revenue > 0)[:, :, None], np.minimum(cost, water_bins + 1), water_bins + 1)
+    cost[:, :, 0] = 0
+
+    # value[f, a, w]: best revenue using at most a area steps and w water bins on the crops so far
+    # float32 halves the memory traffic of every pass over the tables
+    value = np.zeros((n_farms, area_steps + 1, water_bins + 1), dtype=np.float32)
+    # -inf padding in front of both axes turns "k steps using s bins" into a window offset
+    padded = np.full((n_farms, 2 * area_steps + 1, 2 * water_bins + 2), -np.inf, dtype=np.float32)
+    candidate = np.empty_like(value)
+    choices = np.zeros((n_candidates, n_farms, area_steps + 1, water_bins + 1), dtype=np.uint8)
+    for c in range(n_candidates):
+        if not (revenue[:, c] > 0).any():
+            continue
+        padded[:, area_steps:, water_bins + 1:] = value
+        best = value.copy()
+        choice = choices[c]
+        for k in steps[1:]:
+            # Farms sharing a water cost share a window, so copy slices group by group
+            offsets = water_bins + 1 - cost[:, c, k]
+            order = np.argsort(offsets, kind='stable')
+            bounds = np.flatnonzero(np.diff(offsets[order])) + 1
+            for group in np.split(order, bounds):
+                offset = offsets[group[0]]
+                candidate[group] = padded[group, area_steps - k:2 * area_steps + 1 - k, offset:offset + water_bins + 1]
+            candidate += (k * revenue[:, c]).astype(np.float32)[:, None, None]
+            better = candidate > best
+            np.putmask(choice, better, k)
+            np.maximum(best, candidate, out=best)
+        value = best
+
+    # Walk back from the full area and water budget
+    allocation = np.zeros((n_farms, n_candidates), dtype=np.intp)
+    farms = np.arange(n_farms)
+    area = np.full(n_farms, area_steps)
+    budget = np.full(n_farms, water_bins)
+    for c in reversed(range(n_candidates)):
+        k = choices[c, farms, area, budget].astype(np.intp)
+        allocation[:, c] = k
+        area -= k
+        budget -= cost[farms, c, k]
+    return allocation
+
+
+def _price_column(prices):
+    """Price per crop id from a {crop: price} mapping (catalog base price for the rest)"""
+    if prices is None:
+        return crop_catalog.BASE_PRICE
+    column = np.array(crop_catalog.BASE_PRICE)
+    for crop, price in prices.items():
+        crop_id = crop_catalog.CROP_IDS.get(crop)
+        if crop_id is not None and price:
+            column[crop_id] = price
+    return column
+
+
+def _finite(value, name, label):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{label}{name} must be a number") from None
+    if not np.isfinite(number):
+        raise ValueError(f"{label}{name} must be finite")
+    return number
+
+
+def check_farm(farm, index=None):
+    """Raise ValueError for a farm whose fields cannot be planned; returns its farm_size in acres"""
+    label = f"farm {index}: " if index is not None else ''
+    for name in ('soil_type', 'water_availability'):
+        if farm.get(name) is not None and not isinstance(farm[name], str):
+            raise ValueError(f"{label}{name} must be a string")
+    for name in ('temperature', 'humidity', 'rainfall'):
+        if farm.get(name) is not None:
+            _finite(farm[name], name, label)
+    crops = farm.get('crops')
+    if crops is not None and (not isinstance(crops, (list, tuple)) or not all(isinstance(crop, str) for crop in crops)):
+        raise ValueError(f"{label}crops must be a list of crop names")
+    farm_size = _finite(farm.get('farm_size') or 1.0, 'farm_size', label)
+    if farm_size <= 0:
+        raise ValueError(f"{label}farm_size must be positive")
+    return farm_size
+
+
+def plan_portfolios(farms, prices=None, max_share=MAX_SHARE, min_suitability=MIN_SUITABILITY,
+                    max_candidates=MAX_CANDIDATES):
+    """Revenue-maximizing crop areas for each farm.
+
+    Each farm is a dict with farm_size (acres), soil_type, water_availability,
+    temperature, humidity, rainfall and optionally `crops`, the names to
+    choose from (default: the whole catalog). `prices` maps crop names to
+    Rs/quintal and overrides the catalog base prices. Raises ValueError
+    for farms with unusable fields.
+    """
+    if not farms:
+        return []
+    farm_size = np.array([check_farm(farm, i) for i, farm in enumerate(farms)])
+    suitability = crop_catalog.suitability_matrix(
+        [farm.get('soil_type') for farm in farms],
+        [farm.get('temperature', 25) for farm in farms],
+        [farm.get('humidity', 60) for farm in farms],
+        [farm.get('rainfall', 100) for farm in farms]
+    )
+    revenue_per_acre = _price_column(prices) * crop_catalog.YIELD_PER_ACRE * suitability / 100
+    eligible = suitability >= min_suitability
+    for i, farm in enumerate(farms):
+        if farm.get('crops') is not None:
+            allowed = np.zeros(len(crop_catalog.CROPS), dtype=bool)
+            ids = crop_catalog.ids_for(farm['crops'])
+            allowed[ids[ids >= 0]] = True
+            eligible[i] &= allowed
+    revenue_per_acre = np.where(eligible, revenue_per_acre, 0)
+
+    # Only the most valuable eligible crops per farm enter the DP
+    n_candidates = min(max_candidates, revenue_per_acre.shape[1])
+    candidates = np.argsort(-revenue_per_acre, axis=1, kind='stable')[:, :n_candidates]
+    candidate_revenue = np.take_along_axis(revenue_per_acre, candidates, axis=1)
+
+    budget_mm = np.array([WATER_BUDGET_MM.get(farm.get('water_availability'), WATER_BUDGET_MM['medium'])
+                          for farm in farms], dtype=np.float64)
+    water_per_step = crop_catalog.WATER_MM[candidates] / budget_mm[:, None] * WATER_BINS / AREA_STEPS
+
+    step_revenue = candidate_revenue * (farm_size / AREA_STEPS)[:, None]
+    allocation = np.zeros(candidates.shape, dtype=np.intp)
+    # Solving in chunks bounds the DP tables' memory for large batches
+    for start in range(0, len(farms), CHUNK_FARMS):
+        chunk = slice(start, start + CHUNK_FARMS)
+        allocation[chunk] = solve_allocations(
+            step_revenue[chunk], water_per_step[chunk], int(AREA_STEPS * max_share)
+        )
+    return [
+        _describe(farm_size[i], budget_mm[i], candidates[i], candidate_revenue[i], allocation[i])
+        for i in range(len(farms))
+    ]
+
+
+def _describe(farm_size, budget_mm, candidates, revenue_per_acre, steps):
+    allocations = []
+    water_used = 0.0
+    for crop_id, revenue, k in zip(candidates, revenue_per_acre, steps):
+        if k == 0:
+            continue
+        record = crop_catalog.CROPS[crop_id]
+        acres = farm_size * k / AREA_STEPS
+        water_used += acres * record.water_mm
+        allocations.append({
+            'crop': record.name,
+            'acres': round(acres, 2),
+            'share': round(k / AREA_STEPS * 100, 1),
+            'expected_revenue': round(acres * revenue, 2),
+            'water_mm': record.water_mm
+        })
+    allocations.sort(key=lambda allocation: -allocation['acres'])
+    allocated = sum(allocation['acres'] for allocation in allocations)
+    return {
+        'farm_size': round(farm_size, 2),
+        'allocations': allocations,
+        'unallocated_acres': round(farm_size - allocated, 2),
+        'expected_revenue': round(sum(allocation['expected_revenue'] for allocation in allocations), 2),
+        'water_budget_used': round(water_used / (farm_size * budget_mm) * 100, 1)
+    }
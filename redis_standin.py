@@ -0,0 +1,145 @@
+"""Local stand-in for the Redis commands the shared cache tier uses.
+
+Speaks the Redis protocol (RESP2) and keeps keys in memory with expiry.
+Supports PING, AUTH, SELECT, GET, SET (EX/PX/NX/XX), DEL, EXISTS, PTTL,
+DBSIZE and FLUSHDB, which is enough to run several app nodes against one
+shared cache without installing Redis.
+
+Run standalone:
+    python redis_standin.py --port 6390
+
+then start each app node with CACHE_URL=redis://127.0.0.1:6390/0
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class Store:
+    def __init__(self):
+        self.data = {}  # key -> (value, expires_at or None)
+        self.lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self.data[key]
+            return None
+        return entry
+
+    def execute(self, command, args):
+        now = time.monotonic()
+        with self.lock:
+            if command == 'PING':
+                return 'PONG'
+            if command in ('AUTH', 'SELECT'):
+                return 'OK'
+            if command == 'GET':
+                entry = self._live(args[0], now)
+                return entry[0] if entry else None
+            if command == 'SET':
+                return self._set(args, now)
+            if command == 'DEL':
+                return sum(1 for key in args if self._live(key, now) and self.data.pop(key))
+            if command == 'EXISTS':
+                return sum(1 for key in args if self._live(key, now))
+            if command == 'PTTL':
+                entry = self._live(args[0], now)
+                if entry is None:
+                    return -2
+                return -1 if entry[1] is None else int((entry[1] - now) * 1000)
+            if command == 'DBSIZE':
+                return sum(1 for key in list(self.data) if self._live(key, now))
+            if command == 'FLUSHDB':
+                self.data.clear()
+                return 'OK'
+        return ValueError(f"ERR unknown command '{command}'")
+
+    def _set(self, args, now):
+        key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+        expires_at = None
+        for i, option in enumerate(options):
+            if option in (b'EX', b'PX'):
+                amount = int(args[2 + i + 1])
+                expires_at = now + (amount if option == b'EX' else amount / 1000)
+        exists = self._live(key, now) is not None
+        if (b'NX' in options and exists) or (b'XX' in options and not exists):
+            return None
+        self.data[key] = (value, expires_at)
+        return 'OK'
+
+
+def _encode(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, Exception):
+        return b'-%s\r\n' % str(reply).encode()
+    if isinstance(reply, str):
+        return b'+%s\r\n' % reply.encode()
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+
+class StandinHandler(socketserver.StreamRequestHandler):
+    store = Store()
+
+    def _read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        if not header.startswith(b'*'):
+            return header.split()
+        args = []
+        for _ in range(int(header[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        while True:
+            try:
+                args = self._read_command()
+            except (OSError, ValueError):
+                return
+            if args is None:
+                return
+            if not args:
+                continue
+            reply = self.store.execute(args[0].decode().upper(), args[1:])
+            try:
+                self.wfile.write(_encode(reply))
+            except OSError:
+                return
+
+
+class StandinServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(host='127.0.0.1', port=0):
+    handler = type('ConfiguredStandinHandler', (StandinHandler,), {'store': Store()})
+    return StandinServer((host, port), handler)
+
+
+def start_standin(host='127.0.0.1', port=0):
+    """Start the stand-in in a daemon thread; returns (server, cache_url)"""
+    server = make_server(host, port)
+    threading.Thread(target=server.serve_forever, name='redis-standin', daemon=True).start()
+    return server, f"redis://{host}:{server.server_address[1]}/0"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local Redis-protocol stand-in for the shared cache')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port)
+    print(f"Redis stand-in listening on redis://{args.host}:{args.port}/0")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,103 @@
+"""Memoized responses for repeated recommendation requests.
+
+Farmers in one village tend to submit the same soil type, location and water
+availability within minutes. `ResponseCache` keeps the computed parts of a
+response (recommendations, market trends, portfolio) keyed on the request
+inputs plus the versions of the weather snapshot and model they came from,
+so a repeat query skips inference and market lookups. A new weather reading
+changes the key, and entries also expire after `ttl` seconds so market prices
+stay fresh. The cache is bounded by entry count and evicts least recently
+used entries first.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return ' '.join(value.lower().split())
+    return value
+
+
+def recommendation_key(data, weather_data, coordinates=None, coordinate_key=None, model_version=None):
+    """Cache key for a recommendation request, or None when it should not be cached.
+
+    The model version is part of the key, so a request still scoring with a
+    replaced model cannot put its result back after the cache is cleared.
+    """
+    version = weather_data.get('timestamp')
+    if version is None:
+        return None
+    try:
+        farm_size = round(float(data.get('farm_size') or 1.0), 2)
+    except (TypeError, ValueError):
+        return None
+    place = coordinate_key(*coordinates) if coordinates and coordinate_key else _normalize(data.get('location'))
+    # Soil and water are kept exactly as given: the model's category lookup is case-sensitive
+    return (
+        data.get('soil_type'),
+        data.get('water_availability'),
+        place,
+        farm_size,
+        data.get('history_format') == 'columnar',
+        version,
+        model_version
+    )
+
+
+class ResponseCache:
+    """Thread-safe LRU of response payloads with per-entry expiry"""
+
+    def __init__(self, name, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = max_entries > 0 and ttl > 0
+        self._entries = OrderedDict()  # key -> (expires_at, payload)
+        self._lock = threading.Lock()
+        help_text = 'Response cache lookups by result'
+        self._hits = metrics.registry.counter('krushi_response_cache_requests_total', help_text, cache=name, result='hit')
+        self._misses = metrics.registry.counter('krushi_response_cache_requests_total', help_text, cache=name, result='miss')
+        self._evictions = metrics.registry.counter(
+            'krushi_response_cache_evictions_total', 'Response cache entries evicted to stay within size', cache=name
+        )
+
+    def get(self, key):
+        """Cached payload for `key`, or None; counts a hit or a miss"""
+        if key is None or not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            self._misses.inc()
+            return None
+        self._hits.inc()
+        return entry[1]
+
+    def put(self, key, payload):
+        if key is None or not self.enabled:
+            return
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self._evictions.inc(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
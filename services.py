@@ -0,0 +1,81 @@
+"""Lazily constructed service singletons.
+
+app.py wraps each service in a `LazyService` so importing the app (and
+serving `/`, `/health` and static files) never pays for pandas,
+scikit-learn, the Gemini client or model training. A service is built on
+first use, or ahead of time by `warm_up` running in a background thread.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger('krushi.model')
+
+
+class LazyService:
+    """Proxy that builds its target on first attribute access (thread-safe)"""
+
+    def __init__(self, name, factory):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._error = None
+        self._lock = threading.Lock()
+        self.build_seconds = None
+
+    def get(self):
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                started = time.perf_counter()
+                try:
+                    self._instance = self._factory()
+                except Exception as e:
+                    self._error = e
+                    raise
+                self._error = None
+                self.build_seconds = time.perf_counter() - started
+                logger.info("Initialized %s in %.2fs", self._name, self.build_seconds)
+            return self._instance
+
+    def replace(self, instance):
+        """Swap in a new instance; callers already holding the old one finish with it"""
+        with self._lock:
+            self._instance = instance
+            self._error = None
+
+    @property
+    def ready(self):
+        return self._instance is not None
+
+    @property
+    def error(self):
+        return self._error
+
+    def __getattr__(self, attr):
+        # Only reached for attributes the proxy itself does not define
+        return getattr(self.get(), attr)
+
+
+def warm_up(steps, background=True):
+    """Run warm-up callables in order, optionally in a daemon thread.
+
+    Each step is a (name, callable) pair; a failing step is logged and the
+    remaining steps still run, so one broken dependency does not keep the
+    others cold.
+    """
+    def run():
+        for name, step in steps:
+            try:
+                step()
+            except Exception as e:
+                logger.error("Warm-up step %s failed: %s", name, e)
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name='service-warm-up', daemon=True)
+    thread.start()
+    return thread
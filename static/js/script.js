@@ -108,6 +108,44 @@ function showAlert(message, type = 'info') {
     }, 5000);
 }
 
+// Conditional GET cache: reuse responses while fresh, then revalidate with their ETag
+const responseCache = new Map();
+
+async function fetchJsonCached(url) {
+    const cached = responseCache.get(url);
+    if (cached && cached.expiresAt > Date.now()) {
+        return cached.data;
+    }
+
+    const headers = {};
+    if (cached && cached.etag) {
+        headers['If-None-Match'] = cached.etag;
+    }
+
+    // The in-memory cache handles validation, so skip the browser's HTTP cache
+    const response = await fetch(url, { headers: headers, cache: 'no-store' });
+    if (response.status === 304 && cached) {
+        cached.expiresAt = Date.now() + getMaxAge(response) * 1000;
+        return cached.data;
+    }
+
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    if (response.ok && etag) {
+        responseCache.set(url, {
+            etag: etag,
+            data: data,
+            expiresAt: Date.now() + getMaxAge(response) * 1000
+        });
+    }
+    return data;
+}
+
+function getMaxAge(response) {
+    const match = /max-age=(\d+)/.exec(response.headers.get('Cache-Control') || '');
+    return match ? parseInt(match[1], 10) : 0;
+}
+
 // Crop Recommendations
 async function getCropRecommendations() {
     const location = document.getElementById('location').value;
@@ -120,30 +158,35 @@ async function getCropRecommendations() {
         return;
     }
 
+    const payload = {
+        location: location,
+        soil_type: soilType,
+        water_availability: waterAvailability,
+        farm_size: parseFloat(farmSize) || 1.0,
+        history_format: 'columnar',
+        ...getCoordinatesFor(location)
+    };
+
     showLoading();
 
     try {
-        const response = await fetch('/api/recommend-crops', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                location: location,
-                soil_type: soilType,
-                water_availability: waterAvailability,
-                farm_size: parseFloat(farmSize) || 1.0
-            })
+        // Render each section as soon as the server streams it
+        await streamEvents('/api/recommend-crops/stream', payload, (event, data) => {
+            if (event === 'weather') {
+                startCropResults(data);
+                hideLoading();
+            } else if (event === 'recommendations') {
+                appendCropCards(data);
+            } else if (event === 'market') {
+                showCropMarketTrend(data.crop, data.trend);
+            } else if (event === 'portfolio') {
+                showPortfolio(data);
+            } else if (event === 'done') {
+                showAlert('Crop recommendations generated successfully!', 'success');
+            } else if (event === 'error') {
+                showAlert('Error getting recommendations: ' + data.error, 'error');
+            }
         });
-
-        const data = await response.json();
-
-        if (data.success) {
-            displayCropRecommendations(data.recommendations, data.weather);
-            showAlert('Crop recommendations generated successfully!', 'success');
-        } else {
-            showAlert('Error getting recommendations: ' + data.error, 'error');
-        }
     } catch (error) {
         showAlert('Network error: ' + error.message, 'error');
     } finally {
@@ -151,15 +194,76 @@ async function getCropRecommendations() {
     }
 }
 
-function displayCropRecommendations(recommendations, weather) {
-    const resultsSection = document.getElementById('recommendations-results');
+// POST a JSON body and dispatch each Server-Sent Event in the response to onEvent(event, data)
+async function streamEvents(url, payload, onEvent) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        },
+        body: JSON.stringify(payload)
+    });
+
+    if (!response.ok || !response.body) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.error || `HTTP ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            const parsed = parseSseBlock(block);
+            if (parsed) {
+                onEvent(parsed.event, parsed.data);
+            }
+        }
+    }
+}
+
+function parseSseBlock(block) {
+    let event = 'message';
+    const dataLines = [];
+    block.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    });
+    if (dataLines.length === 0) {
+        return null;
+    }
+    return { event: event, data: JSON.parse(dataLines.join('\n')) };
+}
+
+function startCropResults(weather) {
     const cropCards = document.getElementById('crop-cards');
-    
     cropCards.innerHTML = '';
+    if (weather) {
+        cropCards.appendChild(createWeatherCard(weather));
+    }
+    document.getElementById('recommendations-results').style.display = 'block';
+}
 
+function appendCropCards(recommendations) {
+    const cropCards = document.getElementById('crop-cards');
     recommendations.forEach(crop => {
         const cropCard = document.createElement('div');
         cropCard.className = 'crop-card';
+        cropCard.dataset.crop = crop.crop;
         
         cropCard.innerHTML = `
             <h4>${crop.crop}</h4>
@@ -182,21 +286,55 @@ function displayCropRecommendations(recommendations, weather) {
         
         cropCards.appendChild(cropCard);
     });
+}
 
-    // Show weather info if available
-    if (weather) {
-        const weatherInfo = document.createElement('div');
-        weatherInfo.className = 'weather-card';
-        weatherInfo.innerHTML = `
-            <h4>Current Weather in ${weather.location}</h4>
-            <p><strong>Temperature:</strong> ${weather.temperature}°C</p>
-            <p><strong>Humidity:</strong> ${weather.humidity}%</p>
-            <p><strong>Weather:</strong> ${weather.weather}</p>
-        `;
-        cropCards.appendChild(weatherInfo);
+function createWeatherCard(weather) {
+    const weatherInfo = document.createElement('div');
+    weatherInfo.className = 'weather-card';
+    weatherInfo.innerHTML = `
+        <h4>Current Weather in ${weather.location}</h4>
+        <p><strong>Temperature:</strong> ${weather.temperature}°C</p>
+        <p><strong>Humidity:</strong> ${weather.humidity}%</p>
+        <p><strong>Weather:</strong> ${weather.weather}</p>
+    `;
+    return weatherInfo;
+}
+
+function showCropMarketTrend(crop, trend) {
+    const cropCard = Array.from(document.querySelectorAll('#crop-cards .crop-card'))
+        .find(card => card.dataset.crop === crop);
+    if (!cropCard || !trend) {
+        return;
     }
+    const market = document.createElement('div');
+    market.className = `price-trend ${trend.trend_direction === 'up' ? 'trend-up' : 'trend-down'}`;
+    market.innerHTML = `
+        <i class="fas fa-arrow-${trend.trend_direction === 'up' ? 'up' : 'down'}"></i>
+        <span><strong>Market Price:</strong> ₹${trend.current_price}/quintal</span>
+    `;
+    cropCard.appendChild(market);
+}
 
-    resultsSection.style.display = 'block';
+// Farm plan: how much of the farm to give each crop
+function showPortfolio(portfolio) {
+    if (!portfolio || portfolio.allocations.length === 0) {
+        return;
+    }
+    const card = document.createElement('div');
+    card.className = 'weather-card';
+    card.innerHTML = `
+        <h4>Suggested Plan for ${portfolio.farm_size} acres</h4>
+        ${portfolio.allocations.map(allocation => `
+            <p><strong>${allocation.crop}:</strong> ${allocation.acres} acres (${allocation.share}%),
+            expected ₹${Math.round(allocation.expected_revenue).toLocaleString('en-IN')}</p>
+        `).join('')}
+        ${portfolio.unallocated_acres > 0 ? `<p><strong>Left Unplanted:</strong> ${portfolio.unallocated_acres} acres</p>` : ''}
+        <p><strong>Expected Revenue:</strong> ₹${Math.round(portfolio.expected_revenue).toLocaleString('en-IN')}
+        · <strong>Water Budget Used:</strong> ${portfolio.water_budget_used}%</p>
+    `;
+    const cropCards = document.getElementById('crop-cards');
+    const firstCrop = cropCards.querySelector('.crop-card');
+    cropCards.insertBefore(card, firstCrop);
 }
 
 // Weather Data
@@ -211,8 +349,11 @@ async function getWeatherData() {
     showLoading();
 
     try {
-        const response = await fetch(`/api/weather/${encodeURIComponent(location)}`);
-        const data = await response.json();
+        const coordinates = getCoordinatesFor(location);
+        const url = coordinates.lat !== undefined
+            ? `/api/weather?lat=${coordinates.lat}&lon=${coordinates.lon}`
+            : `/api/weather/${encodeURIComponent(location)}`;
+        const data = await fetchJsonCached(url);
 
         if (data.success) {
             displayWeatherData(data.current, data.forecast);
@@ -285,8 +426,7 @@ async function getMarketData() {
     showLoading();
 
     try {
-        const response = await fetch(`/api/market-trends/${encodeURIComponent(crop)}`);
-        const data = await response.json();
+        const data = await fetchJsonCached(`/api/market-trends/${encodeURIComponent(crop)}?history=columnar`);
 
         if (data.success) {
             displayMarketData(data.trends, data.predictions);
@@ -373,7 +513,8 @@ async function getWaterAdvice() {
             body: JSON.stringify({
                 crop_type: cropType,
                 soil_type: soilType,
-                location: location
+                location: location,
+                ...getCoordinatesFor(location)
             })
         });
 
@@ -451,7 +592,7 @@ async function detectUserLocationImproved() {
         const data = await response.json();
         
         if (data.success) {
-            setLocationFields(data.location);
+            setLocationFields(data.location, data.coordinates);
             // Store location details for enhanced recommendations
             window.locationDetails = data.details;
             showAlert(`Location detected: ${data.location}`, 'success');
@@ -474,7 +615,7 @@ function fallbackLocationDetection() {
                 
                 // Simple location mapping based on coordinates
                 let location = getLocationFromCoordinates(lat, lon);
-                setLocationFields(location);
+                setLocationFields(location, { lat: lat, lon: lon });
                 showAlert(`Location detected: ${location}`, 'info');
             },
             function(error) {
@@ -511,7 +652,17 @@ function getLocationFromCoordinates(lat, lon) {
     return 'Delhi, India';
 }
 
-function setLocationFields(location) {
+// Coordinates of the detected location, sent so nearby farms share weather lookups
+function getCoordinatesFor(location) {
+    const detected = window.detectedLocation;
+    if (detected && detected.coordinates && detected.name === location) {
+        return { lat: detected.coordinates.lat, lon: detected.coordinates.lon };
+    }
+    return {};
+}
+
+function setLocationFields(location, coordinates = null) {
+    window.detectedLocation = { name: location, coordinates: coordinates };
     // Set location in all relevant fields
     const locationFields = ['location', 'weather-location', 'water-location'];
     locationFields.forEach(fieldId => {
@@ -0,0 +1,188 @@
+"""Offline model selection for crop recommendations.
+
+Trains every candidate classifier on the same synthetic training set and
+scores it on a held-out set. For each candidate it reports top-1 and top-5
+accuracy, the artifact size on disk, the training time, and inference
+latency through the serving engine for single rows and 64-row batches.
+Training uses all cores (`n_jobs=-1` for forests; histogram gradient
+boosting is multithreaded on its own). Latency is measured afterwards, one
+candidate at a time, so the candidates don't compete for CPU.
+
+The winner is the most accurate candidate within the size and latency
+limits. It is written to the model artifact path that app.py loads:
+
+    python train_model.py                       # all candidates, save winner to MODEL_PATH
+    python train_model.py --quick --no-save     # smaller grid, report only
+    python train_model.py --max-size-mb 50 --max-latency-ms 2 --report bench_results/models.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import ExtraTreesClassifier, HistGradientBoostingClassifier, RandomForestClassifier
+
+from ml_models import CropRecommendationModel, encode_training_data, generate_training_data
+
+
+def build_candidates(quick=False, n_jobs=-1):
+    """(name, unfitted estimator) pairs to compare"""
+    candidates = []
+    forest_sizes = (50, 100) if quick else (50, 100, 200)
+    depths = (None, 16) if quick else (None, 12, 20)
+    for n_estimators in forest_sizes:
+        for max_depth in depths:
+            candidates.append((
+                f'random_forest[n={n_estimators},depth={max_depth or "full"}]',
+                RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=42, n_jobs=n_jobs)
+            ))
+    for n_estimators in (100,) if quick else (100, 200):
+        candidates.append((
+            f'extra_trees[n={n_estimators}]',
+            ExtraTreesClassifier(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs)
+        ))
+    for max_iter in (50,) if quick else (100, 200):
+        candidates.append((
+            f'hist_gradient_boosting[iter={max_iter}]',
+            HistGradientBoostingClassifier(max_iter=max_iter, random_state=42)
+        ))
+    return candidates
+
+
+def top_k_accuracy(proba, classes, y_true, k):
+    top = np.argsort(-proba, axis=1)[:, :k]
+    labels = np.asarray(classes)[top]
+    return float(np.mean([truth in row for truth, row in zip(y_true, labels)]))
+
+
+def measure_latency(engine, rows, repeats):
+    """Median and p95 milliseconds for one predict_proba call on `rows`"""
+    engine.predict_proba(rows)  # warm-up
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        engine.predict_proba(rows)
+        samples.append((time.perf_counter() - started) * 1000)
+    return float(np.median(samples)), float(np.percentile(samples, 95))
+
+
+def evaluate(name, estimator, train, test, path, repeats):
+    X_train, y_train, encoders, feature_names = train
+    X_test, y_test = test
+
+    started = time.perf_counter()
+    estimator.fit(X_train, y_train)
+    train_seconds = time.perf_counter() - started
+
+    # Serve single-threaded: FlatForest ignores n_jobs, and sklearn fallbacks should not fan out per request
+    if 'n_jobs' in estimator.get_params():
+        estimator.set_params(n_jobs=None)
+    model = CropRecommendationModel.from_estimator(estimator, encoders, feature_names)
+    model.save(path)
+
+    proba = model.engine.predict_proba(X_test.to_numpy(dtype=np.float64))
+    rows = X_test.to_numpy(dtype=np.float64)
+    single_p50, single_p95 = measure_latency(model.engine, rows[:1], repeats)
+    batch_p50, batch_p95 = measure_latency(model.engine, rows[:64], max(5, repeats // 4))
+    return {
+        'name': name,
+        'engine': type(model.engine).__name__,
+        'accuracy': round(top_k_accuracy(proba, model.engine.classes_, y_test, 1), 4),
+        'top5_accuracy': round(top_k_accuracy(proba, model.engine.classes_, y_test, 5), 4),
+        'size_mb': round(os.path.getsize(path) / 1e6, 2),
+        'train_seconds': round(train_seconds, 2),
+        'latency_1_p50_ms': round(single_p50, 3),
+        'latency_1_p95_ms': round(single_p95, 3),
+        'latency_64_p50_ms': round(batch_p50, 3),
+        'latency_64_p95_ms': round(batch_p95, 3),
+        'path': path
+    }
+
+
+def pick_winner(results, max_size_mb=None, max_latency_ms=None):
+    """Most accurate candidate within the limits; ties go to the faster batch latency"""
+    eligible = [
+        result for result in results
+        if (max_size_mb is None or result['size_mb'] <= max_size_mb)
+        and (max_latency_ms is None or result['latency_64_p50_ms'] <= max_latency_ms)
+    ]
+    if not eligible:
+        return None
+    return max(eligible, key=lambda result: (result['accuracy'], result['top5_accuracy'], -result['latency_64_p50_ms']))
+
+
+def print_results(results, winner):
+    header = (f"{'candidate':<38}{'acc':>7}{'top5':>7}{'MB':>8}{'train s':>9}"
+              f"{'1-row ms':>10}{'64-row ms':>11}")
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        marker = ' *' if winner is not None and result['name'] == winner['name'] else ''
+        print(f"{result['name']:<38}{result['accuracy']:>7.3f}{result['top5_accuracy']:>7.3f}"
+              f"{result['size_mb']:>8.1f}{result['train_seconds']:>9.2f}"
+              f"{result['latency_1_p50_ms']:>10.3f}{result['latency_64_p50_ms']:>11.3f}{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare candidate crop models and save the best one')
+    parser.add_argument('--output', default=os.getenv('MODEL_PATH', os.path.join('models', 'crop_model.joblib')),
+                        help='artifact path for the winner (default MODEL_PATH)')
+    parser.add_argument('--samples-per-crop', type=int, default=100)
+    parser.add_argument('--holdout-per-crop', type=int, default=25)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--quick', action='store_true', help='smaller candidate grid')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='cores used to train forests')
+    parser.add_argument('--repeats', type=int, default=50, help='timed inference calls per candidate')
+    parser.add_argument('--max-size-mb', type=float, help='reject candidates with larger artifacts')
+    parser.add_argument('--max-latency-ms', type=float, help='reject candidates slower on a 64-row batch')
+    parser.add_argument('--report', help='write all results as JSON to this file')
+    parser.add_argument('--no-save', action='store_true', help='report only; leave the artifact untouched')
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    X_train, y_train, encoders, feature_names = encode_training_data(
+        generate_training_data(samples_per_crop=args.samples_per_crop)
+    )
+    holdout = generate_training_data(samples_per_crop=args.holdout_per_crop)
+    # Encode the holdout with the training encoders so codes line up
+    X_test = holdout[['temperature', 'humidity', 'rainfall']].copy()
+    for feature, encoder in encoders.items():
+        X_test[feature] = encoder.transform(holdout[feature])
+    X_test = X_test[feature_names]
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='krushi-train-') as workdir:
+        for index, (name, estimator) in enumerate(build_candidates(args.quick, args.n_jobs)):
+            print(f"Training {name}...", flush=True)
+            results.append(evaluate(
+                name, clone(estimator), (X_train, y_train, encoders, feature_names),
+                (X_test, holdout['crop'].to_numpy()), os.path.join(workdir, f'candidate-{index}.joblib'), args.repeats
+            ))
+
+        winner = pick_winner(results, args.max_size_mb, args.max_latency_ms)
+        print()
+        print_results(results, winner)
+
+        if winner is None:
+            print("\nNo candidate met the size/latency limits; artifact left unchanged")
+        elif not args.no_save:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            CropRecommendationModel.load(winner['path']).save(args.output)
+            print(f"\nSaved {winner['name']} to {args.output}")
+
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        with open(args.report, 'w') as f:
+            json.dump({
+                'seed': args.seed,
+                'winner': winner['name'] if winner else None,
+                'candidates': [{key: value for key, value in result.items() if key != 'path'} for result in results]
+            }, f, indent=2)
+    return 0 if winner is not None else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,37 +1,370 @@
 import requests
+import base64
 import json
-from datetime import datetime, timedelta
+import logging
+import threading
+import time
+import numpy as np
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from metrics import instrument
+from logging_setup import SAMPLED
+from cache_backend import TieredCache, cacheable
+
+logger = logging.getLogger('krushi.weather')
+prefetch_logger = logging.getLogger('krushi.prefetch')
+
+# One row per 3-hourly forecast slot returned by the /forecast endpoint
+FORECAST_DTYPE = np.dtype([
+    ('timestamp', 'i8'),
+    ('temperature', 'f4'),
+    ('humidity', 'f4'),
+    ('rainfall', 'f4'),
+    ('wind_speed', 'f4'),
+    ('weather', 'i2'),
+])
+
+
+@cacheable
+class ForecastSeries:
+    """Columnar view of a full forecast response with vectorized daily aggregates"""
+
+    def __init__(self, slots, descriptions, utc_offset=0):
+        self.slots = slots
+        self.descriptions = descriptions
+        self.utc_offset = utc_offset
+
+    def to_cache(self):
+        slots = self.slots.astype(FORECAST_DTYPE.newbyteorder('<'))
+        return {'slots': base64.b64encode(slots.tobytes()).decode('ascii'),
+                'descriptions': self.descriptions, 'utc_offset': self.utc_offset}
+
+    @classmethod
+    def from_cache(cls, data):
+        slots = np.frombuffer(base64.b64decode(data['slots']), dtype=FORECAST_DTYPE.newbyteorder('<'))
+        return cls(slots.astype(FORECAST_DTYPE), data['descriptions'], data['utc_offset'])
+
+    @classmethod
+    def from_response(cls, data):
+        """Parse every slot of an OpenWeatherMap /forecast payload"""
+        items = data.get('list', [])
+        slots = np.empty(len(items), dtype=FORECAST_DTYPE)
+        descriptions = []
+        description_ids = {}
+
+        for i, item in enumerate(items):
+            description = item['weather'][0]['description']
+            code = description_ids.get(description)
+            if code is None:
+                code = description_ids[description] = len(descriptions)
+                descriptions.append(description)
+
+            slots[i] = (
+                item['dt'],
+                item['main']['temp'],
+                item['main']['humidity'],
+                item.get('rain', {}).get('3h', 0),
+                item['wind']['speed'],
+                code
+            )
+
+        slots.sort(order='timestamp')
+        utc_offset = data.get('city', {}).get('timezone', 0)
+        return cls(slots, descriptions, utc_offset)
+
+    def daily(self, days=7):
+        """Aggregate the slots into per-day summaries in local time"""
+        if len(self.slots) == 0 or days <= 0:
+            return []
+
+        local_seconds = self.slots['timestamp'] + self.utc_offset
+        day_keys = local_seconds // 86400
+        boundaries = np.flatnonzero(np.diff(day_keys)) + 1
+        starts = np.concatenate(([0], boundaries))[:days]
+        ends = np.append(boundaries, len(self.slots))[:days]
+        slots = self.slots[:ends[-1]]
+
+        counts = ends - starts
+        temperature = slots['temperature'].astype(np.float64)
+        temp_mean = np.add.reduceat(temperature, starts) / counts
+        temp_min = np.minimum.reduceat(temperature, starts)
+        temp_max = np.maximum.reduceat(temperature, starts)
+        humidity = np.add.reduceat(slots['humidity'].astype(np.float64), starts) / counts
+        rainfall = np.add.reduceat(slots['rainfall'].astype(np.float64), starts)
+        wind_speed = np.add.reduceat(slots['wind_speed'].astype(np.float64), starts) / counts
+
+        # Describe each day by the slot closest to local noon
+        noon_distance = np.abs(local_seconds[:ends[-1]] % 86400 - 43200)
+        group_ids = np.repeat(np.arange(len(starts)), counts)
+        order = np.lexsort((noon_distance, group_ids))
+        representative = order[starts]
+
+        forecast = []
+        for i in range(len(starts)):
+            date = datetime.fromtimestamp(int(day_keys[starts[i]]) * 86400, tz=timezone.utc)
+            forecast.append({
+                'date': date.strftime('%Y-%m-%d'),
+                'temperature': round(float(temp_mean[i]), 1),
+                'temp_min': round(float(temp_min[i]), 1),
+                'temp_max': round(float(temp_max[i]), 1),
+                'humidity': int(round(humidity[i])),
+                'weather': self.descriptions[int(slots['weather'][representative[i]])],
+                'rainfall': round(float(rainfall[i]), 1),
+                'wind_speed': round(float(wind_speed[i]), 1)
+            })
+
+        return forecast
+
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(lat, lon, precision=5):
+    """Encode coordinates as a geohash string of `precision` characters"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(geohash) < precision:
+        value, bounds = (lon, lon_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            bounds[0] = mid
+        else:
+            bits <<= 1
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(geohash)
+
+
+def decode_geohash(geohash):
+    """Return the (lat, lon) centre of a geohash cell"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        bits = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            bounds = lon_range if even else lat_range
+            mid = (bounds[0] + bounds[1]) / 2
+            if (bits >> shift) & 1:
+                bounds[0] = mid
+            else:
+                bounds[1] = mid
+            even = not even
+
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+class RateLimiter:
+    """Token bucket that paces upstream calls against the OpenWeatherMap quota"""
+
+    def __init__(self, calls_per_minute):
+        self.capacity = float(calls_per_minute)
+        self.rate = calls_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def note_call(self):
+        """Record a call that was made regardless of pacing (request path)"""
+        with self.lock:
+            self._refill()
+            self.tokens = max(-self.capacity, self.tokens - 1)
+
+    def try_acquire(self, reserve=0):
+        """Take a token if more than `reserve` remain for the request path"""
+        with self.lock:
+            self._refill()
+            if self.tokens - 1 >= reserve:
+                self.tokens -= 1
+                return True
+            return False
+
+    def penalize(self):
+        """Drain the bucket after the upstream reported rate limiting"""
+        with self.lock:
+            self.tokens = min(self.tokens, 0.0)
+            self.updated = time.monotonic()
+
 
 class WeatherService:
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache_ttl=600, forecast_ttl=1800, calls_per_minute=60,
+                 geohash_precision=5, alias_ttl=86400, base_url=None, cache=None):
         self.api_key = api_key
-        self.base_url = "http://api.openweathermap.org/data/2.5"
+        self.base_url = base_url or "http://api.openweathermap.org/data/2.5"
+        self.cache_ttl = {'current': cache_ttl, 'forecast': forecast_ttl}
+        self.rate_limiter = RateLimiter(calls_per_minute)
+        # Precision 5 cells are roughly 4.9 x 4.9 km, so neighbouring farms share a record
+        self.geohash_precision = geohash_precision
+        self.alias_ttl = alias_ttl
+        # Entries live at 'weather:<kind>:<key>'; aliases map 'q:<name>' keys to 'gh:<cell>' keys
+        self.cache = cache or TieredCache()
+        self._cache_lock = threading.Lock()
+        self._request_counts = Counter()
     
+    def _has_api_key(self):
+        return bool(self.api_key and self.api_key.strip())
+    
+    @instrument('weather')
     def get_current_weather(self, location):
         """Get current weather data for a location"""
-        if not self.api_key or self.api_key.strip() == "":
-            print("No weather API key provided, using mock data")
+        if not self._has_api_key():
+            logger.info("No weather API key provided, using mock data", extra=SAMPLED)
             return self._get_mock_weather_data(location)
         
+        weather = self._get_or_refresh('current', self.location_key(location))
+        return weather if weather is not None else self._get_mock_weather_data(location)
+    
+    @instrument('weather')
+    def get_current_weather_at(self, lat, lon):
+        """Get current weather for coordinates, shared across the surrounding grid cell"""
+        if not self._has_api_key():
+            logger.info("No weather API key provided, using mock data", extra=SAMPLED)
+            return self._get_mock_weather_data(f"{lat:.2f}, {lon:.2f}")
+        
+        weather = self._get_or_refresh('current', self.coordinate_key(lat, lon))
+        return weather if weather is not None else self._get_mock_weather_data(f"{lat:.2f}, {lon:.2f}")
+    
+    def get_forecast(self, location, days=7):
+        """Get daily weather forecast for a location"""
+        series = self.get_forecast_series(location)
+        if series is None:
+            return self._get_mock_forecast_data(days, location)
+        return series.daily(days)
+    
+    @instrument('forecast')
+    def get_forecast_at(self, lat, lon, days=7):
+        """Get daily weather forecast for coordinates"""
+        series = None
+        if self._has_api_key():
+            series = self._get_or_refresh('forecast', self.coordinate_key(lat, lon))
+        if series is None:
+            return self._get_mock_forecast_data(days, f"{lat:.2f}, {lon:.2f}")
+        return series.daily(days)
+    
+    @instrument('forecast')
+    def get_forecast_series(self, location):
+        """Get the full 3-hourly forecast as a ForecastSeries, or None when unavailable"""
+        if not self._has_api_key():
+            logger.info("No weather API key provided, using mock forecast", extra=SAMPLED)
+            return None
+        
+        return self._get_or_refresh('forecast', self.location_key(location))
+    
+    def location_key(self, location):
+        """Cache key for a free-text location.
+        
+        Names are normalized, and once a name has been resolved upstream it is
+        aliased to the geohash cell of the returned coordinates so that
+        different spellings of the same place share one record.
+        """
+        key = 'q:' + ' '.join(location.lower().replace(',', ', ').split())
+        # Aliases are read from the in-process tier only; the named key itself is still shared
+        return self.cache.peek('weather:alias:' + key) or key
+    
+    def coordinate_key(self, lat, lon):
+        """Cache key for coordinates: the geohash cell that contains them"""
+        return 'gh:' + encode_geohash(lat, lon, self.geohash_precision)
+    
+    def _get_or_refresh(self, kind, key):
+        self.record_request(key)
+        
+        def load():
+            self.rate_limiter.note_call()
+            return self._fetch(kind, key)
+        
+        return self.cache.get_or_load(f'weather:{kind}:{key}', self.cache_ttl[kind], load)
+    
+    def record_request(self, key):
+        """Count a lookup so the prefetcher can find hot locations"""
+        with self._cache_lock:
+            self._request_counts[key] += 1
+    
+    def hot_locations(self, top_n, decay=0.5):
+        """Return the most requested location keys and decay the counters"""
+        with self._cache_lock:
+            hottest = [key for key, _ in self._request_counts.most_common(top_n)]
+            for key in list(self._request_counts):
+                count = int(self._request_counts[key] * decay)
+                if count:
+                    self._request_counts[key] = count
+                else:
+                    del self._request_counts[key]
+        return hottest
+    
+    def expires_in(self, kind, key):
+        """Seconds until a cached entry expires (0 when missing or stale)"""
+        return self.cache.remaining_ttl(f'weather:{kind}:{key}')
+    
+    def remaining_ttl(self, key):
+        """Seconds until either the current weather or forecast for a key expires"""
+        return min(self.expires_in('current', key), self.expires_in('forecast', key))
+    
+    def refresh(self, kind, key, paced=False):
+        """Fetch fresh data from the API and store it in the cache.
+        
+        Returns the new value, or None when the upstream call failed or
+        another node is already refreshing the entry. Paced callers have
+        already taken a token from the rate limiter.
+        """
+        if not paced:
+            self.rate_limiter.note_call()
+        return self.cache.refresh(f'weather:{kind}:{key}', self.cache_ttl[kind], lambda: self._fetch(kind, key))
+    
+    def _fetch(self, kind, key):
+        """Call the API for a key; named places are also cached under their grid cell and aliased to it"""
+        fetch = self._fetch_current_weather if kind == 'current' else self._fetch_forecast_series
+        value, coord = fetch(key)
+        if value is not None and key.startswith('q:') and coord:
+            cell_key = self.coordinate_key(coord['lat'], coord['lon'])
+            self.cache.set(f'weather:{kind}:{cell_key}', value, self.cache_ttl[kind])
+            self.cache.set('weather:alias:' + key, cell_key, self.alias_ttl)
+        return value
+    
+    def _query_params(self, key):
+        if key.startswith('gh:'):
+            lat, lon = decode_geohash(key[3:])
+            params = {'lat': round(lat, 4), 'lon': round(lon, 4)}
+        else:
+            params = {'q': key[2:]}
+        params.update({'appid': self.api_key, 'units': 'metric'})
+        return params
+    
+    def _fetch_current_weather(self, key):
         try:
             url = f"{self.base_url}/weather"
-            params = {
-                'q': location,
-                'appid': self.api_key,
-                'units': 'metric'
-            }
+            params = self._query_params(key)
             
-            print(f"Calling weather API for {location}")
+            logger.debug("Calling weather API for %s", key)
             response = requests.get(url, params=params, timeout=10)
             
             if response.status_code == 401:
-                print("Weather API key invalid, using mock data")
-                return self._get_mock_weather_data(location)
+                logger.warning("Weather API key invalid, using mock data")
+                return None, None
+            if response.status_code == 429:
+                self.rate_limiter.penalize()
             
             response.raise_for_status()
             data = response.json()
             
-            print(f"Weather API success for {location}")
+            logger.info("Weather API success for %s", key, extra=SAMPLED)
             return {
                 'location': data['name'],
                 'temperature': round(data['main']['temp'], 1),
@@ -41,61 +374,36 @@ class WeatherService:
                 'wind_speed': round(data['wind']['speed'], 1),
                 'rainfall': data.get('rain', {}).get('1h', 0),
                 'timestamp': datetime.now().isoformat()
-            }
+            }, data.get('coord')
             
         except Exception as e:
-            print(f"Weather API error: {e}")
-            return self._get_mock_weather_data(location)
+            logger.warning("Weather API error for %s: %s", key, e)
+            return None, None
     
-    def get_forecast(self, location, days=7):
-        """Get weather forecast for a location"""
-        if not self.api_key or self.api_key.strip() == "":
-            print("No weather API key provided, using mock forecast")
-            return self._get_mock_forecast_data(days, location)
-        
+    def _fetch_forecast_series(self, key):
         try:
             url = f"{self.base_url}/forecast"
-            params = {
-                'q': location,
-                'appid': self.api_key,
-                'units': 'metric'
-            }
+            params = self._query_params(key)
             
-            print(f"Calling weather forecast API for {location}")
+            logger.debug("Calling weather forecast API for %s", key)
             response = requests.get(url, params=params, timeout=10)
             
             if response.status_code == 401:
-                print("Weather API key invalid for forecast, using mock data")
-                return self._get_mock_forecast_data(days, location)
+                logger.warning("Weather API key invalid for forecast, using mock data")
+                return None, None
+            if response.status_code == 429:
+                self.rate_limiter.penalize()
             
             response.raise_for_status()
             data = response.json()
+            series = ForecastSeries.from_response(data)
             
-            forecast = []
-            processed_dates = set()
-            
-            for item in data['list']:
-                dt = datetime.fromtimestamp(item['dt'])
-                date_str = dt.strftime('%Y-%m-%d')
-                
-                # Take one forecast per day (prefer noon time)
-                if date_str not in processed_dates and len(forecast) < days:
-                    forecast.append({
-                        'date': date_str,
-                        'temperature': round(item['main']['temp'], 1),
-                        'humidity': item['main']['humidity'],
-                        'weather': item['weather'][0]['description'],
-                        'rainfall': item.get('rain', {}).get('3h', 0),
-                        'wind_speed': round(item['wind']['speed'], 1)
-                    })
-                    processed_dates.add(date_str)
-            
-            print(f"Weather forecast API success for {location}")
-            return forecast
+            logger.info("Weather forecast API success for %s", key, extra=SAMPLED)
+            return series, data.get('city', {}).get('coord')
             
         except Exception as e:
-            print(f"Weather forecast API error: {e}")
-            return self._get_mock_forecast_data(days, location)
+            logger.warning("Weather forecast API error for %s: %s", key, e)
+            return None, None
     
     def _get_mock_weather_data(self, location="Unknown"):
         """Return mock weather data when API is not available"""
@@ -122,7 +430,8 @@ class WeatherService:
             'weather': 'partly cloudy' if weather_data['rainfall'] < 5 else 'light rain',
             'wind_speed': 3.2,
             'rainfall': weather_data['rainfall'],
-            'timestamp': datetime.now().isoformat()
+            # Mock readings change on the same schedule as cached ones, so the timestamp versions the snapshot
+            'timestamp': datetime.fromtimestamp(time.time() // self.cache_ttl['current'] * self.cache_ttl['current']).isoformat()
         }
     
     def _get_mock_forecast_data(self, days=7, location="Unknown"):
@@ -132,9 +441,12 @@ class WeatherService:
         
         for i in range(days):
             date = base_date + timedelta(days=i)
+            temperature = 25 + (i % 3) * 2  # Varying temperature
             forecast.append({
                 'date': date.strftime('%Y-%m-%d'),
-                'temperature': 25 + (i % 3) * 2,  # Varying temperature
+                'temperature': temperature,
+                'temp_min': temperature - 4,
+                'temp_max': temperature + 4,
                 'humidity': 60 + (i % 4) * 5,     # Varying humidity
                 'weather': ['sunny', 'partly cloudy', 'cloudy', 'light rain'][i % 4],
                 'rainfall': [0, 0, 2, 8][i % 4],  # Varying rainfall
@@ -142,3 +454,62 @@ class WeatherService:
             })
         
         return forecast
+
+
+class WeatherPrefetcher:
+    """Background scheduler that keeps hot locations warm in the WeatherService cache.
+    
+    Every `interval` seconds the `top_n` most requested locations are refreshed
+    if their cached current weather or forecast expires within `lead_time`
+    seconds. Refreshes draw from the service's rate limiter and leave
+    `reserve_fraction` of the quota for cache misses on the request path.
+    """
+
+    def __init__(self, weather_service, top_n=100, interval=60, lead_time=120, reserve_fraction=0.2):
+        if not 0 <= reserve_fraction < 1:
+            raise ValueError("reserve_fraction must be at least 0 and below 1")
+        self.weather_service = weather_service
+        capacity = weather_service.rate_limiter.capacity
+        # A reserve above capacity - 1 leaves no token a refresh could ever take, so the loop would spin
+        self.reserve = min(capacity * reserve_fraction, max(capacity - 1, 0))
+        self.top_n = top_n
+        self.interval = interval
+        self.lead_time = lead_time
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='weather-prefetch', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                prefetch_logger.exception("Weather prefetch error: %s", e)
+
+    def run_once(self):
+        """Refresh expiring entries for the current top-N locations"""
+        refreshed = 0
+        for location in self.weather_service.hot_locations(self.top_n):
+            for kind in ('current', 'forecast'):
+                if self._stop.is_set():
+                    return refreshed
+                if self.weather_service.expires_in(kind, location) > self.lead_time:
+                    continue
+                # Wait for quota rather than skipping so hot entries never lapse
+                while not self.weather_service.rate_limiter.try_acquire(reserve=self.reserve):
+                    if self._stop.wait(1.0):
+                        return refreshed
+                if self.weather_service.refresh(kind, location, paced=True) is not None:
+                    refreshed += 1
+        return refreshed